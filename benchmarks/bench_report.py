@@ -0,0 +1,62 @@
+"""Benchmark price chart rendering: serial vs. process pool.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_report.py --tickers 50 200 --days 750 --workers 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from mmw import db, report
+from mmw.prices import upsert_prices
+
+
+def make_prices(n_tickers: int, n_days: int) -> pd.DataFrame:
+    """Return synthetic OHLC bars for ``n_tickers`` tickers."""
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=n_days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_tickers, n_days)), axis=1))
+    frames = [
+        pd.DataFrame(
+            {"ticker": f"T{i:04d}", "date": dates, "open": c, "high": c * 1.01,
+             "low": c * 0.99, "close": c, "volume": 0.0}
+        )
+        for i, c in enumerate(close)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--days", type=int, default=750)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    print(f"{'tickers':>7} {'workers':>7} {'time':>9} {'MB':>8}")
+    for n in args.tickers:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite'}", future=True)
+            db.init_db(engine)
+            upsert_prices(make_prices(n, args.days), engine)
+            for workers in args.workers:
+                report.DOCS_DIR = Path(tmp) / f"docs{workers}"
+                t0 = time.perf_counter()
+                paths = report.build_price_charts(engine, workers=workers)
+                elapsed = time.perf_counter() - t0
+                size = sum(p.stat().st_size for p in paths) / 1e6
+                print(f"{n:>7d} {workers:>7d} {elapsed:8.2f}s {size:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark all-pairs rolling correlation: per-pair pandas loop vs. cumsum engine.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_rolling_corr.py --tickers 14 100 500 --days 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from mmw.analytics import rolling_corr_all
+
+
+def make_returns(n_tickers: int, n_days: int) -> pd.DataFrame:
+    """Return synthetic tidy daily returns with a few gaps."""
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=n_days)
+    values = rng.normal(0, 0.02, (n_days, n_tickers))
+    values[rng.random(values.shape) < 0.01] = np.nan
+    wide = pd.DataFrame(values, index=dates, columns=[f"T{i:04d}" for i in range(n_tickers)])
+    tidy = wide.rename_axis(index="date", columns="ticker").stack().rename("ret")
+    return tidy.reset_index()
+
+
+def legacy_rolling_corr(ret_df: pd.DataFrame, window: int) -> pd.DataFrame:
+    """Per-pair implementation as it was before the vectorized engine."""
+
+    wide = ret_df.pivot(index="date", columns="ticker", values="ret").sort_index()
+    frames = []
+    for a, b in combinations(wide.columns, 2):
+        series = wide[a].rolling(window).corr(wide[b])
+        frames.append(
+            pd.DataFrame({"date": series.index, "pair": f"{a}-{b}", "corr": series.values})
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _time(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[14, 100, 500])
+    parser.add_argument("--days", type=int, default=500)
+    parser.add_argument("--window", type=int, default=30)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=100,
+        help="Skip the per-pair loop above this many tickers (it takes minutes).",
+    )
+    args = parser.parse_args()
+
+    print(f"{'tickers':>7} {'pairs':>8} {'legacy':>9} {'array':>9} {'upper':>9} {'tidy':>9}")
+    for n in args.tickers:
+        ret_df = make_returns(n, args.days)
+        pairs = n * (n - 1) // 2
+        legacy = (
+            f"{_time(lambda: legacy_rolling_corr(ret_df, args.window)):8.2f}s"
+            if n <= args.legacy_max
+            else f"{'-':>9}"
+        )
+        full = _time(lambda: rolling_corr_all(ret_df, args.window))
+        upper = _time(lambda: rolling_corr_all(ret_df, args.window, upper=True))
+        tidy = _time(lambda: rolling_corr_all(ret_df, args.window, upper=True).to_frame())
+        print(f"{n:>7d} {pairs:>8d} {legacy} {full:8.2f}s {upper:8.2f}s {tidy:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
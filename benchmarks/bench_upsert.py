@@ -0,0 +1,99 @@
+"""Benchmark price upserts: legacy per-row statements vs. batched executemany.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_upsert.py --tickers 200 --days 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker
+
+from mmw import db
+from mmw.prices import upsert_prices
+
+
+def make_prices(n_tickers: int, n_days: int) -> pd.DataFrame:
+    """Return a synthetic tidy price frame."""
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2005-01-03", periods=n_days)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    idx = pd.MultiIndex.from_product([tickers, dates], names=["ticker", "date"])
+    close = 100 * np.exp(rng.normal(0, 0.02, len(idx)).cumsum())
+    df = pd.DataFrame(index=idx).reset_index()
+    df["open"] = close
+    df["high"] = close * 1.01
+    df["low"] = close * 0.99
+    df["close"] = close
+    df["volume"] = rng.integers(1_000, 1_000_000, len(idx)).astype(float)
+    return df
+
+
+def legacy_upsert_prices(df: pd.DataFrame, engine) -> None:
+    """Per-row upsert as implemented before the bulk-write layer."""
+
+    Session = sessionmaker(bind=engine, future=True)
+    with Session.begin() as session:
+        for ticker, group in df.groupby("ticker"):
+            asset = session.execute(
+                select(db.Asset).where(db.Asset.ticker == ticker)
+            ).scalar_one_or_none()
+            if asset is None:
+                asset = db.Asset(ticker=ticker)
+                session.add(asset)
+                session.flush()
+            for row in group.itertuples(index=False):
+                values = {
+                    "open": row.open,
+                    "high": row.high,
+                    "low": row.low,
+                    "close": row.close,
+                    "volume": row.volume,
+                }
+                stmt = sqlite_insert(db.Price).values(
+                    asset_id=asset.id,
+                    date=pd.to_datetime(row.date).to_pydatetime(),
+                    **values,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[db.Price.__table__.c.asset_id, db.Price.__table__.c.date],
+                    set_=values,
+                )
+                session.execute(stmt)
+
+
+def _run(label: str, fn, df: pd.DataFrame, path: Path) -> None:
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    db.Base.metadata.create_all(engine)
+    for phase in ("insert", "update"):
+        t0 = time.perf_counter()
+        fn(df, engine)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<8} {phase:<7} {len(df):>9d} rows {elapsed:8.2f}s {len(df) / elapsed:>10.0f} rows/s")
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--days", type=int, default=500)
+    args = parser.parse_args()
+
+    df = make_prices(args.tickers, args.days)
+    with tempfile.TemporaryDirectory() as tmp:
+        _run("legacy", legacy_upsert_prices, df, Path(tmp) / "legacy.sqlite")
+        _run("bulk", upsert_prices, df, Path(tmp) / "bulk.sqlite")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,42 @@ import pandas as pd
 import streamlit as st
 from sqlalchemy import select
 
-from mmw.db import engine, News
+from mmw.analytics import news_intensity, price_snapshots, ticker_news_counts
+from mmw.db import News, create_db_engine
+
+
+@st.cache_resource
+def get_engine():
+    """Return a read-only engine shared across Streamlit reruns."""
+
+    return create_db_engine(profile="report")
+
+
+def show_rollups(engine) -> None:
+    """Show daily news counts, coverage per ticker and monthly closes."""
+
+    try:
+        daily = news_intensity(engine)
+        covered = ticker_news_counts(engine)
+        monthly = price_snapshots(engine, "monthly")
+    except Exception:
+        return
+    if not daily.empty:
+        st.subheader("News per day")
+        st.bar_chart(daily.set_index("date")["news_count"])
+    if not covered.empty:
+        st.subheader("Linked news per ticker")
+        st.dataframe(covered)
+    if not monthly.empty:
+        st.subheader("Monthly close")
+        st.line_chart(monthly.pivot(index="period", columns="ticker", values="close"))
 
 
 def main() -> None:
-    """Show latest news from the SQLite database."""
+    """Show latest news and daily rollups from the SQLite database."""
 
     st.title("Maritime Market Watch")
+    engine = get_engine()
     try:
         with engine.connect() as conn:
             df = pd.read_sql(
@@ -23,6 +52,7 @@ def main() -> None:
     except Exception:
         df = pd.DataFrame(columns=["published_at", "source", "title", "url"])
     st.dataframe(df)
+    show_rollups(engine)
 
 
 if __name__ == "__main__":  # pragma: no cover - streamlit
@@ -8,15 +8,20 @@ only pandas/SQLAlchemy to remain easy to test and extend.
 from __future__ import annotations
 
 import json
-from itertools import combinations
-from typing import Iterable, Tuple
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Iterable, List, Tuple
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import select
+from sqlalchemy import Label, Select, func, select
 from sqlalchemy.orm import sessionmaker
 
+from .columnar import read_prices
 from .config import WATCHLIST_TICKERS
-from .db import Asset, Link, News, Price, Run
+from .db import Asset, Link, News, NewsDaily, Run, TickerNewsDaily
+from .returns_cache import database_key, prices_watermark, returns_cache
+from .rollups import FREQUENCIES, period_closes, rollups_current
 
 
 # ---------------------------------------------------------------------------
@@ -41,6 +46,36 @@ def _save_run(engine, name: str, data: pd.DataFrame) -> int:
 # ---------------------------------------------------------------------------
 # Core analytics
 
+def returns_matrix(
+    engine, tickers: Iterable[str] | None = None, source: str | None = None
+) -> pd.DataFrame:
+    """Return simple daily returns as a wide ``date x ticker`` matrix.
+
+    ``tickers`` defaults to every ticker with stored prices.  Each ticker's
+    return is computed over its own consecutive bars; dates on which none of
+    the tickers traded are absent.  Matrices are served from
+    :data:`mmw.returns_cache.returns_cache`, keyed by the prices watermark,
+    so repeated calls only query and recompute after prices changed.
+    """
+
+    tickers = None if tickers is None else list(dict.fromkeys(tickers))
+
+    def compute() -> pd.DataFrame:
+        df = read_prices(engine, tickers, columns=("close",), source=source)
+        df = df.sort_values(["ticker", "date"])
+        df["ret"] = df.groupby("ticker")["close"].pct_change()
+        df = df.dropna(subset=["ret"])
+        wide = df.pivot(index="date", columns="ticker", values="ret").sort_index()
+        wide.index = pd.DatetimeIndex(wide.index, name="date")
+        wide.columns = wide.columns.astype(str)
+        return wide
+
+    database, persist = database_key(engine)
+    return returns_cache.get(
+        database, tickers, prices_watermark(engine, source), compute, persist=persist
+    )
+
+
 def compute_daily_returns(engine, tickers: Iterable[str]) -> pd.DataFrame:
     """Compute simple daily returns for the provided tickers.
 
@@ -54,57 +89,335 @@ def compute_daily_returns(engine, tickers: Iterable[str]) -> pd.DataFrame:
     Returns
     -------
     pandas.DataFrame
-        Tidy data frame with columns ``date``, ``ticker`` and ``ret``.
+        Tidy data frame with columns ``date``, ``ticker`` and ``ret``; a
+        long view of :func:`returns_matrix`.
     """
 
+    tickers = list(tickers)
     if not tickers:
         return pd.DataFrame(columns=["date", "ticker", "ret"])
 
-    q = (
-        select(Asset.ticker, Price.date, Price.close)
-        .join(Price, Asset.id == Price.asset_id)
-        .where(Asset.ticker.in_(list(tickers)))
-        .order_by(Asset.ticker, Price.date)
-    )
-
-    with engine.connect() as conn:
-        df = pd.read_sql(q, conn)
-
-    if df.empty:
+    wide = returns_matrix(engine, tickers)
+    if wide.empty:
         return pd.DataFrame(columns=["date", "ticker", "ret"])
 
-    df["date"] = pd.to_datetime(df["date"])
-    df.sort_values(["ticker", "date"], inplace=True)
-    df["ret"] = df.groupby("ticker")["close"].pct_change()
-    df = df.dropna(subset=["ret"])
-    return df[["date", "ticker", "ret"]]
+    df = wide.stack().rename("ret").reset_index()
+    return df.sort_values(["ticker", "date"], ignore_index=True)[["date", "ticker", "ret"]]
 
 
-def news_intensity(engine) -> pd.DataFrame:
+def news_intensity(
+    engine,
+    start: date | datetime | str | None = None,
+    end: date | datetime | str | None = None,
+    sources: Iterable[str] | None = None,
+) -> pd.DataFrame:
     """Aggregate news intensity by day.
 
     The function counts the number of news items published per day and uses the
     length of ``summary_ai`` as a crude proxy for sentiment (higher value
     roughly corresponds to longer/"more positive" summaries).
+
+    The aggregation runs in SQL, so only one row per day is transferred: it
+    reads the ``news_daily`` rollup (see :mod:`mmw.rollups`) when that is up
+    to date and groups ``news`` by ``date(published_at)`` otherwise.
+    ``start`` and ``end`` restrict the result to an inclusive range of days
+    and ``sources`` to the given feed sources.
     """
 
-    q = select(News.published_at, News.summary_ai)
+    start = None if start is None else pd.Timestamp(start).normalize()
+    end = None if end is None else pd.Timestamp(end).normalize()
     with engine.connect() as conn:
+        if rollups_current(conn, "news"):
+            q = (
+                select(
+                    NewsDaily.date,
+                    func.sum(NewsDaily.news_count).label("news_count"),
+                    (
+                        func.sum(NewsDaily.summary_len) * 1.0 / func.sum(NewsDaily.news_count)
+                    ).label("avg_sentiment"),
+                )
+                .group_by(NewsDaily.date)
+                .order_by(NewsDaily.date)
+            )
+            if start is not None:
+                q = q.where(NewsDaily.date >= start.date())
+            if end is not None:
+                q = q.where(NewsDaily.date <= end.date())
+            if sources is not None:
+                q = q.where(NewsDaily.source.in_(list(sources)))
+        else:
+            day = func.date(News.published_at)
+            q = (
+                select(
+                    day.label("date"),
+                    func.count().label("news_count"),
+                    func.avg(func.coalesce(func.length(News.summary_ai), 0)).label(
+                        "avg_sentiment"
+                    ),
+                )
+                .where(News.published_at.is_not(None))
+                .group_by(day)
+                .order_by(day)
+            )
+            if start is not None:
+                q = q.where(News.published_at >= start.to_pydatetime())
+            if end is not None:
+                q = q.where(News.published_at < (end + pd.Timedelta(days=1)).to_pydatetime())
+            if sources is not None:
+                q = q.where(News.source.in_(list(sources)))
         df = pd.read_sql(q, conn)
 
     if df.empty:
         return pd.DataFrame(columns=["date", "news_count", "avg_sentiment"])
 
-    df["date"] = pd.to_datetime(df["published_at"]).dt.date
-    df["sent_len"] = df["summary_ai"].fillna("").str.len()
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["news_count"] = df["news_count"].astype(int)
+    df["avg_sentiment"] = df["avg_sentiment"].astype(float)
+    return df
+
+
+def ticker_news_counts(
+    engine,
+    start: date | datetime | str | None = None,
+    end: date | datetime | str | None = None,
+) -> pd.DataFrame:
+    """Count linked news per ticker over an inclusive range of days.
+
+    Reads the ``ticker_news_daily`` rollup when it is up to date and joins
+    ``links`` with ``news`` otherwise.  Returns ``ticker`` and
+    ``news_count`` sorted by descending count.
+    """
+
+    start = None if start is None else pd.Timestamp(start).normalize()
+    end = None if end is None else pd.Timestamp(end).normalize()
+    with engine.connect() as conn:
+        count: Label[Any]
+        q: Select
+        if rollups_current(conn, "news"):
+            count = func.sum(TickerNewsDaily.news_count).label("news_count")
+            q = select(TickerNewsDaily.ticker, count).group_by(
+                TickerNewsDaily.ticker
+            )
+            if start is not None:
+                q = q.where(TickerNewsDaily.date >= start.date())
+            if end is not None:
+                q = q.where(TickerNewsDaily.date <= end.date())
+        else:
+            count = func.count(func.distinct(News.id)).label("news_count")
+            q = (
+                select(Link.asset_ticker.label("ticker"), count)
+                .join(News, Link.news_id == News.id)
+                .where(Link.asset_ticker.is_not(None), News.published_at.is_not(None))
+                .group_by(Link.asset_ticker)
+            )
+            if start is not None:
+                q = q.where(News.published_at >= start.to_pydatetime())
+            if end is not None:
+                q = q.where(News.published_at < (end + pd.Timedelta(days=1)).to_pydatetime())
+        df = pd.read_sql(q.order_by(count.desc(), q.selected_columns[0]), conn)
+    df["news_count"] = df["news_count"].astype(int)
+    return df
+
+
+def price_snapshots(
+    engine, freq: str = "monthly", tickers: Iterable[str] | None = None
+) -> pd.DataFrame:
+    """Return the last close of each week or month per ticker.
 
-    agg = (
-        df.groupby("date").agg(
-            news_count=("summary_ai", "size"),
-            avg_sentiment=("sent_len", "mean"),
+    ``freq`` is ``"weekly"`` (periods keyed by Monday) or ``"monthly"``
+    (keyed by the first day).  Reads the ``price_weekly``/``price_monthly``
+    rollups when they are up to date and reduces raw prices otherwise.
+    Returns ``ticker``, ``period``, ``last_date`` and ``close``.
+    """
+
+    model = FREQUENCIES[freq]
+    tickers = None if tickers is None else list(tickers)
+    with engine.connect() as conn:
+        current = rollups_current(conn, "prices")
+        if current:
+            q = (
+                select(Asset.ticker, model.period, model.last_date, model.close)
+                .join(model, Asset.id == model.asset_id)
+                .order_by(Asset.ticker, model.period)
+            )
+            if tickers is not None:
+                q = q.where(Asset.ticker.in_(tickers))
+            df = pd.read_sql(q, conn)
+    if not current:
+        df = period_closes(read_prices(engine, tickers, columns=("close",)), freq)
+    df["period"] = pd.to_datetime(df["period"]).dt.date
+    df["last_date"] = pd.to_datetime(df["last_date"])
+    return df[["ticker", "period", "last_date", "close"]]
+
+
+@dataclass
+class RollingCorrelation:
+    """All pairwise rolling correlations of a (T x N) returns matrix.
+
+    ``values`` is either the full ``(T, N, N)`` array or, when computed with
+    ``upper=True``, the ``(T, N*(N-1)/2)`` upper triangle in
+    ``numpy.triu_indices(N, 1)`` order.  Entries are NaN until both series
+    have ``window`` complete observations, as with pandas ``rolling().corr``.
+    """
+
+    dates: pd.Index
+    tickers: List[str]
+    window: int
+    values: np.ndarray
+
+    @property
+    def is_upper(self) -> bool:
+        return self.values.ndim == 2
+
+    def upper(self) -> np.ndarray:
+        """Return the ``(T, N*(N-1)/2)`` upper-triangle view."""
+
+        if self.is_upper:
+            return self.values
+        i, j = np.triu_indices(len(self.tickers), 1)
+        return self.values[:, i, j]
+
+    def pair(self, a: str, b: str) -> pd.Series:
+        """Return the rolling correlation of tickers ``a`` and ``b``."""
+
+        i, j = sorted((self.tickers.index(a), self.tickers.index(b)))
+        if self.is_upper:
+            n = len(self.tickers)
+            col = i * n - i * (i + 1) // 2 + (j - i - 1)
+            values = self.values[:, col]
+        else:
+            values = self.values[:, i, j]
+        return pd.Series(values, index=self.dates, name=f"{a}-{b}")
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the tidy ``date``/``pair``/``corr`` frame of :func:`rolling_corr`."""
+
+        i, j = np.triu_indices(len(self.tickers), 1)
+        if len(i) == 0:
+            return pd.DataFrame(columns=["date", "pair", "corr"])
+        names = np.array(self.tickers, dtype=object)
+        labels = names[i] + "-" + names[j]
+        n_dates = len(self.dates)
+        return pd.DataFrame(
+            {
+                "date": np.tile(np.asarray(self.dates), len(labels)),
+                "pair": np.repeat(labels, n_dates),
+                "corr": self.upper().T.reshape(-1),
+            }
         )
-    ).reset_index()
-    return agg
+
+
+def rolling_corr_matrix(
+    x: np.ndarray, window: int = 30, upper: bool = False, block_bytes: int = 64 << 20
+) -> np.ndarray:
+    """Return every pairwise rolling correlation of the columns of ``x``.
+
+    Parameters
+    ----------
+    x:
+        ``(T, N)`` float array, NaN for missing observations.
+    window:
+        Rolling window size in rows; a correlation needs ``window`` complete
+        observations of both series (``min_periods=window``).
+    upper:
+        Return only the ``(T, N*(N-1)/2)`` upper triangle.
+    block_bytes:
+        Approximate memory budget for the per-block cross products.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(T, N, N)`` or ``(T, N*(N-1)/2)`` correlations.
+
+    Notes
+    -----
+    Window sums of ``x`` and of all cross products ``x_i * x_j`` are running
+    sums that add the newest row and drop the one leaving the window, so the
+    cost is two ``N x N`` outer products per row regardless of the window
+    length.  Columns are centred first to limit cancellation; rows are
+    processed in blocks so only ``block`` cross-product matrices are held at
+    a time.
+    """
+
+    x = np.asarray(x, dtype=float)
+    n_rows, n = x.shape
+    iu = np.triu_indices(n, 1)
+    out = np.full((n_rows, len(iu[0])) if upper else (n_rows, n, n), np.nan)
+    if n_rows < window or n == 0:
+        return out
+
+    valid = ~np.isnan(x)
+    with np.errstate(invalid="ignore"):
+        centre = np.where(valid.any(axis=0), np.nanmean(np.where(valid, x, np.nan), axis=0), 0.0)
+    z = np.where(valid, x - centre, 0.0)
+
+    def _window_sums(a: np.ndarray) -> np.ndarray:
+        c = np.cumsum(a, axis=0)
+        c[window:] = c[window:] - c[:-window]
+        return c[window - 1:]
+
+    full = _window_sums(valid.astype(np.int64)) == window  # (T - w + 1, N)
+    s1 = _window_sums(z)
+
+    # Window cross products telescope: S(t) = sum over s <= t of
+    # (z_s z_s' - z_{s-w} z_{s-w}'), accumulated block by block with a carry.
+    lagged = np.vstack([np.zeros((window, n)), z[:-window]])
+    carry = np.zeros((n, n))
+    block = max(1, block_bytes // (16 * n * n))
+    for a in range(0, n_rows, block):
+        b = min(n_rows, a + block)
+        za, zl = z[a:b], lagged[a:b]
+        sxy = za[:, :, None] * za[:, None, :]
+        sxy -= zl[:, :, None] * zl[:, None, :]
+        np.cumsum(sxy, axis=0, out=sxy)
+        sxy += carry
+        carry = sxy[-1].copy()
+        if b < window:
+            continue
+
+        skip = max(0, window - 1 - a)  # rows before the first full window
+        sxy = sxy[skip:]
+        r0, r1 = a + skip - window + 1, b - window + 1  # rows in ``full``/``s1``
+        s = s1[r0:r1]
+        cov = sxy - s[:, :, None] * s[:, None, :] / window
+        var = np.diagonal(cov, axis1=1, axis2=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.sqrt(var[:, :, None] * var[:, None, :])
+        ok = full[r0:r1]
+        corr[~(ok[:, :, None] & ok[:, None, :])] = np.nan
+        corr[~np.isfinite(corr)] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        out[a + skip:b] = corr[:, iu[0], iu[1]] if upper else corr
+    return out
+
+
+def rolling_corr_all(
+    ret_df: pd.DataFrame, window: int = 30, upper: bool = False
+) -> RollingCorrelation:
+    """Compute all pairwise rolling correlations of tidy daily returns at once.
+
+    Parameters
+    ----------
+    ret_df:
+        Data frame as returned by :func:`compute_daily_returns`.
+    window:
+        Rolling window size in days.
+    upper:
+        Keep only the upper triangle (half the memory).
+
+    Returns
+    -------
+    RollingCorrelation
+        Array result over the sorted dates and tickers of ``ret_df``.
+    """
+
+    wide = ret_df.pivot(index="date", columns="ticker", values="ret").sort_index()
+    return RollingCorrelation(
+        dates=wide.index,
+        tickers=[str(t) for t in wide.columns],
+        window=window,
+        values=rolling_corr_matrix(wide.to_numpy(dtype=float), window, upper=upper),
+    )
 
 
 def rolling_corr(ret_df: pd.DataFrame, window: int = 30) -> pd.DataFrame:
@@ -121,89 +434,159 @@ def rolling_corr(ret_df: pd.DataFrame, window: int = 30) -> pd.DataFrame:
     -------
     pandas.DataFrame
         Columns: ``date``, ``pair`` and ``corr`` where ``pair`` is a string
-        ``"TICKER1-TICKER2"``.
+        ``"TICKER1-TICKER2"``.  This is the tidy view of
+        :func:`rolling_corr_all`.
     """
 
     if ret_df.empty:
         return pd.DataFrame(columns=["date", "pair", "corr"])
+    return rolling_corr_all(ret_df, window, upper=True).to_frame()
 
-    wide = ret_df.pivot(index="date", columns="ticker", values="ret").sort_index()
 
-    pairs = list(combinations(wide.columns, 2))
-    frames = []
-    for a, b in pairs:
-        series = wide[a].rolling(window).corr(wide[b])
-        frames.append(
-            pd.DataFrame({"date": series.index, "pair": f"{a}-{b}", "corr": series.values})
-        )
+_EVENT_COLUMNS = ["rel_day", "abret_mean", "abret_std", "n_events"]
 
-    if not frames:
-        return pd.DataFrame(columns=["date", "pair", "corr"])
 
-    return pd.concat(frames, ignore_index=True)
+@dataclass
+class EventWindows:
+    """Abnormal returns around news events on a trading-day grid.
 
+    ``events`` has one row per (``ticker``, ``event_date``) with ``day0``,
+    the first trading day on or after the event.  ``abret`` is the
+    ``(events, len(rel_days))`` matrix of abnormal returns, NaN where a
+    window runs past the available history.
+    """
 
-def event_study(
-    engine, ticker: str, window: Tuple[int, int] = (-3, 3)
-) -> pd.DataFrame:
-    """Perform a simple event study for ``ticker`` around news events.
+    events: pd.DataFrame
+    rel_days: np.ndarray
+    abret: np.ndarray
+
+    def summary(self, by_ticker: bool = False) -> pd.DataFrame:
+        """Aggregate mean, std and count of abnormal returns per relative day."""
+
+        columns = (["ticker"] if by_ticker else []) + _EVENT_COLUMNS
+        if not len(self.events):
+            return pd.DataFrame(columns=columns)
+        long = pd.DataFrame(self.abret, columns=self.rel_days)
+        long["ticker"] = self.events["ticker"].to_numpy()
+        long = long.melt(id_vars="ticker", var_name="rel_day", value_name="abret")
+        keys = (["ticker"] if by_ticker else []) + ["rel_day"]
+        agg = long.groupby(keys)["abret"].agg(
+            [("abret_mean", "mean"), ("abret_std", "std"), ("n_events", "count")]
+        )
+        agg = agg[agg["n_events"] > 0].reset_index()
+        agg["rel_day"] = agg["rel_day"].astype(int)
+        return agg[columns]
 
-    For each day with at least one linked news item for ``ticker`` an event
-    window is extracted from daily returns.  Abnormal returns are computed as
-    the difference between the ticker return and the equal-weight mean of all
-    watchlist tickers.  The function returns aggregated abnormal returns over
-    all events.
-    """
 
-    # Compute returns for baseline and target ticker
-    ret_df = compute_daily_returns(engine, WATCHLIST_TICKERS)
-    if ret_df.empty:
-        return pd.DataFrame(columns=["rel_day", "abret_mean", "abret_std", "n_events"])
+def event_windows(
+    engine, tickers: Iterable[str], window: Tuple[int, int] = (-3, 3)
+) -> EventWindows:
+    """Gather event windows of abnormal returns for many tickers at once.
 
-    market = ret_df.groupby("date")["ret"].mean().rename("mkt_ret").reset_index()
-    ticker_ret = ret_df[ret_df["ticker"] == ticker][["date", "ret"]].rename(
-        columns={"ret": "ret_ticker"}
-    )
+    Parameters
+    ----------
+    engine:
+        SQLAlchemy engine connected to the project database.
+    tickers:
+        Tickers whose linked news days are treated as events.
+    window:
+        Inclusive ``(first, last)`` offsets in trading days around day 0.
 
-    merged = ticker_ret.merge(market, on="date", how="left")
-    merged["abret"] = merged["ret_ticker"] - merged["mkt_ret"]
+    Returns
+    -------
+    EventWindows
+        Event table and ``(events x window)`` abnormal-return matrix.
+
+    Notes
+    -----
+    Abnormal returns are the ticker return minus the equal-weight mean of
+    the watchlist returns.  Event dates are placed on the trading-day grid
+    with ``searchsorted`` (news on a weekend or holiday maps to the next
+    trading day) and all windows are gathered with one fancy-indexing
+    operation, so windows always span the same number of trading days.
+    """
 
-    # Determine event dates from news links
-    q = (
-        select(News.published_at)
-        .join(Link, Link.news_id == News.id)
-        .where(Link.asset_ticker == ticker)
+    tickers = list(dict.fromkeys(tickers))
+    rel_days = np.arange(window[0], window[1] + 1)
+    empty = EventWindows(
+        pd.DataFrame(columns=["ticker", "event_date", "day0"]),
+        rel_days,
+        np.empty((0, len(rel_days))),
+    )
+    if not tickers:
+        return empty
+
+    wide = returns_matrix(engine, [*WATCHLIST_TICKERS, *tickers])
+    if wide.empty:
+        return empty
+    market = wide[[t for t in WATCHLIST_TICKERS if t in wide.columns]].mean(axis=1)
+    abret = wide.sub(market, axis=0)
+
+    q: Select = (
+        select(Link.asset_ticker, News.published_at)
+        .join(News, Link.news_id == News.id)
+        .where(Link.asset_ticker.in_(tickers), News.published_at.is_not(None))
     )
     with engine.connect() as conn:
         news_df = pd.read_sql(q, conn)
-
+    news_df = news_df[news_df["asset_ticker"].isin(abret.columns)]
     if news_df.empty:
-        return pd.DataFrame(columns=["rel_day", "abret_mean", "abret_std", "n_events"])
+        return empty
+
+    events = pd.DataFrame(
+        {
+            "ticker": news_df["asset_ticker"].to_numpy(),
+            "event_date": pd.to_datetime(news_df["published_at"]).dt.normalize().to_numpy(),
+        }
+    ).drop_duplicates().sort_values(["ticker", "event_date"], ignore_index=True)
+
+    grid = pd.DatetimeIndex(abret.index)
+    day0 = grid.searchsorted(pd.DatetimeIndex(events["event_date"]), side="left")
+    keep = day0 < len(grid)
+    events = events[keep].reset_index(drop=True)
+    day0 = day0[keep]
+    events["day0"] = grid[day0]
+
+    rows = day0[:, None] + rel_days[None, :]
+    inside = (rows >= 0) & (rows < len(grid))
+    cols = abret.columns.get_indexer(events["ticker"])
+    matrix = abret.to_numpy()[np.clip(rows, 0, len(grid) - 1), cols[:, None]]
+    matrix[~inside] = np.nan
+    return EventWindows(events, rel_days, matrix)
+
+
+def event_study_many(
+    engine, tickers: Iterable[str] | None = None, window: Tuple[int, int] = (-3, 3)
+) -> pd.DataFrame:
+    """Run :func:`event_study` for many tickers in one pass.
 
-    event_dates = pd.to_datetime(news_df["published_at"]).dt.date.unique()
+    ``tickers`` defaults to the watchlist.  Returns the aggregate with a
+    leading ``ticker`` column.
+    """
 
-    frames = []
-    merged.set_index("date", inplace=True)
-    for ed in event_dates:
-        start = pd.to_datetime(ed) + pd.Timedelta(days=window[0])
-        end = pd.to_datetime(ed) + pd.Timedelta(days=window[1])
-        sub = merged.loc[start:end].copy()
-        if sub.empty:
-            continue
-        sub["rel_day"] = (sub.index.date - ed).astype("timedelta64[D]").astype(int)
-        frames.append(sub[["rel_day", "abret"]])
+    tickers = list(tickers) if tickers else list(WATCHLIST_TICKERS)
+    agg = event_windows(engine, tickers, window).summary(by_ticker=True)
+    if not agg.empty:
+        _save_run(engine, "event_study", agg)
+    return agg
 
-    if not frames:
-        return pd.DataFrame(columns=["rel_day", "abret_mean", "abret_std", "n_events"])
 
-    events = pd.concat(frames, ignore_index=True)
-    agg = (
-        events.groupby("rel_day")["abret"].agg([
-            ("abret_mean", "mean"),
-            ("abret_std", "std"),
-            ("n_events", "count"),
-        ])
-    ).reset_index()
+def event_study(
+    engine, ticker: str, window: Tuple[int, int] = (-3, 3)
+) -> pd.DataFrame:
+    """Perform a simple event study for ``ticker`` around news events.
+
+    For each day with at least one linked news item for ``ticker`` an event
+    window of trading days is extracted from daily returns (see
+    :func:`event_windows`).  Abnormal returns are computed as the difference
+    between the ticker return and the equal-weight mean of all watchlist
+    tickers.  The function returns aggregated abnormal returns over all
+    events.
+    """
+
+    agg = event_windows(engine, [ticker], window).summary()
+    if agg.empty:
+        return pd.DataFrame(columns=_EVENT_COLUMNS)
 
     _save_run(engine, f"event_study_{ticker}", agg)
     return agg
@@ -211,8 +594,16 @@ def event_study(
 
 __all__ = [
     "compute_daily_returns",
+    "returns_matrix",
     "news_intensity",
+    "ticker_news_counts",
+    "price_snapshots",
     "rolling_corr",
+    "rolling_corr_all",
+    "rolling_corr_matrix",
+    "RollingCorrelation",
     "event_study",
+    "event_study_many",
+    "event_windows",
+    "EventWindows",
 ]
-
@@ -0,0 +1,239 @@
+"""Asyncio ingestion runner for prices, indices and news.
+
+Network fetches (RSS feeds, index scrapers, yfinance chunks) run concurrently
+in worker threads under one global concurrency limit.  Results are handed to
+a single writer task through a bounded queue; the writer owns the only
+``aiosqlite`` connection and applies the same upserts as the synchronous
+ingest paths, so SQLite never sees concurrent writers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+import aiosqlite
+import pandas as pd
+
+from . import fetch, indices, news, prices
+from .config import ASYNC_CONCURRENCY, DB_PATH, PRICE_BACKOFF, PRICE_CHUNK_SIZE, PRICE_RETRIES
+from .db import (
+    BUMP_CHECKPOINT_SQL,
+    PRICES_VERSION,
+    Asset,
+    HttpValidator,
+    Index,
+    IndexPoint,
+    News,
+    Price,
+    chunked,
+    compile_upsert,
+    pragma_statements,
+)
+
+logger = logging.getLogger(__name__)
+
+_PRICE_UPSERT = compile_upsert(
+    Price,
+    ["asset_id", "date", "open", "high", "low", "close", "volume"],
+    ["asset_id", "date"],
+)
+_NEWS_UPSERT = compile_upsert(
+    News, ["url", "title", "summary", "source", "published_at"], ["url"]
+)
+_INDEX_POINT_UPSERT = compile_upsert(IndexPoint, ["index_id", "date", "value"], ["index_id", "date"])
+_ASSET_INSERT = compile_upsert(Asset, ["ticker"], ["ticker"], [])
+_INDEX_INSERT = compile_upsert(Index, ["code"], ["code"], [])
+_VALIDATOR_UPSERT = compile_upsert(
+    HttpValidator, ["url", "etag", "last_modified", "checked_at"], ["url"]
+)
+
+
+async def _executemany(db: aiosqlite.Connection, upsert, rows: List[dict]) -> int:
+    sql, params = upsert
+    for chunk in chunked(rows):
+        await db.executemany(sql, [params(r) for r in chunk])
+    return len(rows)
+
+
+async def _select_in(
+    db: aiosqlite.Connection, sql: str, values: List[str]
+) -> List[Tuple[Any, ...]]:
+    """Run ``sql`` (ending in ``IN``) for ``values`` in chunks."""
+
+    out: List[Tuple[Any, ...]] = []
+    for chunk in chunked(values):
+        placeholders = ", ".join("?" * len(chunk))
+        async with db.execute(f"{sql} ({placeholders})", list(chunk)) as cur:
+            out.extend(await cur.fetchall())
+    return out
+
+
+async def _resolve_ids(
+    db: aiosqlite.Connection, model, key: str, insert, values: Iterable[str]
+) -> Dict[str, int]:
+    wanted = sorted({str(v) for v in values})
+    await _executemany(db, insert, [{key: v} for v in wanted])
+    table = model.__tablename__
+    rows = await _select_in(db, f"SELECT {key}, id FROM {table} WHERE {key} IN", wanted)
+    return {k: i for k, i in rows}
+
+
+async def _write_prices(db: aiosqlite.Connection, df: pd.DataFrame) -> int:
+    df = df.dropna(subset=["ticker", "date"])
+    if df.empty:
+        return 0
+    ids = await _resolve_ids(db, Asset, "ticker", _ASSET_INSERT, df["ticker"].unique())
+    written = await _executemany(db, _PRICE_UPSERT, prices.price_records(df, ids))
+    await db.execute(BUMP_CHECKPOINT_SQL, (PRICES_VERSION, str(datetime.utcnow())))
+    return written
+
+
+async def _write_news(db: aiosqlite.Connection, df: pd.DataFrame) -> int:
+    records = news.news_records(df)
+    urls = [r["url"] for r in records]
+    existing = {u for (u,) in await _select_in(db, "SELECT url FROM news WHERE url IN", urls)}
+    await _executemany(db, _NEWS_UPSERT, records)
+    return len(set(urls) - existing)
+
+
+async def _write_index_points(db: aiosqlite.Connection, df: pd.DataFrame) -> int:
+    frame = indices.index_frame(df)
+    ids = await _resolve_ids(db, Index, "code", _INDEX_INSERT, frame["index_code"].unique())
+    return await _executemany(db, _INDEX_POINT_UPSERT, indices.index_point_records(frame, ids))
+
+
+_WRITERS: Dict[str, Callable[[aiosqlite.Connection, pd.DataFrame], Awaitable[int]]] = {
+    "prices": _write_prices,
+    "news": _write_news,
+    "index_points": _write_index_points,
+}
+
+
+async def _writer(queue: asyncio.Queue, db_path: Path, stats: Dict[str, Any]) -> None:
+    """Drain ``queue`` into the database, one transaction per item.
+
+    HTTP validators in a frame's ``attrs["validators"]`` are stored in the
+    same transaction as its rows, so a failed write is fetched again in full.
+    """
+
+    async with aiosqlite.connect(str(db_path)) as db:
+        for stmt in pragma_statements("ingest"):
+            await db.execute(stmt)
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            kind, df = item
+            if df is None:
+                continue
+            validators = df.attrs.get("validators")
+            if df.empty and not validators:
+                continue
+            try:
+                if not df.empty:
+                    stats[kind] += await _WRITERS[kind](db, df)
+                if validators:
+                    await _executemany(db, _VALIDATOR_UPSERT, [validators])
+                await db.commit()
+            except Exception as exc:
+                await db.rollback()
+                logger.error("Async write of %d %s rows failed: %s", len(df), kind, exc)
+
+
+async def run_async_ingest(
+    since: str | None = None,
+    full: bool = False,
+    concurrency: int | None = None,
+    db_path: Path | str | None = None,
+) -> Dict[str, Any]:
+    """Fetch prices, indices and news concurrently and store them.
+
+    ``since``/``full`` have the same meaning as for
+    :func:`mmw.prices.refresh_watchlist_prices`.  Returns written row counts
+    per table (new articles for ``news``) and the tickers that failed.  If
+    the writer task fails (e.g. the database cannot be opened) the fetches
+    are cancelled and its exception is raised.
+    """
+
+    concurrency = concurrency or ASYNC_CONCURRENCY
+    sem = asyncio.Semaphore(concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    stats: Dict[str, Any] = {"prices": 0, "news": 0, "index_points": 0, "failed_tickers": []}
+    writer = asyncio.create_task(_writer(queue, Path(db_path or DB_PATH), stats))
+
+    async def _fetch(fn, *args):
+        async with sem:
+            return await asyncio.to_thread(fn, *args)
+
+    async def _prices_chunk(chunk: List[str], start: str) -> None:
+        df, failed = await _fetch(
+            prices.fetch_price_chunk, chunk, start, None, PRICE_RETRIES, PRICE_BACKOFF
+        )
+        stats["failed_tickers"].extend(failed)
+        await queue.put(("prices", df))
+
+    async def _feed(url: str) -> None:
+        items, validators = await _fetch(news.fetch_rss, url)
+        df = news.normalize_news(items)
+        df.attrs["validators"] = validators
+        await queue.put(("news", df))
+
+    async def _scraper(fn) -> None:
+        try:
+            df = await _fetch(fn)
+        except fetch.CacheMiss:
+            raise
+        except Exception as exc:  # pragma: no cover - network
+            logger.warning("scraper %s failed: %s", fn.__name__, exc)
+            return
+        await queue.put(("index_points", df))
+
+    async def _csv() -> None:
+        await queue.put(("index_points", await asyncio.to_thread(indices.load_indices_csv)))
+
+    before = fetch.conditional_stats()
+    groups = await asyncio.to_thread(prices.plan_refresh, since, full)
+    tasks = [
+        _prices_chunk(tickers[i : i + PRICE_CHUNK_SIZE], start)
+        for start, tickers in groups.items()
+        for i in range(0, len(tickers), PRICE_CHUNK_SIZE)
+    ]
+    tasks += [_csv()] + [_scraper(fn) for fn in indices.SCRAPERS]
+    tasks += [_feed(url) for url in news.RSS_FEEDS]
+    producers = asyncio.gather(*tasks)
+    try:
+        await asyncio.wait({producers, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if writer.done():
+            # the writer only returns after the sentinel, so it has failed and
+            # producers blocked on the full queue would wait forever
+            producers.cancel()
+            await asyncio.gather(producers, return_exceptions=True)
+        else:
+            await producers
+    finally:
+        if not writer.done():
+            sentinel = asyncio.ensure_future(queue.put(None))
+            await asyncio.wait({sentinel, writer}, return_when=asyncio.FIRST_COMPLETED)
+            sentinel.cancel()
+        await writer
+
+    logger.info(
+        "Async ingest: %d price rows, %d index points, %d new articles",
+        stats["prices"],
+        stats["index_points"],
+        stats["news"],
+    )
+    fetch.log_conditional_hits("Feeds and index pages", before)
+    if stats["failed_tickers"]:
+        logger.warning("Failed tickers: %s", ", ".join(sorted(stats["failed_tickers"])))
+    return stats
+
+
+def ingest(**kwargs: Any) -> Dict[str, Any]:
+    """Synchronous wrapper around :func:`run_async_ingest`."""
+
+    return asyncio.run(run_async_ingest(**kwargs))
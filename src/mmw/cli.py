@@ -6,31 +6,73 @@ from pathlib import Path
 
 import click
 
-from .analytics import compute_daily_returns, event_study, news_intensity
-from .config import WATCHLIST_TICKERS
-from .db import engine
+from .analytics import compute_daily_returns, event_study_many, news_intensity
+from .async_ingest import ingest
+from .columnar import sync_mirror
+from .config import PRICE_SOURCE, WATCHLIST_TICKERS
+from .db import engine, init_db
+from .fetch import CACHE_MODES, configure as configure_http_cache
 from .indices import import_indices_from_csv, refresh_indices
 from .linker import link_news
 from .news import refresh_news
-from .nlp import enrich_news
+from .nlp import enrich_backlog, enrich_news
+from .nlp_worker import serve as serve_nlp_worker, stop as stop_nlp_worker
 from .prices import refresh_watchlist_prices
 from .report import build_site
+from .rollups import refresh_rollups
 
 
 @click.group()
-def cli() -> None:
+@click.option(
+    "--http-cache",
+    type=click.Choice(CACHE_MODES),
+    default=None,
+    help="Record network responses to disk or replay them offline (default: $MMW_HTTP_CACHE).",
+)
+@click.option(
+    "--http-cache-dir",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Directory for recorded responses (default: $MMW_HTTP_CACHE_DIR).",
+)
+def cli(http_cache: str | None, http_cache_dir: Path | None) -> None:
     """MMW command line utilities."""
 
+    configure_http_cache(http_cache, http_cache_dir)
+
 
 @cli.command("refresh-all")
-def refresh_all() -> None:
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Ignore stored high-water marks: re-download full price history and relink all news.",
+)
+@click.option(
+    "--since",
+    default=None,
+    help="Start date YYYY-MM-DD for tickers without stored prices.",
+)
+@click.option(
+    "--async",
+    "use_async",
+    is_flag=True,
+    help="Fetch all sources concurrently and write through one aiosqlite writer.",
+)
+def refresh_all(full: bool, since: str | None, use_async: bool) -> None:
     """Refresh prices, indices and news."""
 
-    refresh_watchlist_prices()
-    refresh_indices()
-    refresh_news()
+    init_db()
+    if use_async:
+        ingest(since=since, full=full)
+    else:
+        refresh_watchlist_prices(since=since, full=full)
+        refresh_indices()
+        refresh_news()
+    if PRICE_SOURCE == "columnar":
+        sync_mirror(engine)
     enrich_news()
-    link_news()
+    link_news(full=full)
+    refresh_rollups(engine)
     click.echo("Data refreshed")
 
 
@@ -44,15 +86,102 @@ def refresh_all() -> None:
 def import_indices_cmd(path: Path) -> None:
     """Import indices from a CSV file into the database."""
 
+    init_db()
     import_indices_from_csv(path)
     click.echo(f"Imported indices from {path}")
 
 
+@cli.command("link")
+@click.option("--full", is_flag=True, help="Relink every article, not only new or changed ones.")
+def link_cmd(full: bool) -> None:
+    """Link news articles to tickers and indices."""
+
+    init_db()
+    n = link_news(engine, full=full)
+    click.echo(f"Linked {n} articles")
+
+
+@cli.command("rollups")
+@click.option("--full", is_flag=True, help="Rebuild the rollup tables from scratch.")
+def rollups_cmd(full: bool) -> None:
+    """Update daily news and weekly/monthly price rollups."""
+
+    init_db()
+    stats = refresh_rollups(engine, full=full)
+    click.echo(
+        f"Refreshed {stats['news_days']} news days, {stats['price_assets']} price assets"
+    )
+
+
+@cli.command("enrich-backlog")
+@click.option(
+    "--chunk-size",
+    type=int,
+    default=None,
+    help="Articles per id-range chunk (default: $MMW_ENRICH_CHUNK_SIZE).",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Worker processes (default: $MMW_ENRICH_WORKERS).",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="Ignore the checkpoint and start from the lowest pending id.",
+)
+def enrich_backlog_cmd(chunk_size: int | None, workers: int | None, restart: bool) -> None:
+    """Summarize and extract entities for every pending article, resumably."""
+
+    init_db()
+    n = enrich_backlog(engine, chunk_size=chunk_size, workers=workers, restart=restart)
+    click.echo(f"Enriched {n} articles")
+
+
+@cli.command("nlp-worker")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Unix socket to listen on (default: $MMW_NLP_SOCKET).",
+)
+@click.option("--stop", "stop_worker", is_flag=True, help="Stop a running worker.")
+def nlp_worker_cmd(socket_path: Path | None, stop_worker: bool) -> None:
+    """Keep the NLP pipeline loaded and serve enrichment batches."""
+
+    if stop_worker:
+        stop_nlp_worker(socket_path)
+        click.echo("NLP worker stopped")
+        return
+    try:
+        serve_nlp_worker(socket_path)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+
+
+@cli.command("sync-columnar")
+def sync_columnar_cmd() -> None:
+    """Update the Parquet mirror of prices and index points."""
+
+    stats = sync_mirror(engine)
+    click.echo(
+        ", ".join(f"{kind}: {n} partitions updated" for kind, n in stats.items())
+    )
+
+
 @cli.command("build-site")
-def build_site_cmd() -> None:
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Chart rendering processes (default: $MMW_REPORT_WORKERS_PER_CORE x CPUs, at least 1).",
+)
+def build_site_cmd(workers: int | None) -> None:
     """Build static report site into docs/."""
 
-    build_site()
+    build_site(workers=workers)
     click.echo("Site generated in docs/")
 
 
@@ -86,11 +215,13 @@ def analyze_returns(tickers: tuple[str, ...]) -> None:
 
 
 @analyze.command("event-study")
-@click.argument("ticker")
-def analyze_event_study(ticker: str) -> None:
-    """Run event study around news events for TICKER."""
+@click.argument("tickers", nargs=-1)
+@click.option("--before", default=3, show_default=True, help="Trading days before the event.")
+@click.option("--after", default=3, show_default=True, help="Trading days after the event.")
+def analyze_event_study(tickers: tuple[str, ...], before: int, after: int) -> None:
+    """Run event study around news events for TICKERS (default: watchlist)."""
 
-    df = event_study(engine, ticker)
+    df = event_study_many(engine, tickers or WATCHLIST_TICKERS, window=(-before, after))
     if df.empty:
         click.echo("No data found")
     else:
@@ -98,10 +229,15 @@ def analyze_event_study(ticker: str) -> None:
 
 
 @analyze.command("news-intensity")
-def analyze_news_intensity() -> None:
+@click.option("--start", default=None, help="First day YYYY-MM-DD.")
+@click.option("--end", default=None, help="Last day YYYY-MM-DD (inclusive).")
+@click.option("--source", "sources", multiple=True, help="Only news from this source.")
+def analyze_news_intensity(
+    start: str | None, end: str | None, sources: tuple[str, ...]
+) -> None:
     """Aggregate news intensity by day."""
 
-    df = news_intensity(engine)
+    df = news_intensity(engine, start=start, end=end, sources=sources or None)
     if df.empty:
         click.echo("No data found")
     else:
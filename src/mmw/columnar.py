@@ -0,0 +1,309 @@
+"""Columnar Parquet mirror of price history and index points.
+
+The mirror lives under ``COLUMNAR_DIR`` as hive-partitioned Parquet files::
+
+    prices/ticker=ZIM/year=2024/data.parquet
+    index_points/code=SCFI/year=2024/data.parquet
+
+A manifest stores a fingerprint per partition: the row count, the max date
+and, for every mirrored column, its sum and its sum weighted by day of year
+(so revisions that cancel out between rows still change it).
+:func:`sync_mirror` recomputes fingerprints with one grouped query per table
+and rewrites only partitions whose fingerprint changed.
+
+:func:`read_prices` and :func:`read_index_points` are the read path used by
+analytics and the report.  With ``MMW_PRICE_SOURCE=columnar`` they open the
+mirror memory-mapped and apply column projection and date predicates in
+Arrow; otherwise (or while no mirror exists) they query SQL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from sqlalchemy import Integer, cast, func, select
+
+from .config import COLUMNAR_DIR, PRICE_SOURCE
+from .db import Asset, Index, IndexPoint, Price
+from .utils import ensure_dirs
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+# kind -> (parent model, key column, child model, foreign key, partition name,
+#          value columns)
+_SPECS: Dict[str, Tuple[Any, Any, Any, Any, str, Tuple[str, ...]]] = {
+    "prices": (Asset, Asset.ticker, Price, Price.asset_id, "ticker", PRICE_FIELDS),
+    "index_points": (Index, Index.code, IndexPoint, IndexPoint.index_id, "code", ("value",)),
+}
+
+MANIFEST = "manifest.json"
+
+
+# ---------------------------------------------------------------------------
+# maintenance
+# ---------------------------------------------------------------------------
+
+def _load_manifest(root: Path) -> Dict[str, Dict[str, List[Any]]]:
+    path = root / MANIFEST
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_manifest(root: Path, manifest: Dict[str, Dict[str, List[Any]]]) -> None:
+    ensure_dirs(root)
+    tmp = root / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, root / MANIFEST)
+
+
+def _partition_dir(root: Path, kind: str, key: str, year: int) -> Path:
+    name = _SPECS[kind][4]
+    return root / kind / f"{name}={quote(key, safe='')}" / f"year={year}"
+
+
+def _checksums(child, fields: Sequence[str]) -> List[Any]:
+    """Return the count, max date and per-column sums fingerprinting rows."""
+
+    day = cast(func.strftime("%j", child.date), Integer)
+    sums = []
+    for f in fields:
+        col = getattr(child, f)
+        sums += [func.total(col), func.total(col * day)]
+    return [func.count(), func.max(child.date), *sums]
+
+
+def _fingerprint(n, last, *sums) -> List[Any]:
+    return [n, str(last), *(round(total, 6) for total in sums)]
+
+
+def _fingerprints(conn, kind: str) -> Dict[str, List[Any]]:
+    """Return ``{"<key>/<year>": fingerprint}`` (see the module docstring)."""
+
+    parent, key, child, fk, _, fields = _SPECS[kind]
+    year = func.strftime("%Y", child.date)
+    q = (
+        select(key, year, *_checksums(child, fields))
+        .join(child, parent.id == fk)
+        .group_by(fk, year)
+    )
+    return {f"{k}/{int(y)}": _fingerprint(*rest) for k, y, *rest in conn.execute(q)}
+
+
+def series_fingerprints(
+    engine, kind: str, fields: Sequence[str] | None = None
+) -> Dict[str, List[Any]]:
+    """Return ``{key: fingerprint}`` for whole series.
+
+    ``fields`` limits the fingerprinted columns (default: all mirrored ones).
+    """
+
+    parent, key, child, fk, _, all_fields = _SPECS[kind]
+    q = (
+        select(key, *_checksums(child, fields or all_fields))
+        .join(child, parent.id == fk)
+        .group_by(fk)
+    )
+    with engine.connect() as conn:
+        return {k: _fingerprint(*rest) for k, *rest in conn.execute(q)}
+
+
+def _write_partition(root: Path, kind: str, key: str, year: int, df: pd.DataFrame) -> None:
+    path = _partition_dir(root, kind, key, year)
+    ensure_dirs(path)
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    tmp = path / "data.parquet.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path / "data.parquet")
+
+
+def sync_mirror(engine, root: Path | str | None = None) -> Dict[str, int]:
+    """Bring the Parquet mirror in line with the database.
+
+    Returns the number of rewritten or removed partitions per table.
+    """
+
+    root = Path(root or COLUMNAR_DIR)
+    manifest = _load_manifest(root)
+    stats: Dict[str, int] = {}
+    with engine.connect() as conn:
+        for kind, (parent, key, child, fk, _, fields) in _SPECS.items():
+            current = _fingerprints(conn, kind)
+            previous = manifest.get(kind, {})
+            changed: Dict[str, List[int]] = {}
+            for part, fp in current.items():
+                if previous.get(part) != fp:
+                    k, y = part.rsplit("/", 1)
+                    changed.setdefault(k, []).append(int(y))
+
+            for k, years in changed.items():
+                q = (
+                    select(child.date, *[getattr(child, f) for f in fields])
+                    .join(parent, parent.id == fk)
+                    .where(key == k, child.date >= datetime(min(years), 1, 1))
+                    .order_by(child.date)
+                )
+                df = pd.read_sql(q, conn)
+                df["date"] = pd.to_datetime(df["date"])
+                for y, part_df in df.groupby(df["date"].dt.year):
+                    if int(y) in years:
+                        _write_partition(root, kind, k, int(y), part_df)
+
+            removed = [part for part in previous if part not in current]
+            for part in removed:
+                k, y = part.rsplit("/", 1)
+                shutil.rmtree(_partition_dir(root, kind, k, int(y)), ignore_errors=True)
+
+            manifest[kind] = current
+            stats[kind] = sum(len(y) for y in changed.values()) + len(removed)
+    _save_manifest(root, manifest)
+    logger.info(
+        "Columnar mirror synced: %s",
+        ", ".join(f"{kind} {n} partitions" for kind, n in stats.items()),
+    )
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# read path
+# ---------------------------------------------------------------------------
+
+def _use_mirror(kind: str, root: Path, source: str | None) -> bool:
+    return (source or PRICE_SOURCE) == "columnar" and (root / kind).exists()
+
+
+def mirror_version(
+    kind: str = "prices", source: str | None = None, root: Path | str | None = None
+) -> str | None:
+    """Return a hash of ``kind``'s manifest fingerprints if reads use the mirror.
+
+    Returns ``None`` when reads of ``kind`` go to SQL.
+    """
+
+    root = Path(root or COLUMNAR_DIR)
+    if not _use_mirror(kind, root, source):
+        return None
+    payload = json.dumps(_load_manifest(root).get(kind, {}), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _read_mirror(
+    kind: str,
+    root: Path,
+    keys: Sequence[str] | None,
+    columns: Sequence[str],
+    start: datetime | None,
+    end: datetime | None,
+) -> pd.DataFrame:
+    name = _SPECS[kind][4]
+    partitioning = ds.partitioning(
+        pa.schema([(name, pa.string()), ("year", pa.int32())]), flavor="hive"
+    )
+    dataset = ds.dataset(
+        str(root / kind),
+        format="parquet",
+        partitioning=partitioning,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+    cond = None
+
+    def _and(expr):
+        return expr if cond is None else cond & expr
+
+    if keys is not None:
+        cond = _and(ds.field(name).isin(list(keys)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        cond = _and((ds.field("year") >= start.year) & (ds.field("date") >= start))
+    if end is not None:
+        end = pd.Timestamp(end)
+        cond = _and((ds.field("year") <= end.year) & (ds.field("date") <= end))
+    table = dataset.to_table(columns=[name, "date", *columns], filter=cond)
+    df = table.to_pandas()
+    return df.sort_values([name, "date"], ignore_index=True)
+
+
+def _read_sql(
+    kind: str,
+    engine,
+    keys: Sequence[str] | None,
+    columns: Sequence[str],
+    start: datetime | None,
+    end: datetime | None,
+) -> pd.DataFrame:
+    parent, key, child, fk, name, _ = _SPECS[kind]
+    q = (
+        select(key.label(name), child.date, *[getattr(child, c) for c in columns])
+        .join(child, parent.id == fk)
+        .order_by(key, child.date)
+    )
+    if keys is not None:
+        q = q.where(key.in_(list(keys)))
+    if start is not None:
+        q = q.where(child.date >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        q = q.where(child.date <= pd.Timestamp(end).to_pydatetime())
+    with engine.connect() as conn:
+        df = pd.read_sql(q, conn)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _read(kind, engine, keys, columns, start, end, source, root) -> pd.DataFrame:
+    root = Path(root or COLUMNAR_DIR)
+    keys = None if keys is None else list(keys)
+    if _use_mirror(kind, root, source):
+        return _read_mirror(kind, root, keys, columns, start, end)
+    return _read_sql(kind, engine, keys, columns, start, end)
+
+
+def read_prices(
+    engine,
+    tickers: Iterable[str] | None = None,
+    columns: Sequence[str] = PRICE_FIELDS,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    source: str | None = None,
+    root: Path | str | None = None,
+) -> pd.DataFrame:
+    """Return ``ticker``, ``date`` and ``columns`` sorted by ticker and date.
+
+    ``source`` overrides ``MMW_PRICE_SOURCE`` (``"sql"`` or ``"columnar"``).
+    """
+
+    return _read("prices", engine, tickers, columns, start, end, source, root)
+
+
+def read_index_points(
+    engine,
+    codes: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    source: str | None = None,
+    root: Path | str | None = None,
+) -> pd.DataFrame:
+    """Return ``code``, ``date`` and ``value`` sorted by code and date."""
+
+    return _read("index_points", engine, codes, ("value",), start, end, source, root)
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    from .db import engine as default_engine
+
+    logging.basicConfig(level=logging.INFO)
+    sync_mirror(default_engine)
@@ -43,3 +43,95 @@ if extra:
 DATA_DIR = Path("data")
 DB_PATH = DATA_DIR / "mmw.sqlite"
 DOCS_DIR = Path("docs")
+
+# SQLite connection profiles: PRAGMA name -> value, applied on every connect.
+# ``ingest`` favours write throughput, ``report`` opens read-only connections
+# that can run while a refresh is writing, ``test`` trades durability for speed.
+_FAST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative values are KiB
+}
+DB_PROFILES = {
+    "ingest": {**_FAST_PRAGMAS, "cache_size": -256 * 1024, "busy_timeout": 30000},
+    "report": {**_FAST_PRAGMAS, "busy_timeout": 10000, "query_only": "ON"},
+    "test": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "temp_store": "MEMORY",
+        "busy_timeout": 1000,
+    },
+}
+DB_PROFILE = os.getenv("MMW_DB_PROFILE", "ingest")
+
+# Days re-fetched before each ticker's latest stored bar to pick up revisions.
+PRICE_OVERLAP_DAYS = int(os.getenv("MMW_PRICE_OVERLAP_DAYS", "5"))
+# History downloaded for tickers without any stored prices.
+PRICE_HISTORY_YEARS = 3
+
+# Chunked price downloads: tickers per yf.download call, concurrent chunks,
+# retries per chunk and base backoff in seconds (doubled on each retry).
+PRICE_CHUNK_SIZE = int(os.getenv("MMW_PRICE_CHUNK_SIZE", "50"))
+PRICE_WORKERS = int(os.getenv("MMW_PRICE_WORKERS", "4"))
+PRICE_RETRIES = int(os.getenv("MMW_PRICE_RETRIES", "2"))
+PRICE_BACKOFF = float(os.getenv("MMW_PRICE_BACKOFF", "2.0"))
+
+# Record/replay cache for network responses (see mmw.fetch).
+HTTP_CACHE_MODE = os.getenv("MMW_HTTP_CACHE", "off")
+HTTP_CACHE_DIR = Path(os.getenv("MMW_HTTP_CACHE_DIR", str(DATA_DIR / "http_cache")))
+
+# Parquet mirror of prices/index points (see mmw.columnar); analytics and the
+# report read it instead of SQL when MMW_PRICE_SOURCE=columnar.
+COLUMNAR_DIR = Path(os.getenv("MMW_COLUMNAR_DIR", str(DATA_DIR / "columnar")))
+PRICE_SOURCE = os.getenv("MMW_PRICE_SOURCE", "sql")
+
+# Returns matrices kept in memory by mmw.returns_cache, and the directory they
+# are persisted to between runs (set MMW_RETURNS_CACHE_DIR="" to disable).
+RETURNS_CACHE_SIZE = int(os.getenv("MMW_RETURNS_CACHE_SIZE", "8"))
+RETURNS_CACHE_DIR = os.getenv("MMW_RETURNS_CACHE_DIR", str(DATA_DIR / "returns_cache"))
+
+# Pooled HTTP client (mmw.fetch): connect/read timeouts in seconds, pool size,
+# and the total deadline and parallelism for RSS feed downloads.
+HTTP_CONNECT_TIMEOUT = float(os.getenv("MMW_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("MMW_HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_SIZE = int(os.getenv("MMW_HTTP_POOL_SIZE", "16"))
+FEED_DEADLINE = float(os.getenv("MMW_FEED_DEADLINE", "30"))
+FEED_WORKERS = int(os.getenv("MMW_FEED_WORKERS", "8"))
+
+# Concurrent network fetches in the async ingest runner (mmw.async_ingest).
+ASYNC_CONCURRENCY = int(os.getenv("MMW_ASYNC_CONCURRENCY", "8"))
+
+# spaCy enrichment: texts per nlp.pipe batch, worker processes for nlp.pipe
+# and the maximum number of articles enriched per run (0 = no cap).
+NLP_BATCH_SIZE = int(os.getenv("MMW_NLP_BATCH_SIZE", "64"))
+NLP_PROCESSES = int(os.getenv("MMW_NLP_PROCESSES", "1"))
+ENRICH_LIMIT = int(os.getenv("MMW_ENRICH_LIMIT", "5000"))
+
+# Backlog enrichment (mmw enrich-backlog): articles per id-range chunk and
+# worker processes, each loading the spaCy model once.
+ENRICH_CHUNK_SIZE = int(os.getenv("MMW_ENRICH_CHUNK_SIZE", "500"))
+ENRICH_WORKERS = int(os.getenv("MMW_ENRICH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Static site build (mmw build-site): chart rendering processes per CPU core.
+# One worker or fewer in total renders serially in the calling process, the
+# default: encoding a chart is cheaper than shipping its arrays to a process.
+REPORT_WORKERS_PER_CORE = float(os.getenv("MMW_REPORT_WORKERS_PER_CORE", "0"))
+REPORT_WORKERS = max(1, int((os.cpu_count() or 1) * REPORT_WORKERS_PER_CORE))
+
+# Unix socket of the optional warm NLP worker (mmw nlp-worker) and the key
+# clients authenticate with.  Without MMW_NLP_AUTHKEY the worker generates a
+# random per-install key next to the socket (nlp.key, mode 0600).
+NLP_SOCKET = Path(os.getenv("MMW_NLP_SOCKET", str(DATA_DIR / "nlp.sock")))
+NLP_AUTHKEY = os.getenv("MMW_NLP_AUTHKEY", "").encode()
+# Seconds a client waits for the worker to accept it and to answer a batch
+# before falling back to in-process NLP.
+NLP_CONNECT_TIMEOUT = float(os.getenv("MMW_NLP_CONNECT_TIMEOUT", "2"))
+NLP_REQUEST_TIMEOUT = float(os.getenv("MMW_NLP_REQUEST_TIMEOUT", "300"))
+# Seconds the worker waits on a silent client (during the handshake, for a
+# request or inside one) before dropping it to serve the next caller.
+NLP_IDLE_TIMEOUT = float(os.getenv("MMW_NLP_IDLE_TIMEOUT", "10"))
+
+# Number of rows sent to the database per executemany batch.
+BULK_BATCH_SIZE = int(os.getenv("MMW_BATCH_SIZE", "1000"))
@@ -2,24 +2,78 @@
 
 from __future__ import annotations
 
+import logging
 from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple, Union
 
 from sqlalchemy import (
+    DDL,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index as SqlIndex,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    bindparam,
     create_engine,
+    event,
+    inspect,
+    select,
+    text,
 )
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import dialect as sqlite_dialect, insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
-from .config import DB_PATH
+from .config import BULK_BATCH_SIZE, DB_PATH, DB_PROFILE, DB_PROFILES
 
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False, future=True)
+logger = logging.getLogger(__name__)
+
+
+def pragma_statements(profile: str | None = None, **pragmas: Any) -> List[str]:
+    """Return the ``PRAGMA`` statements for ``profile`` in execution order.
+
+    ``profile`` names an entry of ``DB_PROFILES`` (defaults to ``DB_PROFILE``,
+    i.e. ``$MMW_DB_PROFILE``); keyword arguments override single pragmas.
+    """
+
+    profile = profile or DB_PROFILE
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+    settings = {**DB_PROFILES[profile], **pragmas}
+    # journal_mode must be switched before query_only forbids writes
+    order = sorted(settings, key=lambda name: name != "journal_mode")
+    return [f"PRAGMA {name}={settings[name]}" for name in order]
+
+
+def create_db_engine(
+    url: str | None = None, profile: str | None = None, **pragmas: Any
+) -> Engine:
+    """Create a SQLite engine that applies a pragma profile on each connect.
+
+    See :func:`pragma_statements` for ``profile`` and ``pragmas``.
+    """
+
+    statements = pragma_statements(profile, **pragmas)
+    eng = create_engine(url or f"sqlite:///{DB_PATH}", echo=False, future=True)
+
+    @event.listens_for(eng, "connect")
+    def _apply_pragmas(dbapi_conn, _record) -> None:
+        cursor = dbapi_conn.cursor()
+        try:
+            for stmt in statements:
+                cursor.execute(stmt)
+        finally:
+            cursor.close()
+
+    return eng
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
@@ -36,7 +90,10 @@ class Asset(Base):
 
 class Price(Base):
     __tablename__ = "prices"
-    __table_args__ = (UniqueConstraint("asset_id", "date", name="uix_price_asset_date"),)
+    __table_args__ = (
+        UniqueConstraint("asset_id", "date", name="uix_price_asset_date"),
+        SqlIndex("ix_prices_asset_date_close", "asset_id", "date", "close"),
+    )
 
     id = Column(Integer, primary_key=True)
     asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False)
@@ -62,6 +119,9 @@ class Index(Base):
 
 class IndexPoint(Base):
     __tablename__ = "index_points"
+    __table_args__ = (
+        SqlIndex("uix_index_point_index_date", "index_id", "date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     index_id = Column(Integer, ForeignKey("indices.id"), nullable=False)
@@ -73,6 +133,11 @@ class IndexPoint(Base):
 
 class News(Base):
     __tablename__ = "news"
+    __table_args__ = (
+        SqlIndex("ix_news_published_at", "published_at"),
+        # partial index: stays small and selective however large news grows
+        SqlIndex("ix_news_unlinked", "id", sqlite_where=text("link_sig IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True)
     url = Column(String, unique=True, nullable=False)
@@ -81,10 +146,13 @@ class News(Base):
     summary_ai = Column(Text)
     published_at = Column(DateTime)
     source = Column(String)
+    # mapping signature the article was last linked with; NULL = needs linking
+    link_sig = Column(String)
 
 
 class Entity(Base):
     __tablename__ = "entities"
+    __table_args__ = (SqlIndex("ix_entities_news_id", "news_id", "value"),)
 
     id = Column(Integer, primary_key=True)
     news_id = Column(Integer, ForeignKey("news.id"), nullable=False)
@@ -97,6 +165,10 @@ class Entity(Base):
 
 class Link(Base):
     __tablename__ = "links"
+    __table_args__ = (
+        SqlIndex("ix_links_asset_ticker", "asset_ticker", "news_id"),
+        SqlIndex("ix_links_news_id", "news_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     news_id = Column(Integer, ForeignKey("news.id"), nullable=False)
@@ -105,6 +177,37 @@ class Link(Base):
     score = Column(Float, nullable=False)
 
 
+class HttpValidator(Base):
+    __tablename__ = "http_validators"
+
+    url = Column(String, primary_key=True)
+    etag = Column(String)
+    last_modified = Column(String)
+    checked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class NlpCache(Base):
+    """Summary and entities keyed by normalized-text hash and pipeline version."""
+
+    __tablename__ = "nlp_cache"
+
+    text_hash = Column(String, primary_key=True)
+    pipeline = Column(String, primary_key=True)
+    summary_ai = Column(Text)
+    entities = Column(Text, nullable=False)  # JSON list of [type, value, score]
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Checkpoint(Base):
+    """Named progress marker for resumable jobs."""
+
+    __tablename__ = "checkpoints"
+
+    name = Column(String, primary_key=True)
+    value = Column(String)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class Run(Base):
     __tablename__ = "runs"
 
@@ -114,7 +217,473 @@ class Run(Base):
     status = Column(String)
 
 
-def init_db() -> None:
-    """Initialize the SQLite database and create tables."""
+class NewsDaily(Base):
+    """Rollup: articles and total ``summary_ai`` length per day and source."""
+
+    __tablename__ = "news_daily"
+
+    date = Column(Date, primary_key=True)
+    source = Column(String, primary_key=True)  # '' when the feed gave none
+    news_count = Column(Integer, nullable=False)
+    summary_len = Column(Integer, nullable=False)
+
 
+class TickerNewsDaily(Base):
+    """Rollup: linked articles per ticker and day."""
+
+    __tablename__ = "ticker_news_daily"
+
+    ticker = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    news_count = Column(Integer, nullable=False)
+
+
+class PriceWeekly(Base):
+    """Rollup: last close of each week (keyed by its Monday) per asset."""
+
+    __tablename__ = "price_weekly"
+
+    asset_id = Column(Integer, ForeignKey("assets.id"), primary_key=True)
+    period = Column(Date, primary_key=True)
+    last_date = Column(DateTime, nullable=False)
+    close = Column(Float)
+
+
+class PriceMonthly(Base):
+    """Rollup: last close of each month (keyed by its first day) per asset."""
+
+    __tablename__ = "price_monthly"
+
+    asset_id = Column(Integer, ForeignKey("assets.id"), primary_key=True)
+    period = Column(Date, primary_key=True)
+    last_date = Column(DateTime, nullable=False)
+    close = Column(Float)
+
+
+class RollupDirty(Base):
+    """Days whose rollups must be recomputed, queued by triggers.
+
+    There is no unique constraint: a conflict clause in a trigger would be
+    overridden by the ``ON CONFLICT`` of the upsert that fired it.  Already
+    queued keys are skipped by :data:`ROLLUP_DIRTY_DEDUPE_TRIGGER` instead.
+    """
+
+    __tablename__ = "rollup_dirty"
+    __table_args__ = (SqlIndex("ix_rollup_dirty_kind", "kind", "key", "day"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # 'news' or 'prices'
+    key = Column(Integer, nullable=False)  # asset id for prices, else 0
+    day = Column(Date, nullable=False)
+
+
+# Articles are queued for relinking (``link_sig = NULL``) by triggers, so every
+# writer - ORM, bulk upserts, aiosqlite - gets the same behaviour.
+NEWS_RELINK_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_news_relink
+AFTER UPDATE OF title, summary ON news
+WHEN OLD.title IS NOT NEW.title OR OLD.summary IS NOT NEW.summary
+BEGIN
+    UPDATE news SET link_sig = NULL WHERE id = NEW.id;
+END
+"""
+
+ENTITY_RELINK_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_entities_relink
+AFTER INSERT ON entities
+BEGIN
+    UPDATE news SET link_sig = NULL WHERE id = NEW.news_id AND link_sig IS NOT NULL;
+END
+"""
+
+# Rollups (see mmw.rollups) are recomputed per day.  Inserted prices are found
+# through an id watermark instead: a row trigger on every price insert would
+# slow bulk upserts down considerably, while updates and deletes are rare.
+ROLLUP_TRIGGERS: List[Tuple[str, str]] = [
+    (
+        "news",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_news_rollup_insert
+AFTER INSERT ON news
+WHEN NEW.published_at IS NOT NULL
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    VALUES ('news', 0, date(NEW.published_at));
+END
+""",
+    ),
+    (
+        "news",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_news_rollup_update
+AFTER UPDATE OF published_at, source, summary_ai ON news
+WHEN OLD.published_at IS NOT NEW.published_at OR OLD.source IS NOT NEW.source
+    OR OLD.summary_ai IS NOT NEW.summary_ai
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    SELECT 'news', 0, date(d) FROM (SELECT OLD.published_at AS d UNION SELECT NEW.published_at)
+    WHERE d IS NOT NULL;
+END
+""",
+    ),
+    (
+        "news",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_news_rollup_delete
+AFTER DELETE ON news
+WHEN OLD.published_at IS NOT NULL
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    VALUES ('news', 0, date(OLD.published_at));
+END
+""",
+    ),
+    (
+        "links",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_links_rollup_insert
+AFTER INSERT ON links
+WHEN NEW.asset_ticker IS NOT NULL
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    SELECT 'news', 0, date(published_at) FROM news
+    WHERE id = NEW.news_id AND published_at IS NOT NULL;
+END
+""",
+    ),
+    (
+        "links",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_links_rollup_delete
+AFTER DELETE ON links
+WHEN OLD.asset_ticker IS NOT NULL
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    SELECT 'news', 0, date(published_at) FROM news
+    WHERE id = OLD.news_id AND published_at IS NOT NULL;
+END
+""",
+    ),
+    (
+        "prices",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_prices_rollup_update
+AFTER UPDATE OF date, close ON prices
+WHEN OLD.close IS NOT NEW.close OR OLD.date IS NOT NEW.date
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    VALUES ('prices', OLD.asset_id, date(OLD.date)), ('prices', NEW.asset_id, date(NEW.date));
+END
+""",
+    ),
+    (
+        "prices",
+        """
+CREATE TRIGGER IF NOT EXISTS trg_prices_rollup_delete
+AFTER DELETE ON prices
+BEGIN
+    INSERT INTO rollup_dirty (kind, key, day)
+    VALUES ('prices', OLD.asset_id, date(OLD.date));
+END
+""",
+    ),
+]
+
+# Drops a queued key that is already pending.  RAISE(IGNORE) skips just that
+# row and, unlike a conflict clause, is not overridden by an outer upsert.
+ROLLUP_DIRTY_DEDUPE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_rollup_dirty_dedupe
+BEFORE INSERT ON rollup_dirty
+WHEN EXISTS (
+    SELECT 1 FROM rollup_dirty
+    WHERE kind = NEW.kind AND key = NEW.key AND day = NEW.day
+)
+BEGIN
+    SELECT RAISE(IGNORE);
+END
+"""
+
+# Queues every day with news, to (re)build the news rollups from scratch.
+QUEUE_ALL_NEWS_DAYS = (
+    "INSERT INTO rollup_dirty (kind, key, day) "
+    "SELECT DISTINCT 'news', 0, date(published_at) FROM news "
+    "WHERE published_at IS NOT NULL"
+)
+
+event.listen(News.__table__, "after_create", DDL(NEWS_RELINK_TRIGGER))
+event.listen(Entity.__table__, "after_create", DDL(ENTITY_RELINK_TRIGGER))
+for _table, _trigger in ROLLUP_TRIGGERS:
+    event.listen(Base.metadata.tables[_table], "after_create", DDL(_trigger))
+event.listen(RollupDirty.__table__, "after_create", DDL(ROLLUP_DIRTY_DEDUPE_TRIGGER))
+
+
+# ---------------------------------------------------------------------------
+# migrations
+# ---------------------------------------------------------------------------
+
+
+def _add_column(table: str, column: str, ddl_type: str) -> Callable[[Any], None]:
+    """Return a migration step adding ``column`` unless it already exists."""
+
+    def step(conn) -> None:
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+
+    return step
+
+
+# A migration step is either a SQL statement or a callable taking a connection.
+# Steps must be idempotent: a fresh database already gets the current schema
+# from ``create_all`` and is only stamped with the latest version.
+MigrationStep = Union[str, Callable[[Any], None]]
+
+MIGRATIONS: List[Tuple[int, str, List[MigrationStep]]] = [
+    (
+        1,
+        "secondary indexes for hot query paths",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_news_published_at ON news (published_at)",
+            "CREATE INDEX IF NOT EXISTS ix_links_asset_ticker ON links (asset_ticker, news_id)",
+            "CREATE INDEX IF NOT EXISTS ix_links_news_id ON links (news_id)",
+            "CREATE INDEX IF NOT EXISTS ix_entities_news_id ON entities (news_id, value)",
+            "CREATE INDEX IF NOT EXISTS ix_prices_asset_date_close ON prices (asset_id, date, close)",
+            # keep the latest point per (index_id, date) before enforcing uniqueness
+            "DELETE FROM index_points WHERE id NOT IN "
+            "(SELECT MAX(id) FROM index_points GROUP BY index_id, date)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uix_index_point_index_date "
+            "ON index_points (index_id, date)",
+        ],
+    ),
+    (
+        2,
+        "incremental linking: news.link_sig and relink triggers",
+        [
+            _add_column("news", "link_sig", "VARCHAR"),
+            "CREATE INDEX IF NOT EXISTS ix_news_unlinked ON news (id) WHERE link_sig IS NULL",
+            NEWS_RELINK_TRIGGER,
+            ENTITY_RELINK_TRIGGER,
+        ],
+    ),
+    (
+        3,
+        "daily rollup triggers; queue existing news days",
+        [
+            *(trigger for _, trigger in ROLLUP_TRIGGERS),
+            # prices are picked up by the rollup id watermark starting at 0
+            QUEUE_ALL_NEWS_DAYS,
+        ],
+    ),
+    (
+        4,
+        "queue each rollup_dirty key once",
+        [
+            "DELETE FROM rollup_dirty WHERE id NOT IN "
+            "(SELECT MIN(id) FROM rollup_dirty GROUP BY kind, key, day)",
+            ROLLUP_DIRTY_DEDUPE_TRIGGER,
+        ],
+    ),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    """Return the schema version stored in SQLite's ``user_version``."""
+
+    return int(conn.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def migrate(engine=engine) -> int:
+    """Apply pending migrations to an existing database and return its version."""
+
+    with engine.begin() as conn:
+        current = schema_version(conn)
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            logger.info("Applying migration %d: %s", version, description)
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.exec_driver_sql(step)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+            current = version
+    return current
+
+
+def init_db(engine=engine) -> None:
+    """Initialize the SQLite database, create tables and apply migrations.
+
+    New tables are created by ``create_all`` on existing databases too, so
+    migrations are only needed to change tables that already exist.
+    """
+
+    with engine.connect() as conn:
+        fresh = not inspect(conn).get_table_names()
     Base.metadata.create_all(engine)
+    if fresh:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    else:
+        migrate(engine)
+
+
+# ---------------------------------------------------------------------------
+# bulk writes
+# ---------------------------------------------------------------------------
+
+def chunked(rows: Sequence[Any], size: int | None = None) -> Iterator[Sequence[Any]]:
+    """Yield consecutive slices of ``rows`` with at most ``size`` items."""
+
+    size = size or BULK_BATCH_SIZE
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def upsert_statement(
+    model,
+    columns: Sequence[str],
+    conflict_cols: Sequence[str],
+    update_cols: Sequence[str] | None = None,
+):
+    """Build the ``INSERT ... ON CONFLICT`` statement used by bulk upserts.
+
+    ``update_cols`` defaults to every non-key column; an empty list turns the
+    statement into ``ON CONFLICT DO NOTHING``.
+    """
+
+    table = model.__table__
+    if update_cols is None:
+        update_cols = [c for c in columns if c not in conflict_cols]
+    stmt = sqlite_insert(table)
+    index_elements = [table.c[c] for c in conflict_cols]
+    if update_cols:
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_cols},
+        )
+    return stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+
+def compile_upsert(
+    model,
+    columns: Sequence[str],
+    conflict_cols: Sequence[str],
+    update_cols: Sequence[str] | None = None,
+) -> Tuple[str, Callable[[Mapping[str, Any]], Tuple[Any, ...]]]:
+    """Compile an upsert to raw SQLite SQL for DB-API drivers (aiosqlite).
+
+    Returns the SQL text with ``?`` placeholders and a function turning a row
+    dict into the positional parameter tuple, applying the same type
+    conversions (e.g. ``DateTime`` to text) SQLAlchemy would.
+    """
+
+    dialect = sqlite_dialect()
+    table = model.__table__
+    stmt = upsert_statement(model, columns, conflict_cols, update_cols).values(
+        {c: bindparam(c) for c in columns}
+    )
+    compiled = stmt.compile(dialect=dialect)
+    order = list(compiled.positiontup or [])
+    processors = {
+        c: table.c[c].type.dialect_impl(dialect).bind_processor(dialect) for c in columns
+    }
+
+    def params(row: Mapping[str, Any]) -> Tuple[Any, ...]:
+        out = []
+        for name in order:
+            value = row[name]
+            proc = processors[name]
+            out.append(proc(value) if proc is not None and value is not None else value)
+        return tuple(out)
+
+    return str(compiled), params
+
+
+def bulk_upsert(
+    conn,
+    model,
+    rows: Sequence[Mapping[str, Any]],
+    conflict_cols: Sequence[str],
+    update_cols: Sequence[str] | None = None,
+    batch_size: int | None = None,
+) -> int:
+    """Insert ``rows`` into ``model``'s table, updating on unique conflicts.
+
+    A single ``INSERT ... ON CONFLICT DO UPDATE`` statement is compiled once
+    and executed with ``executemany`` for each chunk of ``batch_size`` rows.
+    ``update_cols`` defaults to every non-key column present in the rows.
+    Returns the number of rows written.
+    """
+
+    if not rows:
+        return 0
+    stmt = upsert_statement(model, list(rows[0]), conflict_cols, update_cols)
+    for chunk in chunked(rows, batch_size):
+        conn.execute(stmt, list(chunk))
+    return len(rows)
+
+
+def resolve_ids(conn, model, key: str, values: Iterable[str]) -> Dict[str, int]:
+    """Return a ``{key value: id}`` map for ``values``, creating missing rows.
+
+    Used to resolve e.g. tickers to ``Asset`` ids once per call instead of
+    once per row.
+    """
+
+    wanted = sorted({str(v) for v in values})
+    if not wanted:
+        return {}
+    column = getattr(model, key)
+
+    def _lookup(keys: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for chunk in chunked(keys):
+            rows = conn.execute(select(column, model.id).where(column.in_(chunk)))
+            found.update((k, i) for k, i in rows)
+        return found
+
+    ids = _lookup(wanted)
+    missing = [v for v in wanted if v not in ids]
+    if missing:
+        bulk_upsert(conn, model, [{key: v} for v in missing], [key], update_cols=[])
+        ids.update(_lookup(missing))
+    return ids
+
+
+def get_checkpoint(conn, name: str, default: str | None = None) -> str | None:
+    """Return the value stored under checkpoint ``name`` or ``default``."""
+
+    value = conn.scalar(select(Checkpoint.value).where(Checkpoint.name == name))
+    return default if value is None else value
+
+
+def set_checkpoint(conn, name: str, value: Any) -> None:
+    """Store ``value`` (as text) under checkpoint ``name``."""
+
+    row = {
+        "name": name,
+        "value": None if value is None else str(value),
+        "updated_at": datetime.utcnow(),
+    }
+    bulk_upsert(conn, Checkpoint, [row], conflict_cols=["name"])
+
+
+# Raw SQL so DB-API writers (aiosqlite) can bump counters in their own
+# transaction, exactly like :func:`bump_checkpoint`.
+BUMP_CHECKPOINT_SQL = (
+    "INSERT INTO checkpoints (name, value, updated_at) VALUES (?, '1', ?) "
+    "ON CONFLICT (name) DO UPDATE SET "
+    "value = CAST(value AS INTEGER) + 1, updated_at = excluded.updated_at"
+)
+
+# Bumped by every price writer; part of the returns cache watermark.
+PRICES_VERSION = "prices.version"
+
+
+def bump_checkpoint(conn, name: str) -> None:
+    """Increment the integer counter stored under checkpoint ``name``."""
+
+    conn.exec_driver_sql(BUMP_CHECKPOINT_SQL, (name, str(datetime.utcnow())))
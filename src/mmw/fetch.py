@@ -0,0 +1,358 @@
+"""Network access with an optional on-disk record/replay cache.
+
+All network sources (RSS feeds, index pages, yfinance downloads) go through
+this module.  The cache mode is taken from ``MMW_HTTP_CACHE``:
+
+``off``
+    talk to the network, store nothing (default);
+``record``
+    talk to the network and store every raw response under
+    ``MMW_HTTP_CACHE_DIR`` keyed by a hash of the request;
+``replay``
+    never touch the network and serve stored responses, raising
+    :class:`CacheMiss` for requests that were not recorded.
+
+Replaying is deterministic for identical requests, so a recorded run can be
+repeated offline (e.g. ``mmw --http-cache replay refresh-all --since ...``
+with the same arguments as the recording) for benchmarks and regression
+tests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import select
+
+from .config import (
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MODE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+)
+from .db import HttpValidator, bulk_upsert, engine
+from .utils import ensure_dirs, utc_now
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; MMWBot/0.1; +https://example.com)"
+}
+
+CACHE_MODES = ("off", "record", "replay")
+
+_mode = HTTP_CACHE_MODE
+_cache_dir = Path(HTTP_CACHE_DIR)
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when a download takes longer than its total deadline."""
+
+
+class _NotModified(Exception):
+    """Internal signal for a ``304 Not Modified`` response."""
+
+
+# Conditional GET counters for this process: "requests" and "not_modified".
+_conditional_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def conditional_stats() -> Dict[str, int]:
+    """Return a snapshot of the conditional GET counters."""
+
+    with _stats_lock:
+        return {
+            "requests": _conditional_stats["requests"],
+            "not_modified": _conditional_stats["not_modified"],
+        }
+
+
+def log_conditional_hits(label: str, before: Dict[str, int]) -> None:
+    """Log the 304 hit rate of requests made since the ``before`` snapshot."""
+
+    now = conditional_stats()
+    requests_ = now["requests"] - before["requests"]
+    hits = now["not_modified"] - before["not_modified"]
+    if requests_:
+        logger.info(
+            "%s: %d/%d conditional requests not modified (%.0f%% hit rate)",
+            label,
+            hits,
+            requests_,
+            100.0 * hits / requests_,
+        )
+
+
+def _load_validators(url: str) -> Dict[str, str]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(HttpValidator.etag, HttpValidator.last_modified).where(
+                HttpValidator.url == url
+            )
+        ).first()
+    headers: Dict[str, str] = {}
+    if row is not None:
+        if row.etag:
+            headers["If-None-Match"] = row.etag
+        if row.last_modified:
+            headers["If-Modified-Since"] = row.last_modified
+    return headers
+
+
+def _validators(url: str, resp_headers: Mapping[str, str]) -> Dict[str, Any] | None:
+    etag = resp_headers.get("ETag")
+    last_modified = resp_headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return None
+    return {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "checked_at": utc_now().replace(tzinfo=None),
+    }
+
+
+def save_validators(validators: Dict[str, Any] | None) -> None:
+    """Store an ``http_validators`` row returned by :func:`get_conditional`.
+
+    Call it only once the response's content has been committed, so a
+    failed parse or write is retried in full instead of answered by ``304``.
+    """
+
+    if not validators:
+        return
+    with engine.begin() as conn:
+        bulk_upsert(conn, HttpValidator, [validators], conflict_cols=["url"])
+
+
+def session() -> requests.Session:
+    """Return the process-wide pooled HTTP session (thread-safe)."""
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers.update(HEADERS)
+            _session = s
+        return _session
+
+
+def configure(mode: str | None = None, cache_dir: Path | str | None = None) -> None:
+    """Override the cache mode and/or directory for this process."""
+
+    global _mode, _cache_dir
+    if mode is not None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown HTTP cache mode: {mode}")
+        _mode = mode
+    if cache_dir is not None:
+        _cache_dir = Path(cache_dir)
+
+
+def cache_mode() -> str:
+    """Return the active cache mode."""
+
+    return _mode
+
+
+def replaying() -> bool:
+    """Return ``True`` when responses are served from disk only."""
+
+    return _mode == "replay"
+
+
+def request_key(namespace: str, params: Dict[str, Any]) -> str:
+    """Return a stable key for a request described by ``params``."""
+
+    payload = json.dumps({"ns": namespace, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry(namespace: str, key: str) -> Path:
+    return _cache_dir / namespace / key[:2] / key
+
+
+def _store(namespace: str, params: Dict[str, Any], data: bytes) -> None:
+    key = request_key(namespace, params)
+    path = _entry(namespace, key)
+    ensure_dirs(path.parent)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path.with_suffix(".bin"))
+    meta = {"request": params, "recorded_at": utc_now().isoformat(), "bytes": len(data)}
+    path.with_suffix(".json").write_text(json.dumps(meta, default=str), encoding="utf-8")
+
+
+def _load(namespace: str, params: Dict[str, Any]) -> bytes:
+    key = request_key(namespace, params)
+    path = _entry(namespace, key).with_suffix(".bin")
+    if not path.exists():
+        raise CacheMiss(f"{namespace} request not recorded: {params}")
+    return path.read_bytes()
+
+
+def cached_call(
+    namespace: str, params: Dict[str, Any], fetch: Callable[[], bytes]
+) -> bytes:
+    """Return raw bytes for a request, recording or replaying per the mode."""
+
+    if _mode == "replay":
+        return _load(namespace, params)
+    data = fetch()
+    if _mode == "record":
+        _store(namespace, params, data)
+    return data
+
+
+def _interrupt(resp: Any, expired: threading.Event) -> None:
+    """Mark ``resp`` as past its deadline and unblock any read in progress.
+
+    Shutting the socket down makes a pending ``recv`` return at once, however
+    slowly the server is trickling bytes.
+    """
+
+    expired.set()
+    sock = getattr(getattr(getattr(resp, "raw", None), "connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _read_body(resp: Any, url: str, deadline: float | None, stop: float | None) -> bytes:
+    """Read the body of ``resp``, raising :class:`DeadlineExceeded` at ``stop``."""
+
+    body = bytearray()
+    if stop is None:
+        for chunk in resp.iter_content(64 * 1024):
+            body.extend(chunk)
+        return bytes(body)
+    expired = threading.Event()
+    watchdog = threading.Timer(max(0.0, stop - time.monotonic()), _interrupt, (resp, expired))
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        for chunk in resp.iter_content(64 * 1024):
+            body.extend(chunk)
+            if time.monotonic() > stop:
+                expired.set()
+                break
+    except Exception as exc:
+        if expired.is_set():
+            raise DeadlineExceeded(f"{url}: deadline of {deadline}s exceeded") from exc
+        raise
+    finally:
+        watchdog.cancel()
+    if expired.is_set():  # the body may end early once the socket is shut down
+        raise DeadlineExceeded(f"{url}: deadline of {deadline}s exceeded")
+    return bytes(body)
+
+
+def _get(
+    url: str,
+    headers: Dict[str, str] | None,
+    timeout: float | Tuple[float, float] | None,
+    deadline: float | None,
+    conditional: bool,
+) -> Tuple[bytes | None, Dict[str, Any] | None]:
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    validators: Dict[str, Any] | None = None
+
+    def _fetch() -> bytes:
+        nonlocal validators
+        req_headers = dict(headers or {})
+        if conditional and _mode != "record":
+            # a 304 would leave nothing to record for a later replay
+            req_headers.update(_load_validators(url))
+        stop = None if deadline is None else time.monotonic() + deadline
+        with session().get(url, headers=req_headers, timeout=timeout, stream=True) as resp:
+            if conditional:
+                with _stats_lock:
+                    _conditional_stats["requests"] += 1
+                    if resp.status_code == 304:
+                        _conditional_stats["not_modified"] += 1
+            if resp.status_code == 304:
+                raise _NotModified(url)
+            resp.raise_for_status()
+            body = _read_body(resp, url, deadline, stop)
+            if conditional:
+                validators = _validators(url, resp.headers)
+            return body
+
+    try:
+        return cached_call("http", {"method": "GET", "url": url}, _fetch), validators
+    except _NotModified:
+        return None, None
+
+
+def get_bytes(
+    url: str,
+    headers: Dict[str, str] | None = None,
+    timeout: float | Tuple[float, float] | None = None,
+    deadline: float | None = None,
+) -> bytes:
+    """GET ``url`` and return the response body, raising on HTTP errors.
+
+    ``timeout`` is the ``(connect, read)`` socket timeout, defaulting to
+    ``MMW_HTTP_CONNECT_TIMEOUT``/``MMW_HTTP_READ_TIMEOUT``.  ``deadline`` caps
+    the total download time in seconds, so a server trickling bytes cannot
+    stall the caller; :class:`DeadlineExceeded` is raised when it passes.
+    """
+
+    body, _ = _get(url, headers, timeout, deadline, conditional=False)
+    return body or b""
+
+
+def get_conditional(
+    url: str,
+    headers: Dict[str, str] | None = None,
+    timeout: float | Tuple[float, float] | None = None,
+    deadline: float | None = None,
+) -> Tuple[bytes | None, Dict[str, Any] | None]:
+    """Conditional :func:`get_bytes`: return ``(body, validators)``.
+
+    The ETag/Last-Modified validators stored in ``http_validators`` are sent
+    back (except while recording) and ``(None, None)`` is returned when the
+    server answers ``304 Not Modified``.  The validators of a successful download are returned, not
+    stored: pass them to :func:`save_validators` after the content has been
+    committed.  Replayed responses carry no validators.
+    """
+
+    return _get(url, headers, timeout, deadline, conditional=True)
+
+
+def cached_frame(
+    namespace: str, params: Dict[str, Any], fetch: Callable[[], pd.DataFrame]
+) -> pd.DataFrame:
+    """Like :func:`cached_call` for clients that return DataFrames (yfinance)."""
+
+    if _mode == "off":
+        return fetch()
+    data = cached_call(namespace, params, lambda: pickle.dumps(fetch()))
+    return pickle.loads(data)
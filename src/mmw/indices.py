@@ -7,71 +7,111 @@ import os
 import re
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-from sqlalchemy import select
-from sqlalchemy.orm import sessionmaker
 
+from . import fetch
 from .config import DATA_DIR
-from .db import Index, IndexPoint, engine
+from .db import Index, IndexPoint, bulk_upsert, engine, resolve_ids
 
 logger = logging.getLogger(__name__)
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (compatible; MMWBot/0.1; +https://example.com)"
-}
+HEADERS = fetch.HEADERS
 
 
 # ---------------------------------------------------------------------------
 # helpers
 # ---------------------------------------------------------------------------
 
-def _upsert_df(df: pd.DataFrame) -> None:
+def index_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize scraped/imported rows to ``index_code``, ``date``, ``value``."""
+
+    return pd.DataFrame(
+        {
+            "index_code": df["index_code"].astype(str),
+            "date": pd.to_datetime(df["date"]),
+            "value": df["value"].astype(float),
+        }
+    ).drop_duplicates(subset=["index_code", "date"], keep="last")
+
+
+def index_point_records(frame: pd.DataFrame, index_ids: Dict[str, int]) -> List[dict]:
+    """Convert an :func:`index_frame` into ``index_points`` row dicts."""
+
+    return [
+        {
+            "index_id": index_ids[row.index_code],
+            "date": row.date.to_pydatetime(),
+            "value": row.value,
+        }
+        for row in frame.itertuples(index=False)
+    ]
+
+
+def _upsert_df(df: pd.DataFrame, batch_size: int | None = None) -> None:
     """Upsert index points into the database."""
 
-    Session = sessionmaker(bind=engine, future=True)
-    with Session.begin() as session:
-        for row in df.itertuples(index=False):
-            date = pd.to_datetime(row.date).to_pydatetime()
-            index_code = str(row.index_code)
-            value = float(row.value)
-
-            idx = (
-                session.execute(select(Index).where(Index.code == index_code))
-                .scalar_one_or_none()
-            )
-            if idx is None:
-                idx = Index(code=index_code)
-                session.add(idx)
-                session.flush()
-
-            existing = (
-                session.execute(
-                    select(IndexPoint).where(
-                        IndexPoint.index_id == idx.id, IndexPoint.date == date
-                    )
-                ).scalar_one_or_none()
-            )
-            if existing is None:
-                session.add(IndexPoint(index_id=idx.id, date=date, value=value))
-            else:
-                existing.value = value
-
-
-def _request_soup(url: str, delay: float = 1.0) -> Optional[BeautifulSoup]:
-    """Fetch a URL and return BeautifulSoup or None on failure."""
-
-    time.sleep(delay)
+    if df.empty:
+        return
+    frame = index_frame(df)
+    with engine.begin() as conn:
+        index_ids = resolve_ids(conn, Index, "code", frame["index_code"].unique())
+        bulk_upsert(
+            conn,
+            IndexPoint,
+            index_point_records(frame, index_ids),
+            conflict_cols=["index_id", "date"],
+            batch_size=batch_size,
+        )
+
+
+def _request_soup(
+    url: str, delay: float = 1.0
+) -> Tuple[Optional[BeautifulSoup], Dict[str, Any] | None]:
+    """Fetch a URL and return ``(soup, validators)``.
+
+    ``soup`` is ``None`` on failure or ``304``: the request is conditional,
+    so a page that has not changed since the last successful fetch is
+    neither downloaded nor parsed again.  The response's validators are
+    handed to :func:`_frame` so they are only stored with the scraped rows.
+    A replay :class:`~mmw.fetch.CacheMiss` is raised, not logged.
+    """
+
+    if not fetch.replaying():
+        time.sleep(delay)
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        return BeautifulSoup(resp.text, "html.parser")
+        body, validators = fetch.get_conditional(url, headers=HEADERS)
+    except fetch.CacheMiss:
+        raise
     except Exception as exc:  # pragma: no cover - network
         logger.warning("request failed for %s: %s", url, exc)
-        return None
+        return None, None
+    if body is None:
+        logger.info("%s not modified, skipping", url)
+        return None, None
+    return BeautifulSoup(body, "html.parser"), validators
+
+
+def _frame(validators: Dict[str, Any] | None, row: dict) -> pd.DataFrame:
+    """Return a one-row scrape result carrying the page's validators.
+
+    The validators travel in ``df.attrs["validators"]``; whoever commits the
+    rows stores them (:func:`save_frame_validators`), so a page whose values
+    were not written is downloaded again next time.
+    """
+
+    df = pd.DataFrame([row])
+    df.attrs["validators"] = validators
+    return df
+
+
+def save_frame_validators(df: pd.DataFrame | None) -> None:
+    """Store the validators of a committed scrape result, if any."""
+
+    if df is not None:
+        fetch.save_validators(df.attrs.get("validators"))
 
 
 def _disabled(name: str) -> bool:
@@ -84,20 +124,20 @@ def _disabled(name: str) -> bool:
 # CSV import
 # ---------------------------------------------------------------------------
 
-def import_indices_from_csv(path: Path = DATA_DIR / "indices_manual.csv") -> None:
-    """Import index values from a CSV file and upsert them into the DB."""
+def load_indices_csv(path: Path = DATA_DIR / "indices_manual.csv") -> pd.DataFrame | None:
+    """Read and validate a manual index CSV; return ``None`` if unusable."""
 
     path = Path(path)
     if not path.exists():
         logger.info("CSV %s not found, skipping", path)
-        return
+        return None
 
     df = pd.read_csv(path)
     expected = {"date", "index_code", "value", "source"}
     missing = expected - set(df.columns)
     if missing:
         logger.error("CSV missing columns: %s", ", ".join(sorted(missing)))
-        return
+        return None
 
     df = df.dropna(subset=["date", "index_code", "value", "source"])
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
@@ -107,9 +147,16 @@ def import_indices_from_csv(path: Path = DATA_DIR / "indices_manual.csv") -> Non
 
     if df.empty:
         logger.info("No valid rows in %s", path)
-        return
+        return None
+    return df
+
 
-    _upsert_df(df)
+def import_indices_from_csv(path: Path = DATA_DIR / "indices_manual.csv") -> None:
+    """Import index values from a CSV file and upsert them into the DB."""
+
+    df = load_indices_csv(path)
+    if df is not None:
+        _upsert_df(df)
 
 
 # ---------------------------------------------------------------------------
@@ -123,7 +170,7 @@ def scrape_harpex_current() -> pd.DataFrame | None:  # pragma: no cover - networ
         logger.info("HARPEX scraper disabled via env")
         return None
 
-    soup = _request_soup("https://www.harperpetersen.com/en/harpex")
+    soup, validators = _request_soup("https://www.harperpetersen.com/en/harpex")
     if not soup:
         return None
 
@@ -139,15 +186,14 @@ def scrape_harpex_current() -> pd.DataFrame | None:  # pragma: no cover - networ
             if date_tag
             else pd.Timestamp.utcnow().normalize()
         )
-        return pd.DataFrame(
-            [
-                {
-                    "date": date,
-                    "index_code": "HARPEX",
-                    "value": value,
-                    "source": "harperpetersen.com",
-                }
-            ]
+        return _frame(
+            validators,
+            {
+                "date": date,
+                "index_code": "HARPEX",
+                "value": value,
+                "source": "harperpetersen.com",
+            },
         )
     except Exception as exc:
         logger.warning("HARPEX parsing failed: %s", exc)
@@ -161,7 +207,7 @@ def scrape_wci_latest() -> pd.DataFrame | None:  # pragma: no cover - network
         logger.info("WCI scraper disabled via env")
         return None
 
-    soup = _request_soup(
+    soup, validators = _request_soup(
         "https://www.drewry.co.uk/supply-chain-expertise/world-container-index-drewry"
     )
     if not soup:
@@ -175,15 +221,14 @@ def scrape_wci_latest() -> pd.DataFrame | None:  # pragma: no cover - network
             return None
         value = float(match.group(1).replace(",", ""))
         date = pd.Timestamp.utcnow().normalize()
-        return pd.DataFrame(
-            [
-                {
-                    "date": date,
-                    "index_code": "WCI",
-                    "value": value,
-                    "source": "drewry.co.uk",
-                }
-            ]
+        return _frame(
+            validators,
+            {
+                "date": date,
+                "index_code": "WCI",
+                "value": value,
+                "source": "drewry.co.uk",
+            },
         )
     except Exception as exc:
         logger.warning("WCI parsing failed: %s", exc)
@@ -197,7 +242,7 @@ def scrape_scfi_latest() -> pd.DataFrame | None:  # pragma: no cover - network
         logger.info("SCFI scraper disabled via env")
         return None
 
-    soup = _request_soup("https://en.sse.net.cn/indices/" )
+    soup, validators = _request_soup("https://en.sse.net.cn/indices/" )
     if not soup:
         return None
 
@@ -209,15 +254,14 @@ def scrape_scfi_latest() -> pd.DataFrame | None:  # pragma: no cover - network
             return None
         value = float(match.group(1).replace(",", ""))
         date = pd.Timestamp.utcnow().normalize()
-        return pd.DataFrame(
-            [
-                {
-                    "date": date,
-                    "index_code": "SCFI",
-                    "value": value,
-                    "source": "sse.net.cn",
-                }
-            ]
+        return _frame(
+            validators,
+            {
+                "date": date,
+                "index_code": "SCFI",
+                "value": value,
+                "source": "sse.net.cn",
+            },
         )
     except Exception as exc:
         logger.warning("SCFI parsing failed: %s", exc)
@@ -231,7 +275,7 @@ def scrape_fbx_latest() -> pd.DataFrame | None:  # pragma: no cover - network
         logger.info("FBX scraper disabled via env")
         return None
 
-    soup = _request_soup("https://fbx.freightos.com")
+    soup, validators = _request_soup("https://fbx.freightos.com")
     if not soup:
         return None
 
@@ -245,15 +289,14 @@ def scrape_fbx_latest() -> pd.DataFrame | None:  # pragma: no cover - network
             return None
         value = float(match.group(1).replace(",", ""))
         date = pd.Timestamp.utcnow().normalize()
-        return pd.DataFrame(
-            [
-                {
-                    "date": date,
-                    "index_code": "FBX",
-                    "value": value,
-                    "source": "fbx.freightos.com",
-                }
-            ]
+        return _frame(
+            validators,
+            {
+                "date": date,
+                "index_code": "FBX",
+                "value": value,
+                "source": "fbx.freightos.com",
+            },
         )
     except Exception as exc:
         logger.warning("FBX parsing failed: %s", exc)
@@ -264,21 +307,28 @@ def scrape_fbx_latest() -> pd.DataFrame | None:  # pragma: no cover - network
 # orchestration
 # ---------------------------------------------------------------------------
 
+SCRAPERS = (
+    scrape_harpex_current,
+    scrape_wci_latest,
+    scrape_scfi_latest,
+    scrape_fbx_latest,
+)
+
+
 def refresh_indices() -> None:
     """Import manual CSV first, then attempt to scrape latest indices."""
 
     import_indices_from_csv()
+    before = fetch.conditional_stats()
 
-    for scraper in (
-        scrape_harpex_current,
-        scrape_wci_latest,
-        scrape_scfi_latest,
-        scrape_fbx_latest,
-    ):
+    for scraper in SCRAPERS:
         try:
             df = scraper()
             if df is not None and not df.empty:
                 _upsert_df(df)
+                save_frame_validators(df)
+        except fetch.CacheMiss:
+            raise
         except Exception as exc:  # pragma: no cover - network
             logger.warning("scraper %s failed: %s", scraper.__name__, exc)
-
+    fetch.log_conditional_hits("Index pages", before)
@@ -2,13 +2,25 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
-from typing import Dict, List
-
-from sqlalchemy import select, delete
-from sqlalchemy.orm import sessionmaker
-
-from .db import Entity, Link, News, engine, init_db
+import re
+from typing import Dict, Hashable, List, Mapping, Sequence
+
+from sqlalchemy import delete, func, insert, select, update
+
+from .config import BULK_BATCH_SIZE
+from .db import (
+    Entity,
+    Link,
+    News,
+    chunked,
+    engine,
+    get_checkpoint,
+    init_db,
+    set_checkpoint,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,77 +43,172 @@ INDEX_KEYWORDS: Dict[str, List[str]] = {
 }
 
 
+# Bump when the matching logic changes so every article is relinked.
+LINKER_VERSION = 1
+
+SIGNATURE_CHECKPOINT = "linker.signature"
+
+
 # ---------------------------------------------------------------------------
 # helpers
 # ---------------------------------------------------------------------------
 
-def _match_score(text: str, keywords: List[str]) -> int:
-    """Return score based on keyword occurrences in text."""
+def mapping_signature() -> str:
+    """Return a short hash of the linker version and keyword mappings."""
+
+    payload = json.dumps(
+        {"version": LINKER_VERSION, "assets": MAPPINGS, "indices": INDEX_KEYWORDS},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class KeywordMatcher:
+    """Score many keyword groups against a text in a single regex pass.
+
+    ``targets`` maps any hashable target to its keywords.  All keywords are
+    compiled into one case-insensitive alternation (longest first) guarded
+    by word-boundary lookarounds, so ``ZIM`` does not match inside other
+    words while keywords such as ``MAERSK-B.CO`` still match as a whole.  A
+    target's score is the number of its keywords found in the text.
+    """
+
+    def __init__(self, targets: Mapping[Hashable, Sequence[str]]):
+        self._weights: Dict[str, Dict[Hashable, int]] = {}
+        for target, keywords in targets.items():
+            for kw in keywords:
+                per_target = self._weights.setdefault(kw.lower(), {})
+                per_target[target] = per_target.get(target, 0) + 1
+        alternatives = sorted(self._weights, key=len, reverse=True)
+        self._pattern = None
+        if alternatives:
+            self._pattern = re.compile(
+                r"(?<!\w)(?:" + "|".join(map(re.escape, alternatives)) + r")(?!\w)",
+                re.IGNORECASE,
+            )
+
+    def scores(self, text: str) -> Dict[Hashable, int]:
+        """Return ``{target: score}`` for targets with at least one match."""
 
-    text_l = text.lower()
-    return sum(1 for kw in keywords if kw.lower() in text_l)
+        if self._pattern is None or not text:
+            return {}
+        out: Dict[Hashable, int] = {}
+        for kw in {m.group(0).lower() for m in self._pattern.finditer(text)}:
+            for target, weight in self._weights[kw].items():
+                out[target] = out.get(target, 0) + weight
+        return out
+
+
+def build_matcher() -> KeywordMatcher:
+    """Compile ``MAPPINGS`` and ``INDEX_KEYWORDS`` into one matcher.
+
+    Targets are ``("asset", name)`` and ``("index", code)``.
+    """
+
+    targets: Dict[Hashable, List[str]] = {
+        ("asset", name): [name] + tickers for name, tickers in MAPPINGS.items()
+    }
+    targets.update(
+        {("index", code): list(keywords) for code, keywords in INDEX_KEYWORDS.items()}
+    )
+    return KeywordMatcher(targets)
 
 
 # ---------------------------------------------------------------------------
 # main logic
 # ---------------------------------------------------------------------------
 
-def link_news(engine=engine) -> None:
-    """Link news articles to asset tickers or index codes."""
-
-    Session = sessionmaker(bind=engine, future=True)
-    with Session.begin() as session:
-        news_items = session.execute(select(News)).scalars().all()
-        total_links = 0
-        for item in news_items:
-            entity_vals = session.execute(
-                select(Entity.value).where(Entity.news_id == item.id)
-            ).scalars().all()
-            full_text = " ".join(
-                [item.title or "", item.summary or "", " ".join(entity_vals)]
+def _article_links(
+    matcher: KeywordMatcher, news_id: int, text: str
+) -> List[Dict[str, object]]:
+    """Return ``links`` rows for one article's text."""
+
+    rows: List[Dict[str, object]] = []
+    for (kind, key), score in matcher.scores(text).items():
+        targets = [(t, None) for t in MAPPINGS[key]] if kind == "asset" else [(None, key)]
+        for ticker, code in targets:
+            rows.append(
+                {
+                    "news_id": news_id,
+                    "asset_ticker": ticker,
+                    "index_code": code,
+                    "score": float(score),
+                }
             )
-
-            # remove previous links for this news item
-            session.execute(delete(Link).where(Link.news_id == item.id))
-
-            # asset mappings
-            item_count = 0
-            for name, tickers in MAPPINGS.items():
-                keywords = [name] + tickers
-                score = _match_score(full_text, keywords)
-                if score:
-                    for ticker in tickers:
-                        session.add(
-                            Link(
-                                news_id=item.id,
-                                asset_ticker=ticker,
-                                index_code=None,
-                                score=float(score),
-                            )
-                        )
-                        item_count += 1
-                        total_links += 1
-
-            # index keywords
-            for code, keywords in INDEX_KEYWORDS.items():
-                score = _match_score(full_text, keywords)
-                if score:
-                    session.add(
-                        Link(
-                            news_id=item.id,
-                            asset_ticker=None,
-                            index_code=code,
-                            score=float(score),
-                        )
-                    )
-                    item_count += 1
-                    total_links += 1
-
-            logger.debug("News %s: created %d links", item.id, item_count)
-
-        logger.info("Created %d links", total_links)
+    return rows
+
+
+def link_news(engine=engine, full: bool = False, batch_size: int | None = None) -> int:
+    """Link new or changed news articles to asset tickers or index codes.
+
+    Only articles with ``link_sig IS NULL`` are (re)linked: new articles,
+    articles whose title/summary changed and articles that received new
+    entities (the last two are reset by database triggers).  When the
+    mappings signature differs from the one stored in the checkpoint, or
+    with ``full=True``, every article is queued again.
+
+    Articles are processed in id windows of ``batch_size`` (default
+    ``MMW_BATCH_SIZE``), each in its own transaction: one grouped entity
+    query, one bulk delete of old links, chunked bulk inserts of new links
+    and one update stamping the window, so memory stays flat however large
+    the history is.  Returns the number of articles linked.
+    """
+
+    batch_size = batch_size or BULK_BATCH_SIZE
+    matcher = build_matcher()
+    signature = mapping_signature()
+    with engine.begin() as conn:
+        if full or get_checkpoint(conn, SIGNATURE_CHECKPOINT) != signature:
+            logger.info("Relinking all articles (%s)", "forced" if full else "mappings changed")
+            conn.execute(update(News).where(News.link_sig.is_not(None)).values(link_sig=None))
+            set_checkpoint(conn, SIGNATURE_CHECKPOINT, signature)
+
+    linked = 0
+    total_links = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            window = conn.execute(
+                select(News.id, News.title, News.summary)
+                .where(News.link_sig.is_(None), News.id > last_id)
+                .order_by(News.id)
+                .limit(batch_size)
+            ).all()
+            if not window:
+                break
+            ids = [row.id for row in window]
+            entity_text = dict(
+                conn.execute(
+                    select(Entity.news_id, func.group_concat(Entity.value, " "))
+                    .where(Entity.news_id.in_(ids))
+                    .group_by(Entity.news_id)
+                ).all()
+            )
+            links: List[Dict[str, object]] = []
+            for row in window:
+                text = " ".join(
+                    [row.title or "", row.summary or "", entity_text.get(row.id) or ""]
+                )
+                links.extend(_article_links(matcher, row.id, text))
+
+            conn.execute(delete(Link).where(Link.news_id.in_(ids)))
+            for chunk in chunked(links):
+                conn.execute(insert(Link), list(chunk))
+            conn.execute(update(News).where(News.id.in_(ids)).values(link_sig=signature))
+        linked += len(ids)
+        total_links += len(links)
+        last_id = ids[-1]
+        logger.debug("Linked articles up to id %d (%d links)", last_id, len(links))
+
+    logger.info("Linked %d articles, created %d links", linked, total_links)
+    return linked
 
 
 if __name__ == "__main__":  # pragma: no cover - CLI
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Link news to tickers and indices")
+    parser.add_argument("--full", action="store_true", help="Relink every article")
+    args = parser.parse_args()
     init_db()
-    link_news(engine)
+    link_news(engine, full=args.full)
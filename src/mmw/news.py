@@ -3,28 +3,55 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Dict
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
 
 import feedparser
 import pandas as pd
 from sqlalchemy import select
-from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy.orm import sessionmaker
 
-from .config import RSS_FEEDS
-from .db import News, engine
+from .config import FEED_DEADLINE, FEED_WORKERS, RSS_FEEDS
+from .db import News, bulk_upsert, chunked, engine, init_db
+from .fetch import (
+    CacheMiss,
+    conditional_stats,
+    get_conditional,
+    log_conditional_hits,
+    save_validators,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_rss(feed_url: str) -> List[Dict]:
-    """Fetch an RSS/Atom feed and return list of items."""
+# Per-feed failure counts for this process; read by refresh_news for its logs.
+FEED_FAILURES: Counter = Counter()
+
+
+def fetch_rss(feed_url: str) -> Tuple[List[Dict], Dict[str, Any] | None]:
+    """Fetch an RSS/Atom feed and return ``(items, validators)``.
+
+    The download goes through the pooled client with connect/read timeouts
+    and a total ``FEED_DEADLINE``; feedparser only parses the bytes.  The
+    request is conditional: an unchanged feed (``304``) yields no items.
+    The caller stores ``validators`` with :func:`mmw.fetch.save_validators`
+    once the items are committed.  A replay :class:`~mmw.fetch.CacheMiss` is
+    raised instead of being counted as a feed failure.
+    """
 
     try:
-        parsed = feedparser.parse(feed_url)
+        body, validators = get_conditional(feed_url, deadline=FEED_DEADLINE)
+        if body is None:
+            logger.debug("%s not modified", feed_url)
+            return [], None
+        parsed = feedparser.parse(body)
+    except CacheMiss:
+        raise
     except Exception as exc:
+        FEED_FAILURES[feed_url] += 1
         logger.error("Failed to parse RSS feed %s: %s", feed_url, exc)
-        return []
+        return [], None
     source = parsed.feed.get("title", feed_url)
     items: List[Dict] = []
     for entry in parsed.entries:
@@ -37,7 +64,7 @@ def fetch_rss(feed_url: str) -> List[Dict]:
                 "published": entry.get("published"),
             }
         )
-    return items
+    return items, validators
 
 
 def normalize_news(items: List[Dict]) -> pd.DataFrame:
@@ -51,57 +78,102 @@ def normalize_news(items: List[Dict]) -> pd.DataFrame:
     return df
 
 
-def upsert_news(df: pd.DataFrame) -> int:
-    """Upsert news rows into the database by unique URL."""
+def news_records(df: pd.DataFrame) -> list[dict]:
+    """Convert a normalized news frame into ``news`` row dicts, one per URL."""
+
+    df = df.dropna(subset=["url"]).drop_duplicates(subset="url", keep="last")
+    return [
+        {
+            "url": row.url,
+            "title": row.title,
+            "summary": row.summary,
+            "source": row.source,
+            "published_at": row.ts.to_pydatetime() if pd.notnull(row.ts) else None,
+        }
+        for row in df.itertuples(index=False)
+    ]
+
+
+def upsert_news(df: pd.DataFrame, batch_size: int | None = None) -> int:
+    """Upsert news rows into the database by unique URL.
+
+    Returns the number of previously unseen URLs.
+    """
 
     if df.empty:
         return 0
-    urls = df["url"].tolist()
-    Session = sessionmaker(bind=engine, future=True)
-    with Session.begin() as session:
-        existing = set(
-            session.scalars(select(News.url).where(News.url.in_(urls))).all()
-        )
-        for row in df.itertuples(index=False):
-            stmt = sqlite_insert(News).values(
-                url=row.url,
-                title=row.title,
-                summary=row.summary,
-                source=row.source,
-                published_at=row.ts.to_pydatetime() if pd.notnull(row.ts) else None,
-            )
-            stmt = stmt.on_conflict_do_update(
-                index_elements=[News.__table__.c.url],
-                set_={
-                    "title": row.title,
-                    "summary": row.summary,
-                    "source": row.source,
-                    "published_at": row.ts.to_pydatetime()
-                    if pd.notnull(row.ts)
-                    else None,
-                },
-            )
-            session.execute(stmt)
+    records = news_records(df)
+    urls = [r["url"] for r in records]
+    with engine.begin() as conn:
+        existing = set()
+        for chunk in chunked(urls):
+            existing.update(conn.scalars(select(News.url).where(News.url.in_(chunk))))
+        bulk_upsert(conn, News, records, conflict_cols=["url"], batch_size=batch_size)
     return len(set(urls) - existing)
 
 
-def refresh_news() -> None:
-    """Fetch, normalize and upsert news from all configured feeds."""
+def _timed_fetch(feed: str) -> Tuple[List[Dict], Dict[str, Any] | None, float, bool]:
+    """Return ``(items, validators, seconds, failed)`` for one feed."""
+
+    failures = FEED_FAILURES[feed]
+    t0 = time.perf_counter()
+    items, validators = fetch_rss(feed)
+    return items, validators, time.perf_counter() - t0, FEED_FAILURES[feed] > failures
+
+
+def refresh_news(max_workers: int | None = None) -> None:
+    """Fetch, normalize and upsert news from all configured feeds.
+
+    Feeds are downloaded concurrently on ``FEED_WORKERS`` threads; parsed
+    items are upserted from the calling thread as each feed completes, and
+    only then are the feed's ETag/Last-Modified validators stored.
+    """
 
     total_new = 0
-    for feed in RSS_FEEDS:
-        items = fetch_rss(feed)
-        if not items:
-            logger.info("%s: no articles fetched", feed)
-            continue
-        df = normalize_news(items)
-        df.drop_duplicates(subset="url", inplace=True)
-        new_rows = upsert_news(df)
-        logger.info("%s: %s new articles", feed, new_rows)
-        total_new += new_rows
+    latencies: Dict[str, float] = {}
+    failed = 0
+    before = conditional_stats()
+    t_run = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or FEED_WORKERS) as pool:
+        futures = {pool.submit(_timed_fetch, feed): feed for feed in RSS_FEEDS}
+        for fut in as_completed(futures):
+            feed = futures[fut]
+            items, validators, elapsed, feed_failed = fut.result()
+            latencies[feed] = elapsed
+            if feed_failed:
+                failed += 1
+                logger.warning(
+                    "%s: failed after %.2fs (%d failures this process)",
+                    feed,
+                    elapsed,
+                    FEED_FAILURES[feed],
+                )
+                continue
+            if not items:
+                save_validators(validators)
+                logger.info("%s: no new content in %.2fs", feed, elapsed)
+                continue
+            df = normalize_news(items)
+            df.drop_duplicates(subset="url", inplace=True)
+            new_rows = upsert_news(df)
+            save_validators(validators)
+            logger.info("%s: %s new articles, fetched in %.2fs", feed, new_rows, elapsed)
+            total_new += new_rows
+    if latencies:
+        slowest = max(latencies, key=latencies.get)
+        logger.info(
+            "Fetched %d feeds in %.2fs (%d failed, slowest %s %.2fs)",
+            len(latencies),
+            time.perf_counter() - t_run,
+            failed,
+            slowest,
+            latencies[slowest],
+        )
+    log_conditional_hits("Feeds", before)
     logger.info("Total new articles: %s", total_new)
 
 
 if __name__ == "__main__":  # pragma: no cover - manual run
+    init_db()
     refresh_news()
 
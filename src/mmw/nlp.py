@@ -1,20 +1,62 @@
-"""Basic NLP utilities for summarization and entity extraction."""
+"""Basic NLP utilities for summarization and entity extraction.
+
+spaCy and sumy are imported lazily, so a process that hands its batches to a
+running :mod:`mmw.nlp_worker` never pays their import or model load cost.
+"""
 
 from __future__ import annotations
 
-from typing import List, Tuple
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import timedelta
+from importlib.metadata import version
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, exists, insert, select, update
+
+from .config import (
+    ENRICH_CHUNK_SIZE,
+    ENRICH_LIMIT,
+    ENRICH_WORKERS,
+    NLP_BATCH_SIZE,
+    NLP_PROCESSES,
+)
+from .db import (
+    Entity,
+    News,
+    NlpCache,
+    SessionLocal,
+    bulk_upsert,
+    chunked,
+    get_checkpoint,
+    set_checkpoint,
+)
+from .db import engine as default_engine
+from .nlp_worker import remote_enrich
 
-from sqlalchemy import exists, select
-from sqlalchemy.orm import Session
+logger = logging.getLogger(__name__)
 
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.summarizers.text_rank import TextRankSummarizer
+# Entity labels kept by the enrichment.
+ENTITY_LABELS = {"ORG", "GPE", "PRODUCT"}
 
-import spacy
-from spacy.cli import download as spacy_download
+# Cache key component; bump the suffix whenever summarization or entity
+# extraction changes so stale cache entries are no longer used.
+PIPELINE_VERSION = f"en_core_web_sm/ner/textrank/spacy-{version('spacy')}/1"
 
-from .db import Entity, News, SessionLocal
+# Only ``doc.ents`` is used, so everything but the tokenizer, tok2vec and NER
+# is excluded when the model is loaded.
+EXCLUDED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
 
 
 def summarize_text(text: str, sentences: int = 3) -> str:
@@ -22,6 +64,10 @@ def summarize_text(text: str, sentences: int = 3) -> str:
 
     if not text:
         return ""
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.parsers.plaintext import PlaintextParser
+    from sumy.summarizers.text_rank import TextRankSummarizer
+
     parser = PlaintextParser.from_string(text, Tokenizer("english"))
     summarizer = TextRankSummarizer()
     summary = summarizer(parser.document, sentences)
@@ -32,48 +78,401 @@ _nlp = None
 
 
 def load_spacy():
-    """Load spaCy's small English model, downloading if needed."""
+    """Load spaCy's small English model with only NER enabled.
+
+    The model is downloaded if needed.
+    """
 
     global _nlp
     if _nlp is not None:
         return _nlp
+    import spacy
+    from spacy.cli import download as spacy_download
+
     model = "en_core_web_sm"
     try:
-        _nlp = spacy.load(model)
+        _nlp = spacy.load(model, exclude=EXCLUDED_PIPES)
     except OSError:  # pragma: no cover - model download
         spacy_download(model)
-        _nlp = spacy.load(model)
+        _nlp = spacy.load(model, exclude=EXCLUDED_PIPES)
     return _nlp
 
 
-def extract_entities(text: str) -> List[Tuple[str, str, float]]:
-    """Extract named entities from text."""
-
-    nlp = load_spacy()
-    doc = nlp(text)
+def _doc_entities(doc) -> List[Tuple[str, str, float]]:
     entities: List[Tuple[str, str, float]] = []
     for ent in doc.ents:
-        if ent.label_ in {"ORG", "GPE", "PRODUCT"}:
+        if ent.label_ in ENTITY_LABELS:
             score = float(ent._.score) if ent.has_extension("score") else 1.0
             entities.append((ent.label_, ent.text, score))
     return entities
 
 
-def enrich_news(limit: int = 200) -> None:
-    """Generate summaries and extract entities for recent news."""
+def extract_entities(text: str) -> List[Tuple[str, str, float]]:
+    """Extract named entities from text."""
+
+    return _doc_entities(load_spacy()(text))
+
+
+def extract_entities_batch(
+    texts: Iterable[str],
+    batch_size: int | None = None,
+    n_process: int | None = None,
+) -> Iterator[List[Tuple[str, str, float]]]:
+    """Yield the entities of each text, streaming them through ``nlp.pipe``.
+
+    ``batch_size`` and ``n_process`` default to ``MMW_NLP_BATCH_SIZE`` and
+    ``MMW_NLP_PROCESSES``.
+    """
+
+    nlp = load_spacy()
+    docs = nlp.pipe(
+        texts,
+        batch_size=batch_size or NLP_BATCH_SIZE,
+        n_process=n_process or NLP_PROCESSES,
+    )
+    for doc in docs:
+        yield _doc_entities(doc)
+
 
-    session: Session = SessionLocal()
-    with session.begin():
-        stmt = (
-            select(News)
-            .where((News.summary_ai == None) | (News.summary_ai == ""))
-            .where(~exists(select(Entity.id).where(Entity.news_id == News.id)))
-            .order_by(News.published_at.desc())
-            .limit(limit)
+def news_text(title: str, summary: str | None) -> str:
+    """Return the text entities are extracted from for one article."""
+
+    return f"{title}. {summary or ''}"
+
+
+def _pending():
+    """Filter for articles that have neither a summary nor entities yet."""
+
+    return ((News.summary_ai == None) | (News.summary_ai == "")) & ~exists(
+        select(Entity.id).where(Entity.news_id == News.id)
+    )
+
+
+# ---------------------------------------------------------------------------
+# cache
+# ---------------------------------------------------------------------------
+
+Enrichment = Tuple[str, List[Tuple[str, str, float]]]
+
+_WS = re.compile(r"\s+")
+
+
+def text_key(title: str, summary: str | None) -> str:
+    """Return the cache key of an article: a hash of its normalized text.
+
+    Only canonical Unicode composition (NFC) and whitespace runs are
+    normalized, so syndicated copies that differ in encoding or layout share
+    a key.  Case is kept: spaCy NER is case-sensitive, and "MAERSK" and
+    "Maersk" can yield different entities.
+    """
+
+    text = unicodedata.normalize("NFC", news_text(title or "", summary))
+    text = _WS.sub(" ", text).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_lookup(conn, keys: Iterable[str]) -> Dict[str, Enrichment]:
+    """Return cached ``{key: (summary_ai, entities)}`` for the current pipeline."""
+
+    found: Dict[str, Enrichment] = {}
+    for chunk in chunked(sorted(set(keys))):
+        rows = conn.execute(
+            select(NlpCache.text_hash, NlpCache.summary_ai, NlpCache.entities).where(
+                NlpCache.pipeline == PIPELINE_VERSION, NlpCache.text_hash.in_(chunk)
+            )
         )
-        items = session.scalars(stmt).all()
-        for item in items:
-            item.summary_ai = item.summary if item.summary else summarize_text(item.title)
-            ents = extract_entities(f"{item.title}. {item.summary or ''}")
-            for etype, value, score in ents:
-                session.add(Entity(news_id=item.id, type=etype, value=value, score=score))
+        for key, summary_ai, entities in rows:
+            found[key] = (summary_ai, [tuple(e) for e in json.loads(entities)])
+    return found
+
+
+def cache_store(conn, entries: Dict[str, Enrichment]) -> None:
+    """Store freshly computed results under the current pipeline version."""
+
+    rows = [
+        {
+            "text_hash": key,
+            "pipeline": PIPELINE_VERSION,
+            "summary_ai": summary_ai,
+            "entities": json.dumps([list(e) for e in entities]),
+        }
+        for key, (summary_ai, entities) in entries.items()
+    ]
+    bulk_upsert(conn, NlpCache, rows, conflict_cols=["text_hash", "pipeline"])
+
+
+EnrichedRow = Tuple[int, str, List[Tuple[str, str, float]]]
+
+
+def enrich_rows(
+    rows: Sequence[Tuple[int, str, str | None]],
+    batch_size: int | None = None,
+    n_process: int | None = 1,
+) -> List[EnrichedRow]:
+    """Return ``(id, summary_ai, entities)`` for ``(id, title, summary)`` rows.
+
+    Touches no database; runs in-process, in backlog worker processes and in
+    the :mod:`mmw.nlp_worker` daemon.
+    """
+
+    texts = [news_text(title, summary) for _, title, summary in rows]
+    entities = extract_entities_batch(texts, batch_size, n_process)
+    return [
+        (news_id, summary if summary else summarize_text(title), ents)
+        for (news_id, title, summary), ents in zip(rows, entities)
+    ]
+
+
+def _log_cache_hits(hits: int, total: int) -> None:
+    if total:
+        logger.info(
+            "NLP cache: %d/%d articles reused (%.0f%% hit rate)",
+            hits,
+            total,
+            100.0 * hits / total,
+        )
+
+
+def enrich_news(
+    limit: int | None = None,
+    batch_size: int | None = None,
+    n_process: int | None = None,
+) -> int:
+    """Generate summaries and extract entities for recent news.
+
+    Up to ``limit`` articles (default ``MMW_ENRICH_LIMIT``, ``0`` for no cap)
+    are processed newest first.  Articles whose normalized text is already in
+    ``nlp_cache`` reuse the cached result; the rest are processed once per
+    distinct text, by the warm :mod:`mmw.nlp_worker` when one is running and
+    otherwise in-process with entity extraction batched through
+    :func:`extract_entities_batch`.  Misses go out in slices of
+    ``batch_size`` texts (``MMW_NLP_BATCH_SIZE``) and each slice is committed
+    as it returns, so a failed slice only leaves its own articles pending for
+    the next run.  Returns the number of articles enriched.
+    """
+
+    limit = ENRICH_LIMIT if limit is None else limit
+    batch_size = batch_size or NLP_BATCH_SIZE
+    t0 = time.perf_counter()
+    with SessionLocal() as session:
+        engine = session.get_bind()
+    stmt = (
+        select(News.id, News.title, News.summary)
+        .where(_pending())
+        .order_by(News.published_at.desc())
+    )
+    if limit:
+        stmt = stmt.limit(limit)
+    with engine.connect() as conn:
+        rows = [tuple(r) for r in conn.execute(stmt)]
+        keys = [text_key(title, summary) for _, title, summary in rows]
+        cached = cache_lookup(conn, keys)
+
+    # articles per distinct uncached text; the first one is sent for processing
+    misses: Dict[str, List[Tuple[int, str, str | None]]] = {}
+    for key, row in zip(keys, rows):
+        if key not in cached:
+            misses.setdefault(key, []).append(row)
+    hits = len(rows) - sum(len(group) for group in misses.values())
+    _write_chunk(
+        engine,
+        [(row[0], *cached[key]) for key, row in zip(keys, rows) if key in cached],
+        {},
+        None,
+    )
+
+    done = hits
+    use_worker = True
+    for chunk in chunked(list(misses.items()), batch_size):
+        batch = [group[0] for _, group in chunk]
+        try:
+            computed = remote_enrich(batch) if use_worker else None
+            if computed is None:
+                use_worker = False  # no worker, or it failed: stay in-process
+                computed = enrich_rows(batch, batch_size, n_process)
+        except Exception as exc:
+            logger.error("Enrichment of %d articles failed: %s", len(batch), exc)
+            continue
+        key_of = {group[0][0]: key for key, group in chunk}
+        fresh: Dict[str, Enrichment] = {
+            key_of[i]: (summary_ai, ents) for i, summary_ai, ents in computed
+        }
+        results = [(row[0], *fresh[key]) for key, group in chunk for row in group]
+        _write_chunk(engine, results, fresh, None)
+        done += len(results)
+    elapsed = time.perf_counter() - t0
+    if rows:
+        logger.info(
+            "Enriched %d articles in %.2fs (%.1f articles/s)",
+            done,
+            elapsed,
+            done / elapsed if elapsed else float("inf"),
+        )
+        _log_cache_hits(hits, len(rows))
+    return done
+
+
+# ---------------------------------------------------------------------------
+# backlog
+# ---------------------------------------------------------------------------
+
+BACKLOG_CHECKPOINT = "enrich.backlog.last_id"
+
+
+def _init_worker() -> None:
+    load_spacy()
+
+
+def _load_chunk(engine, lo: int, hi: int) -> List[Tuple[int, str, str | None]]:
+    q = (
+        select(News.id, News.title, News.summary)
+        .where(News.id.between(lo, hi), _pending())
+        .order_by(News.id)
+    )
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(q)]
+
+
+def _write_chunk(
+    engine,
+    results: List[EnrichedRow],
+    fresh: Dict[str, Enrichment],
+    checkpoint: int | None,
+) -> None:
+    """Store one chunk's results, new cache entries and the checkpoint atomically."""
+
+    with engine.begin() as conn:
+        cache_store(conn, fresh)
+        if results:
+            conn.execute(
+                update(News)
+                .where(News.id == bindparam("b_id"))
+                .values(summary_ai=bindparam("b_summary")),
+                [{"b_id": i, "b_summary": s} for i, s, _ in results],
+            )
+            entities = [
+                {"news_id": i, "type": etype, "value": value, "score": score}
+                for i, _, ents in results
+                for etype, value, score in ents
+            ]
+            for chunk in chunked(entities):
+                conn.execute(insert(Entity), list(chunk))
+        if checkpoint is not None:
+            set_checkpoint(conn, BACKLOG_CHECKPOINT, checkpoint)
+
+
+def enrich_backlog(
+    engine=None,
+    chunk_size: int | None = None,
+    workers: int | None = None,
+    restart: bool = False,
+) -> int:
+    """Enrich every pending article, oldest id first, in resumable chunks.
+
+    Pending ids above the ``enrich.backlog.last_id`` checkpoint are split
+    into id ranges of ``chunk_size`` articles (``MMW_ENRICH_CHUNK_SIZE``).
+    Chunks run on ``workers`` processes (``MMW_ENRICH_WORKERS``; ``1`` runs
+    them in a single background thread), each loading the model once.  The
+    parent commits every finished chunk and moves the checkpoint past the
+    last contiguous finished range, so an interrupted run resumes where it
+    stopped and failed chunks are retried next time.  ``restart=True``
+    starts over from the lowest id.  Texts found in ``nlp_cache`` are not
+    sent to the workers.  Returns the number of articles enriched.
+    """
+
+    engine = engine or default_engine
+    chunk_size = chunk_size or ENRICH_CHUNK_SIZE
+    workers = workers or ENRICH_WORKERS
+    with engine.begin() as conn:
+        if restart:
+            set_checkpoint(conn, BACKLOG_CHECKPOINT, 0)
+        last_id = int(get_checkpoint(conn, BACKLOG_CHECKPOINT, "0"))
+        ids = conn.scalars(
+            select(News.id).where(News.id > last_id, _pending()).order_by(News.id)
+        ).all()
+    if not ids:
+        logger.info("Enrichment backlog is empty (checkpoint id %d)", last_id)
+        return 0
+
+    ranges = [(c[0], c[-1]) for c in chunked(ids, chunk_size)]
+    total = len(ids)
+    logger.info(
+        "Enriching %d articles in %d chunks on %d workers (from id %d)",
+        total,
+        len(ranges),
+        workers,
+        last_id,
+    )
+
+    pool: Executor
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        pool = ThreadPoolExecutor(max_workers=1)
+
+    done = 0
+    hits = 0
+    failed = 0
+    finished: set = set()
+    next_chunk = 0  # first chunk not yet covered by the checkpoint
+    pending = iter(enumerate(ranges))
+    t0 = time.perf_counter()
+    with pool:
+        in_flight: Dict = {}
+
+        def _submit() -> None:
+            item = next(pending, None)
+            if item is None:
+                return
+            idx, (lo, hi) = item
+            rows = _load_chunk(engine, lo, hi)
+            keys = [text_key(title, summary) for _, title, summary in rows]
+            with engine.connect() as conn:
+                cached = cache_lookup(conn, keys)
+            misses = {k: row for k, row in zip(keys, rows) if k not in cached}
+            fut = pool.submit(enrich_rows, list(misses.values()))
+            in_flight[fut] = (idx, rows, keys, cached)
+
+        for _ in range(workers * 2):
+            _submit()
+        while in_flight:
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in completed:
+                idx, rows, keys, cached = in_flight.pop(fut)
+                _submit()
+                try:
+                    computed = fut.result()
+                except Exception as exc:
+                    # the checkpoint stays below this range, so it is retried
+                    failed += 1
+                    logger.error("Backlog chunk %d-%d failed: %s", *ranges[idx], exc)
+                    continue
+                key_of = dict(zip((row[0] for row in rows), keys))
+                fresh = {key_of[i]: (summary_ai, ents) for i, summary_ai, ents in computed}
+                results = [
+                    (row[0], *(cached.get(key) or fresh[key])) for row, key in zip(rows, keys)
+                ]
+                finished.add(idx)
+                checkpoint = None
+                while next_chunk in finished:
+                    checkpoint = ranges[next_chunk][1]
+                    next_chunk += 1
+                _write_chunk(engine, results, fresh, checkpoint)
+
+                done += len(results)
+                hits += len(results) - len(computed)
+                elapsed = time.perf_counter() - t0
+                rate = done / elapsed if elapsed else 0.0
+                eta = (total - done) / rate if rate else 0.0
+                logger.info(
+                    "Backlog: %d/%d articles (%.0f%%), %.1f articles/s, ETA %s",
+                    done,
+                    total,
+                    100.0 * done / total,
+                    rate,
+                    timedelta(seconds=int(eta)),
+                )
+    _log_cache_hits(hits, done)
+    if failed:
+        logger.warning("%d backlog chunks failed and will be retried on the next run", failed)
+    return done
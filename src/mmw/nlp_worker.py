@@ -0,0 +1,255 @@
+"""Long-lived NLP worker that keeps the spaCy model and sumy loaded.
+
+``mmw nlp-worker`` (or ``python -m mmw.nlp_worker``) loads the pipeline once
+and serves enrichment batches over a Unix socket at ``MMW_NLP_SOCKET`` using
+:mod:`multiprocessing.connection`.  :func:`remote_enrich` is the client side:
+it returns ``None`` whenever no compatible worker answers, and callers then
+fall back to running the pipeline in-process.
+
+Messages are tuples: ``("enrich", pipeline_version, rows)`` answered with
+``("ok", results)`` or ``("error", reason)``, ``("ping",)`` answered with
+``("ok", pipeline_version)``, and ``("stop",)``.
+
+The worker serves one client at a time, so clients give up after
+``MMW_NLP_CONNECT_TIMEOUT`` seconds without being accepted and after
+``MMW_NLP_REQUEST_TIMEOUT`` seconds without an answer, and the worker drops
+a client that stays silent for ``MMW_NLP_IDLE_TIMEOUT`` seconds.  Unless
+``MMW_NLP_AUTHKEY`` is set, both sides authenticate with a random key the
+worker writes next to its socket with mode 0600.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import socket
+import struct
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+from pathlib import Path
+from typing import Any, List, Sequence, Tuple
+
+from .config import (
+    NLP_AUTHKEY,
+    NLP_CONNECT_TIMEOUT,
+    NLP_IDLE_TIMEOUT,
+    NLP_REQUEST_TIMEOUT,
+    NLP_SOCKET,
+)
+from .utils import ensure_dirs
+
+logger = logging.getLogger(__name__)
+
+
+def _authkey(address: Path, create: bool = False) -> bytes | None:
+    """Return ``MMW_NLP_AUTHKEY`` or the per-install key stored next to ``address``.
+
+    With ``create`` a missing key file is generated (owner-only); otherwise
+    ``None`` means no worker has been started there yet.
+    """
+
+    if NLP_AUTHKEY:
+        return NLP_AUTHKEY
+    path = address.with_suffix(".key")
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as fh:
+                fh.write(secrets.token_hex(32))
+    try:
+        return path.read_text().strip().encode()
+    except FileNotFoundError:
+        return None
+
+
+def _connect(address: str, authkey: bytes, timeout: float) -> Connection:
+    """Open an authenticated connection, giving up after ``timeout`` seconds.
+
+    ``multiprocessing.connection.Client`` blocks until the worker accepts, and
+    a busy worker leaves new clients queued in the socket backlog.
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.setblocking(True)
+        conn = Connection(sock.detach())
+    finally:
+        sock.close()
+    try:
+        if not conn.poll(timeout):
+            raise TimeoutError(f"not accepted within {timeout:g}s")
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def _accept(server: socket.socket, authkey: bytes, timeout: float) -> Connection:
+    """Accept and authenticate the next client of the listening ``server``.
+
+    Every blocking read and write on the connection - the handshake and
+    partially sent messages included - fails after ``timeout`` seconds, so a
+    stalled client cannot hold the single-connection worker.
+    """
+
+    sock, _ = server.accept()
+    try:
+        sock.setblocking(True)
+        timeval = struct.pack("ll", int(timeout), int(timeout % 1 * 1_000_000))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+        conn = Connection(sock.detach())
+    finally:
+        sock.close()
+    try:
+        deliver_challenge(conn, authkey)
+        answer_challenge(conn, authkey)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def _request(
+    message: Tuple[Any, ...],
+    address: Path | str | None = None,
+    timeout: float | None = None,
+) -> Any:
+    address = Path(address or NLP_SOCKET)
+    if not address.exists():
+        return None
+    authkey = _authkey(address)
+    if authkey is None:
+        return None
+    timeout = NLP_REQUEST_TIMEOUT if timeout is None else timeout
+    try:
+        with _connect(str(address), authkey, NLP_CONNECT_TIMEOUT) as conn:
+            conn.send(message)
+            if not conn.poll(timeout):
+                raise TimeoutError(f"no answer within {timeout:g}s")
+            status, payload = conn.recv()
+    except TimeoutError as exc:
+        logger.warning("NLP worker at %s timed out: %s", address, exc)
+        return None
+    except (OSError, EOFError, AuthenticationError) as exc:
+        logger.debug("NLP worker at %s unavailable: %s", address, exc)
+        return None
+    if status != "ok":
+        logger.warning("NLP worker refused request: %s", payload)
+        return None
+    return payload
+
+
+def ping(address: Path | str | None = None) -> str | None:
+    """Return the pipeline version of a running worker, or ``None``."""
+
+    return _request(("ping",), address, NLP_CONNECT_TIMEOUT)
+
+
+def remote_enrich(
+    rows: Sequence[Tuple[int, str, str | None]], address: Path | str | None = None
+) -> List[Tuple[int, str, list]] | None:
+    """Enrich ``(id, title, summary)`` rows on the worker.
+
+    Returns the same ``(id, summary_ai, entities)`` tuples as
+    :func:`mmw.nlp.enrich_rows`, or ``None`` when no worker running the
+    current pipeline version is reachable.
+    """
+
+    from .nlp import PIPELINE_VERSION
+
+    return _request(("enrich", PIPELINE_VERSION, list(rows)), address)
+
+
+def stop(address: Path | str | None = None) -> None:
+    """Ask a running worker to exit."""
+
+    _request(("stop",), address, NLP_CONNECT_TIMEOUT)
+
+
+def _handle(conn, nlp, timeout: float | None = None) -> bool:
+    """Serve one connection; return ``False`` when asked to stop.
+
+    A client that sends nothing for ``timeout`` seconds is dropped.
+    """
+
+    timeout = NLP_IDLE_TIMEOUT if timeout is None else timeout
+    while True:
+        try:
+            if not conn.poll(timeout):
+                logger.warning("Dropping NLP client idle for %gs", timeout)
+                return True
+            message = conn.recv()
+        except EOFError:
+            return True
+        kind = message[0]
+        if kind == "ping":
+            conn.send(("ok", nlp.PIPELINE_VERSION))
+        elif kind == "stop":
+            conn.send(("ok", None))
+            return False
+        elif kind == "enrich":
+            _, pipeline, rows = message
+            if pipeline != nlp.PIPELINE_VERSION:
+                conn.send(("error", f"pipeline {pipeline} != {nlp.PIPELINE_VERSION}"))
+                continue
+            try:
+                conn.send(("ok", nlp.enrich_rows(rows)))
+            except Exception as exc:
+                logger.exception("Enrichment batch failed")
+                conn.send(("error", str(exc)))
+        else:
+            conn.send(("error", f"unknown request {kind!r}"))
+
+
+def serve(address: Path | str | None = None) -> None:
+    """Load the pipeline and serve requests until a ``stop`` message."""
+
+    from . import nlp
+
+    address = Path(address or NLP_SOCKET)
+    if address.exists():
+        if ping(address) is not None:
+            raise RuntimeError(f"An NLP worker is already listening on {address}")
+        address.unlink()  # stale socket from a crashed worker
+    ensure_dirs(address.parent)
+    authkey = _authkey(address, create=True)
+    if authkey is None:  # pragma: no cover - the key file was just written
+        raise RuntimeError(f"Cannot read the NLP worker key next to {address}")
+
+    nlp.load_spacy()
+    nlp.summarize_text("Warm up the summarizer.")
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(str(address))
+            server.listen()
+            logger.info("NLP worker (%s) listening on %s", nlp.PIPELINE_VERSION, address)
+            running = True
+            while running:
+                try:
+                    conn = _accept(server, authkey, NLP_IDLE_TIMEOUT)
+                except (OSError, EOFError, AuthenticationError) as exc:
+                    logger.warning("Rejected NLP client: %s", exc)
+                    continue
+                with conn:
+                    try:
+                        running = _handle(conn, nlp)
+                    except OSError as exc:  # client stalled, or timed out and hung up
+                        logger.warning("NLP client went away: %s", exc)
+    finally:
+        if address.exists():
+            address.unlink()
+    logger.info("NLP worker stopped")
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    logging.basicConfig(level=logging.INFO)
+    serve()
@@ -1,43 +1,79 @@
 """Fetch and store asset prices using yfinance."""
 from __future__ import annotations
 
-from typing import List
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Tuple
 
 import logging
 logger = logging.getLogger(__name__)
 
 import pandas as pd
 import yfinance as yf
-from sqlalchemy import select
-from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, select
 
-from .config import WATCHLIST_TICKERS
-from .db import Asset, Price, engine
+from .config import (
+    PRICE_BACKOFF,
+    PRICE_CHUNK_SIZE,
+    PRICE_HISTORY_YEARS,
+    PRICE_OVERLAP_DAYS,
+    PRICE_RETRIES,
+    PRICE_WORKERS,
+    WATCHLIST_TICKERS,
+)
+from .db import (
+    PRICES_VERSION,
+    Asset,
+    Price,
+    bulk_upsert,
+    bump_checkpoint,
+    engine,
+    init_db,
+    resolve_ids,
+)
+from .fetch import CacheMiss, cached_call, cached_frame, replaying
 
+PRICE_COLUMNS = ["ticker", "date", "open", "high", "low", "close", "volume"]
+_EMPTY_PRICES = pd.DataFrame(columns=PRICE_COLUMNS)
 
-def fetch_prices_yf(tickers: List[str], start: str | None = None, end: str | None = None) -> pd.DataFrame:
-    """Download prices from Yahoo Finance via yfinance and return a tidy DataFrame."""
+
+def fetch_prices_yf(
+    tickers: List[str],
+    start: str | None = None,
+    end: str | None = None,
+    threads: bool = True,
+) -> pd.DataFrame:
+    """Download prices from Yahoo Finance via yfinance and return a tidy DataFrame.
+
+    Download errors are logged and yield an empty frame; a replay
+    :class:`~mmw.fetch.CacheMiss` is raised.
+    """
 
     try:
-        data = yf.download(
-            tickers,
-            start=start,
-            end=end,
-            group_by="ticker",
-            auto_adjust=True,
-            threads=True,
+        data = cached_frame(
+            "yfinance",
+            {"tickers": list(tickers), "start": start, "end": end, "auto_adjust": True},
+            lambda: yf.download(
+                tickers,
+                start=start,
+                end=end,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=threads,
+                progress=False,
+            ),
         )
+    except CacheMiss:
+        raise
     except Exception as exc:
         logger.warning("Failed to download prices: %s", exc)
-        return pd.DataFrame(
-            columns=["ticker", "date", "open", "high", "low", "close", "volume"]
-        )
+        return _EMPTY_PRICES.copy()
 
     if data.empty:
-        return pd.DataFrame(
-            columns=["ticker", "date", "open", "high", "low", "close", "volume"]
-        )
+        return _EMPTY_PRICES.copy()
 
     if isinstance(data.columns, pd.MultiIndex):
         df = data.stack(level=0).rename_axis(["date", "ticker"]).reset_index()
@@ -55,76 +91,280 @@ def fetch_prices_yf(tickers: List[str], start: str | None = None, end: str | Non
             "Volume": "volume",
         }
     )
-    df = df[["ticker", "date", "open", "high", "low", "close", "volume"]]
-    return df
-
-
-def upsert_prices(df: pd.DataFrame, engine) -> None:
-    """Insert or update prices into the database by unique (ticker, date)."""
-
-    Session = sessionmaker(bind=engine, future=True)
-    with Session.begin() as session:
-        for ticker, group in df.groupby("ticker"):
-            asset = session.execute(select(Asset).where(Asset.ticker == ticker)).scalar_one_or_none()
-            if asset is None:
-                asset = Asset(ticker=ticker)
-                session.add(asset)
-                session.flush()
-            for row in group.itertuples(index=False):
-                stmt = sqlite_insert(Price).values(
-                    asset_id=asset.id,
-                    date=pd.to_datetime(row.date).to_pydatetime(),
-                    open=row.open,
-                    high=row.high,
-                    low=row.low,
-                    close=row.close,
-                    volume=row.volume,
-                )
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=[Price.__table__.c.asset_id, Price.__table__.c.date],
-                    set_={
-                        "open": row.open,
-                        "high": row.high,
-                        "low": row.low,
-                        "close": row.close,
-                        "volume": row.volume,
-                    },
-                )
-                session.execute(stmt)
-
-
-def refresh_watchlist_prices() -> None:
-    """Fetch last 3 years of prices for watchlist tickers and store them in the DB."""
-
-    start = (pd.Timestamp.utcnow() - pd.DateOffset(years=3)).strftime("%Y-%m-%d")
-    df = fetch_prices_yf(WATCHLIST_TICKERS, start=start)
-    upsert_prices(df, engine)
-    logger.info(
-        "Inserted/updated %d rows for %d tickers since %s",
-        len(df),
-        df["ticker"].nunique(),
-        start,
+    df = df[PRICE_COLUMNS]
+    # tickers that failed inside a multi-ticker download come back as NaN rows
+    return df.dropna(subset=["open", "high", "low", "close"], how="all")
+
+
+@dataclass
+class DownloadSummary:
+    """Outcome of :func:`download_prices_chunked`."""
+
+    rows: int = 0
+    chunks: int = 0
+    failed: List[str] = field(default_factory=list)
+
+
+def fetch_price_chunk(
+    tickers: List[str],
+    start: str | None,
+    end: str | None,
+    retries: int,
+    backoff: float,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """Download one chunk, retrying only the tickers that came back empty.
+
+    Replayed retries are served from the cache, so they do not back off.
+    """
+
+    frames = []
+    pending = list(tickers)
+    for attempt in range(retries + 1):
+        if attempt:
+            if not replaying():
+                time.sleep(backoff * 2 ** (attempt - 1))
+            logger.info("Retrying %d tickers (attempt %d)", len(pending), attempt + 1)
+        df = fetch_prices_yf(pending, start=start, end=end, threads=False)
+        if not df.empty:
+            frames.append(df)
+            got = set(df["ticker"])
+            pending = [t for t in pending if t not in got]
+        if not pending:
+            break
+    if not frames:
+        return _EMPTY_PRICES.copy(), pending
+    return pd.concat(frames, ignore_index=True), pending
+
+
+def download_prices_chunked(
+    tickers: Iterable[str],
+    start: str | None = None,
+    end: str | None = None,
+    on_chunk: Callable[[pd.DataFrame], int] | None = None,
+    chunk_size: int | None = None,
+    max_workers: int | None = None,
+    retries: int | None = None,
+    backoff: float | None = None,
+) -> DownloadSummary:
+    """Download ``tickers`` in chunks on a bounded thread pool.
+
+    Each chunk's tidy frame is handed to ``on_chunk`` (e.g. an upsert) in the
+    calling thread as soon as it arrives and then dropped, and at most
+    ``max_workers`` chunks are in flight, so peak memory is bounded by the
+    chunk size rather than the universe size.  ``on_chunk`` returns the
+    number of rows it wrote.  A replay :class:`~mmw.fetch.CacheMiss` aborts
+    the download instead of being reported as failed tickers.
+    """
+
+    tickers = list(tickers)
+    chunk_size = chunk_size or PRICE_CHUNK_SIZE
+    max_workers = max_workers or PRICE_WORKERS
+    retries = PRICE_RETRIES if retries is None else retries
+    backoff = PRICE_BACKOFF if backoff is None else backoff
+
+    chunks = iter([tickers[i : i + chunk_size] for i in range(0, len(tickers), chunk_size)])
+    summary = DownloadSummary()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = {}
+
+        def _submit() -> None:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                fut = pool.submit(fetch_price_chunk, chunk, start, end, retries, backoff)
+                in_flight[fut] = chunk
+
+        for _ in range(max_workers):
+            _submit()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                chunk = in_flight.pop(fut)
+                _submit()
+                try:
+                    df, failed = fut.result()
+                except CacheMiss:
+                    raise
+                except Exception as exc:
+                    logger.warning("Price chunk %s failed: %s", chunk[0], exc)
+                    summary.failed.extend(chunk)
+                    continue
+                summary.chunks += 1
+                summary.failed.extend(failed)
+                if on_chunk is not None and not df.empty:
+                    summary.rows += on_chunk(df)
+                else:
+                    summary.rows += len(df)
+                del df
+    return summary
+
+
+def price_records(df: pd.DataFrame, asset_ids: dict) -> list[dict]:
+    """Convert a tidy price frame into ``prices`` row dicts."""
+
+    out = df[PRICE_COLUMNS].copy()
+    out["asset_id"] = out.pop("ticker").astype(str).map(asset_ids)
+    out["date"] = pd.to_datetime(out["date"])
+    out = out.astype(object).where(out.notna(), None)
+    records = out.to_dict(orient="records")
+    for rec in records:
+        rec["date"] = rec["date"].to_pydatetime()
+    return records
+
+
+def upsert_prices(df: pd.DataFrame, engine, batch_size: int | None = None) -> int:
+    """Insert or update prices into the database by unique (ticker, date).
+
+    Asset ids are resolved once per call and rows are written in batches of
+    ``batch_size`` (defaults to ``BULK_BATCH_SIZE``).  The ``prices.version``
+    checkpoint is bumped in the same transaction so cached returns are
+    invalidated.  Returns the number of rows written.
+    """
+
+    df = df.dropna(subset=["ticker", "date"])
+    if df.empty:
+        return 0
+    with engine.begin() as conn:
+        asset_ids = resolve_ids(conn, Asset, "ticker", df["ticker"].unique())
+        written = bulk_upsert(
+            conn,
+            Price,
+            price_records(df, asset_ids),
+            conflict_cols=["asset_id", "date"],
+            batch_size=batch_size,
+        )
+        bump_checkpoint(conn, PRICES_VERSION)
+        return written
+
+
+def latest_price_dates(engine, tickers: Iterable[str]) -> Dict[str, pd.Timestamp]:
+    """Return the latest stored price date per ticker using a single query."""
+
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    q = (
+        select(Asset.ticker, func.max(Price.date))
+        .join(Price, Asset.id == Price.asset_id)
+        .where(Asset.ticker.in_(tickers))
+        .group_by(Asset.id)
     )
+    with engine.connect() as conn:
+        return {ticker: pd.Timestamp(last) for ticker, last in conn.execute(q) if last}
 
 
-def main(since: str | None = None) -> None:
-    """CLI entry point for fetching prices."""
+def plan_incremental(
+    tickers: Iterable[str],
+    last_dates: Dict[str, pd.Timestamp],
+    default_start: str,
+    overlap_days: int | None = None,
+) -> Dict[str, List[str]]:
+    """Group tickers by the start date of the tail they are missing.
+
+    Tickers with stored history restart ``overlap_days`` before their latest
+    bar; tickers without history start at ``default_start``.  Tickers sharing
+    a start date end up in one download.
+    """
+
+    overlap = pd.Timedelta(
+        days=PRICE_OVERLAP_DAYS if overlap_days is None else overlap_days
+    )
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for ticker in tickers:
+        last = last_dates.get(ticker)
+        if last is None:
+            start = default_start
+        else:
+            start = (last - overlap).strftime("%Y-%m-%d")
+        groups[start].append(ticker)
+    return dict(sorted(groups.items()))
+
+
+def plan_refresh(since: str | None = None, full: bool = False) -> Dict[str, List[str]]:
+    """Return ``{start date: tickers}`` downloads needed to refresh the watchlist.
+
+    By default only the tail after each ticker's latest stored bar is planned
+    (see :func:`plan_incremental`).  ``full=True`` plans everything since
+    ``since`` (default: the last ``PRICE_HISTORY_YEARS`` years).
+
+    The plan depends on the stored high-water marks and today's date, so
+    with the HTTP cache it is recorded under the request parameters
+    (``since``, ``full`` and the watchlist) and a replay downloads exactly
+    what the recording did, whatever the database holds.
+    """
+
+    def _plan() -> bytes:
+        start = since or (
+            pd.Timestamp.now("UTC") - pd.DateOffset(years=PRICE_HISTORY_YEARS)
+        ).strftime("%Y-%m-%d")
+        if full:
+            groups = {start: list(WATCHLIST_TICKERS)}
+        else:
+            groups = plan_incremental(
+                WATCHLIST_TICKERS, latest_price_dates(engine, WATCHLIST_TICKERS), start
+            )
+        return json.dumps(groups).encode("utf-8")
+
+    params = {"since": since, "full": full, "tickers": list(WATCHLIST_TICKERS)}
+    return json.loads(cached_call("price_plan", params, _plan))
 
-    start = since if since else (pd.Timestamp.utcnow() - pd.DateOffset(years=3)).strftime("%Y-%m-%d")
-    df = fetch_prices_yf(WATCHLIST_TICKERS, start=start)
-    upsert_prices(df, engine)
+
+def refresh_watchlist_prices(since: str | None = None, full: bool = False) -> int:
+    """Fetch watchlist prices and store them in the DB.
+
+    See :func:`plan_refresh` for ``since`` and ``full``.  Returns the number
+    of rows written.
+    """
+
+    groups = plan_refresh(since, full)
+
+    total = 0
+    failed: List[str] = []
+    for group_start, tickers in groups.items():
+        summary = download_prices_chunked(
+            tickers,
+            start=group_start,
+            on_chunk=lambda df: upsert_prices(df, engine),
+        )
+        total += summary.rows
+        failed.extend(summary.failed)
+        logger.info(
+            "Inserted/updated %d rows for %d tickers since %s",
+            summary.rows,
+            len(tickers) - len(summary.failed),
+            group_start,
+        )
     logger.info(
-        "Processed %d rows for %d tickers since %s",
-        len(df),
-        df["ticker"].nunique(),
-        start,
+        "%s refresh: %d rows in %d downloads",
+        "Full" if full else "Incremental",
+        total,
+        len(groups),
     )
+    if failed:
+        logger.warning("Failed tickers (%d): %s", len(failed), ", ".join(sorted(failed)))
+    return total
+
+
+def main(since: str | None = None, full: bool = False) -> None:
+    """CLI entry point for fetching prices."""
+
+    refresh_watchlist_prices(since=since, full=full)
 
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Fetch Yahoo Finance prices for watchlist tickers")
-    parser.add_argument("--since", dest="since", help="Start date YYYY-MM-DD", default=None)
+    parser.add_argument(
+        "--since",
+        dest="since",
+        help="Start date YYYY-MM-DD for tickers without history (or for --full)",
+        default=None,
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-download the whole range instead of only the missing tail",
+    )
     args = parser.parse_args()
-    main(args.since)
+    init_db()
+    main(args.since, args.full)
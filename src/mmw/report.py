@@ -1,113 +1,370 @@
-"""Generate static HTML reports for Maritime Market Watch."""
+"""Generate static HTML reports for Maritime Market Watch.
+
+Price and index charts are not rendered to one HTML page per series.
+Each series is written to a compact data script (``assets/data/<kind>_<key>.js``)
+with delta-encoded integer columns.  A single ``assets/chart.html`` page
+loads the script named in its query string and draws it with plotly.js.
+Script tags are used instead of ``fetch`` so the site also works from
+``file://``.
+"""
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from html import escape
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from urllib.parse import quote
 
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from sqlalchemy import select
-
-from .config import DOCS_DIR
-from .db import Asset, Index, IndexPoint, News, Price
+from plotly.offline import get_plotlyjs_version
+from sqlalchemy import func, select
+
+from .analytics import news_intensity, returns_matrix, ticker_news_counts
+from .columnar import read_index_points, read_prices, series_fingerprints, sync_mirror
+from .config import DOCS_DIR, PRICE_SOURCE, REPORT_WORKERS
+from .db import Link, News, create_db_engine
+from .returns_cache import prices_watermark
 from .utils import ensure_dirs
 
 
 logger = logging.getLogger(__name__)
 
 
-def _write_html(fig: go.Figure, path: Path) -> None:
-    """Write ``fig`` to ``path`` including plotly.js via CDN."""
+# Bump when chart or page templates change so every artifact is rebuilt.
+REPORT_VERSION = 2
+
+MANIFEST = "build_manifest.json"
+
+PRICE_CHART_FIELDS = ("open", "high", "low", "close")
+
+# Chart values are stored rounded to this many significant digits.
+SIGNIFICANT_DIGITS = 6
+
+CHART_PAGE = """<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'>
+<title>Chart</title><link rel='stylesheet' href='../style.css'>
+<script src='https://cdn.plot.ly/plotly-%(plotly)s.min.js'></script></head>
+<body><p><a href='../index.html'>&larr; Maritime Market Watch</a></p>
+<div id='chart' style='height:85vh'></div>
+<script>
+function cumsum(d) {
+  var acc = 0;
+  return d.map(function (v) { if (v === null) return null; acc += v; return acc; });
+}
+function decode(col) {
+  var scale = Math.pow(10, col.e);
+  return cumsum(col.d).map(function (v) { return v === null ? null : v / scale; });
+}
+function rolling(v, n) {
+  return v.map(function (_, i) {
+    if (i < n - 1) return null;
+    var sum = 0;
+    for (var j = i - n + 1; j <= i; j++) {
+      if (v[j] === null) return null;
+      sum += v[j];
+    }
+    return sum / n;
+  });
+}
+function mmwSeries(s) {
+  var x = cumsum(s.t).map(function (d) {
+    return new Date(d * 864e5).toISOString().slice(0, 10);
+  });
+  var c = {};
+  for (var k in s.c) c[k] = decode(s.c[k]);
+  var traces, ytitle;
+  if (s.kind === "price") {
+    traces = [
+      {type: "candlestick", x: x, open: c.open, high: c.high, low: c.low,
+       close: c.close, name: "OHLC"},
+      {type: "scatter", x: x, y: rolling(c.close, 20), name: "MA20"}
+    ];
+    ytitle = "Price";
+  } else {
+    traces = [{type: "scatter", mode: "lines", x: x, y: c.value, name: s.title}];
+    ytitle = "Value";
+  }
+  document.title = s.title;
+  Plotly.newPlot("chart", traces, {
+    title: {text: s.title},
+    xaxis: {title: {text: "Date"}},
+    yaxis: {title: {text: ytitle}}
+  });
+}
+var query = new URLSearchParams(location.search);
+var tag = document.createElement("script");
+tag.src = "data/" + query.get("kind") + "_" + encodeURIComponent(query.get("key")) + ".js";
+document.body.appendChild(tag);
+</script></body></html>
+"""
+
+
+class BuildManifest:
+    """Input fingerprints of the artifacts written by the last site build.
+
+    Artifacts are named by their path relative to ``root``.  A builder skips
+    an artifact whose fingerprint is unchanged and whose file still exists;
+    ``rendered`` and ``skipped`` count the outcomes.  All fingerprints are
+    discarded when ``REPORT_VERSION`` changes, and files of the old version
+    that the new build does not write are deleted on :meth:`save`.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.rendered = 0
+        self.skipped = 0
+        path = self.root / MANIFEST
+        data: Dict[str, Any] = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                logger.warning("Ignoring unreadable build manifest %s", path)
+        self.artifacts: Dict[str, Any] = {}
+        self._orphans: set = set()
+        if data.get("version") == REPORT_VERSION:
+            self.artifacts = data.get("artifacts", {})
+        else:
+            self._orphans = set(data.get("artifacts", {}))
+
+    def is_fresh(self, name: str, fingerprint: Any) -> bool:
+        """Return ``True`` (and count a skip) if ``name`` is up to date."""
+
+        fresh = (
+            self.artifacts.get(name) == json.loads(json.dumps(fingerprint))
+            and (self.root / name).exists()
+        )
+        self.skipped += fresh
+        return fresh
+
+    def record(self, name: str, fingerprint: Any) -> None:
+        """Store the fingerprint of a freshly rendered artifact."""
+
+        self.artifacts[name] = json.loads(json.dumps(fingerprint))
+        self.rendered += 1
+
+    def prune(self, prefix: str, keep: Iterable[str]) -> None:
+        """Delete artifacts starting with ``prefix`` that are not in ``keep``."""
+
+        keep = set(keep)
+        for name in [n for n in self.artifacts if n.startswith(prefix) and n not in keep]:
+            (self.root / name).unlink(missing_ok=True)
+            del self.artifacts[name]
+
+    def save(self) -> None:
+        for name in self._orphans - set(self.artifacts):
+            (self.root / name).unlink(missing_ok=True)
+        self._orphans = set()
+        ensure_dirs(self.root)
+        tmp = self.root / (MANIFEST + ".tmp")
+        payload = {"version": REPORT_VERSION, "artifacts": self.artifacts}
+        tmp.write_text(json.dumps(payload, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.root / MANIFEST)
+
+
+def encode_dates(dates: np.ndarray) -> List[int]:
+    """Return days since the epoch as a first value followed by deltas."""
+
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return np.diff(days, prepend=0).tolist()
+
+
+def encode_column(values: np.ndarray) -> Dict[str, Any]:
+    """Delta-encode ``values`` as integers of ``10**-e`` units.
+
+    ``e`` keeps ``SIGNIFICANT_DIGITS`` digits of the largest value.  Returns
+    ``{"e": e, "d": deltas}``; missing values are ``None`` and the deltas
+    skip over them.
+    """
+
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    top = np.abs(values[finite]).max(initial=0.0)
+    e = int(np.clip(SIGNIFICANT_DIGITS - 1 - np.floor(np.log10(top)), 0, 12)) if top else 0
+    deltas = np.diff(np.round(values[finite] * 10.0**e).astype(np.int64), prepend=0).tolist()
+    if finite.all():
+        return {"e": e, "d": deltas}
+    out: List[int | None] = [None] * len(values)
+    for i, delta in zip(np.flatnonzero(finite).tolist(), deltas):
+        out[i] = delta
+    return {"e": e, "d": out}
+
+
+def _write_series(path: Path, series: Dict[str, Any]) -> None:
+    """Write ``series`` to ``path`` as a script calling ``mmwSeries``."""
 
     ensure_dirs(path.parent)
-    fig.write_html(path, include_plotlyjs="cdn", full_html=True)
+    payload = json.dumps(series, separators=(",", ":"))
+    path.write_text(f"mmwSeries({payload});\n", encoding="utf-8")
 
 
-def build_price_charts(engine) -> List[Path]:
-    """Build interactive price charts for each ticker."""
+def _data_name(prefix: str, key: str) -> str:
+    return f"assets/data/{prefix}_{key}.js"
 
-    q = (
-        select(
-            Asset.ticker,
-            Price.date,
-            Price.open,
-            Price.high,
-            Price.low,
-            Price.close,
-        )
-        .join(Price, Asset.id == Price.asset_id)
-        .order_by(Asset.ticker, Price.date)
-    )
-    try:
-        with engine.connect() as conn:
-            df = pd.read_sql(q, conn)
-    except Exception:
-        df = pd.DataFrame()
+
+def _plan_series(
+    engine,
+    kind: str,
+    prefix: str,
+    manifest: BuildManifest | None,
+    fields: Sequence[str] | None = None,
+) -> Tuple[List[str] | None, Dict[str, Any]]:
+    """Return the series keys to render (``None``: all) and their fingerprints.
+
+    ``fields`` are the charted columns the fingerprints cover.  Data files of
+    series that no longer exist are removed.
+    """
+
+    if manifest is None:
+        return None, {}
+    fingerprints = series_fingerprints(engine, kind, fields)
+    manifest.prune(f"assets/data/{prefix}_", (_data_name(prefix, k) for k in fingerprints))
+    todo = [
+        k
+        for k in sorted(fingerprints)
+        if not manifest.is_fresh(_data_name(prefix, k), fingerprints[k])
+    ]
+    return todo, fingerprints
+
+
+def _series_slices(
+    df: pd.DataFrame, key: str, columns: Tuple[str, ...]
+) -> Iterator[Tuple[str, List[np.ndarray]]]:
+    """Yield ``(key, [dates, *columns])`` arrays per series of ``df``.
+
+    ``df`` must be sorted by ``key`` and ``date`` (as the columnar readers
+    return it); the arrays are views into one array per column.
+    """
 
     if df.empty:
-        return []
-
-    df["date"] = pd.to_datetime(df["date"])
-    out_paths: List[Path] = []
-    for ticker, group in df.groupby("ticker"):
-        group = group.sort_values("date")
-        group["ma20"] = group["close"].rolling(20).mean()
-        fig = go.Figure()
-        fig.add_trace(
-            go.Candlestick(
-                x=group["date"],
-                open=group["open"],
-                high=group["high"],
-                low=group["low"],
-                close=group["close"],
-                name="OHLC",
-            )
+        return
+    keys = df[key].to_numpy()
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    arrays = [df[c].to_numpy() for c in ("date", *columns)]
+    for lo, hi in zip([0, *bounds], [*bounds, len(keys)]):
+        yield keys[lo], [a[lo:hi] for a in arrays]
+
+
+def _render_price(path: Path, ticker: str, dates, *columns) -> None:
+    series = {
+        "kind": "price",
+        "title": ticker,
+        "t": encode_dates(dates),
+        "c": {name: encode_column(v) for name, v in zip(PRICE_CHART_FIELDS, columns)},
+    }
+    _write_series(path, series)
+
+
+def _render_index(path: Path, code: str, dates, values) -> None:
+    series = {
+        "kind": "index",
+        "title": code,
+        "t": encode_dates(dates),
+        "c": {"value": encode_column(values)},
+    }
+    _write_series(path, series)
+
+
+def _render_charts(
+    render: Callable[..., None],
+    jobs: List[Tuple[Path, str, List[np.ndarray]]],
+    workers: int | None = None,
+) -> None:
+    """Call ``render(path, title, *arrays)`` for every job.
+
+    Jobs are spread over ``workers`` processes (``MMW_REPORT_WORKERS_PER_CORE``
+    times the CPU count); with a single worker or job, the default, they run
+    in-process.
+    """
+
+    workers = min(workers or REPORT_WORKERS, len(jobs))
+    if workers <= 1:
+        for path, title, arrays in jobs:
+            render(path, title, *arrays)
+        return
+    ensure_dirs(*{path.parent for path, _, _ in jobs})
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render, path, title, *arrays) for path, title, arrays in jobs]
+        for fut in futures:
+            fut.result()
+
+
+def build_price_charts(
+    engine, manifest: BuildManifest | None = None, workers: int | None = None
+) -> List[Path]:
+    """Write the chart data file of each ticker.
+
+    Files are encoded in-process or, with several ``workers``, on a process
+    pool where each process receives only its ticker's arrays.  With a
+    ``manifest`` only tickers whose prices changed since the last build are
+    read and written; the paths of all data files are returned.
+    """
+
+    try:
+        todo, fingerprints = _plan_series(
+            engine, "prices", "price", manifest, PRICE_CHART_FIELDS
         )
-        fig.add_trace(
-            go.Scatter(x=group["date"], y=group["ma20"], name="MA20")
+        df = (
+            read_prices(engine, todo, columns=PRICE_CHART_FIELDS)
+            if todo != []
+            else pd.DataFrame()
         )
-        fig.update_layout(title=ticker, xaxis_title="Date", yaxis_title="Price")
-        out_path = DOCS_DIR / "assets" / f"price_{ticker}.html"
-        _write_html(fig, out_path)
-        out_paths.append(out_path)
-    return out_paths
+    except Exception:
+        todo, fingerprints = None, {}
+        df = pd.DataFrame()
 
+    jobs = [
+        (DOCS_DIR / _data_name("price", ticker), ticker, arrays)
+        for ticker, arrays in _series_slices(df, "ticker", PRICE_CHART_FIELDS)
+    ]
+    _render_charts(_render_price, jobs, workers)
+    if manifest is not None:
+        for _, ticker, _ in jobs:
+            manifest.record(_data_name("price", ticker), fingerprints[ticker])
+        return [DOCS_DIR / _data_name("price", t) for t in sorted(fingerprints)]
+    return [path for path, _, _ in jobs]
 
-def build_index_charts(engine) -> List[Path]:
-    """Build line charts for each shipping index."""
 
-    q = (
-        select(Index.code, IndexPoint.date, IndexPoint.value)
-        .join(IndexPoint, Index.id == IndexPoint.index_id)
-        .order_by(Index.code, IndexPoint.date)
-    )
+def build_index_charts(
+    engine, manifest: BuildManifest | None = None, workers: int | None = None
+) -> List[Path]:
+    """Write the chart data file of each shipping index.
+
+    Files are encoded like the price data, serially by default.  With a
+    ``manifest`` only indices with new or changed points are written; the
+    paths of all data files are returned.
+    """
+
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(q, conn)
+        todo, fingerprints = _plan_series(engine, "index_points", "index", manifest)
+        df = read_index_points(engine, todo) if todo != [] else pd.DataFrame()
     except Exception:
+        todo, fingerprints = None, {}
         df = pd.DataFrame()
 
-    if df.empty:
-        return []
-
-    df["date"] = pd.to_datetime(df["date"])
-    out_paths: List[Path] = []
-    for code, group in df.groupby("code"):
-        group = group.sort_values("date")
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(x=group["date"], y=group["value"], mode="lines", name=code)
-        )
-        fig.update_layout(title=code, xaxis_title="Date", yaxis_title="Value")
-        out_path = DOCS_DIR / "assets" / f"index_{code}.html"
-        _write_html(fig, out_path)
-        out_paths.append(out_path)
-    return out_paths
+    jobs = [
+        (DOCS_DIR / _data_name("index", code), code, arrays)
+        for code, arrays in _series_slices(df, "code", ("value",))
+    ]
+    _render_charts(_render_index, jobs, workers)
+    if manifest is not None:
+        for _, code, _ in jobs:
+            manifest.record(_data_name("index", code), fingerprints[code])
+        return [DOCS_DIR / _data_name("index", c) for c in sorted(fingerprints)]
+    return [path for path, _, _ in jobs]
 
 
-def build_news_dash(engine) -> Path:
-    """Build table of latest news items with summaries."""
+def build_news_dash(engine, manifest: BuildManifest | None = None) -> Path:
+    """Build table of latest news items with summaries.
+
+    With a ``manifest`` the page is only rewritten when the listed rows
+    changed.
+    """
 
     q = (
         select(
@@ -127,6 +384,13 @@ def build_news_dash(engine) -> Path:
     except Exception:
         df = pd.DataFrame()
 
+    out_path = DOCS_DIR / "assets" / "news.html"
+    fingerprint = hashlib.sha256(
+        df.to_json(orient="values", date_format="iso").encode("utf-8")
+    ).hexdigest()
+    if manifest is not None and manifest.is_fresh("assets/news.html", fingerprint):
+        return out_path
+
     df["published_at"] = pd.to_datetime(df.get("published_at"))
     df["text"] = df.get("summary_ai", pd.Series(dtype=str)).fillna("")
     if "summary" in df:
@@ -150,64 +414,82 @@ def build_news_dash(engine) -> Path:
         "<h1>Latest news</h1>"
         f"{table_html}</body></html>"
     )
-    out_path = DOCS_DIR / "assets" / "news.html"
     ensure_dirs(out_path.parent)
     out_path.write_text(html, encoding="utf-8")
+    if manifest is not None:
+        manifest.record("assets/news.html", fingerprint)
     return out_path
 
 
-def build_insights(engine) -> Path:
-    """Build simple text insights about recent activity."""
+def _insights_fingerprint(engine, today: date) -> List[Any]:
+    """Return the day plus watermarks of the prices, news and links tables."""
+
+    with engine.connect() as conn:
+        news = conn.execute(select(func.count(News.id), func.max(News.id))).one()
+        links = conn.execute(select(func.count(Link.id), func.max(Link.id))).one()
+    return [today.isoformat(), prices_watermark(engine), list(news), list(links)]
+
+
+def build_insights(engine, manifest: BuildManifest | None = None) -> Path:
+    """Build simple text insights about recent activity.
+
+    News counts come from the daily rollups, so they are counted per
+    calendar day.  With a ``manifest`` the page is only rebuilt when the day
+    changed or prices, news or links were written.
+    """
 
     now = pd.Timestamp.utcnow().tz_localize(None)
     week_ago = now - pd.Timedelta(days=7)
     month_ago = now - pd.Timedelta(days=30)
 
+    out_path = DOCS_DIR / "assets" / "insights.html"
+    if manifest is not None:
+        try:
+            fingerprint = _insights_fingerprint(engine, now.date())
+        except Exception:
+            fingerprint = None
+        if fingerprint is not None and manifest.is_fresh("assets/insights.html", fingerprint):
+            return out_path
+
     try:
-        with engine.connect() as conn:
-            news_df = pd.read_sql(select(News.published_at), conn)
+        daily = news_intensity(engine, start=month_ago)
+        covered = {
+            label: ticker_news_counts(engine, start=since).head(1)
+            for label, since in (("week", week_ago), ("month", month_ago))
+        }
     except Exception:
-        news_df = pd.DataFrame(columns=["published_at"])
+        daily = pd.DataFrame(columns=["date", "news_count", "avg_sentiment"])
+        covered = {}
     try:
-        with engine.connect() as conn:
-            price_df = pd.read_sql(
-                select(Asset.ticker, Price.date, Price.close)
-                .join(Price, Asset.id == Price.asset_id)
-                .where(Price.date >= month_ago)
-                .order_by(Asset.ticker, Price.date),
-                conn,
-            )
+        returns = returns_matrix(engine)
     except Exception:
-        price_df = pd.DataFrame(columns=["ticker", "date", "close"])
+        returns = pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
 
-    news_df["published_at"] = pd.to_datetime(news_df.get("published_at"))
-    count_week = int((news_df["published_at"] >= week_ago).sum())
-    count_month = int((news_df["published_at"] >= month_ago).sum())
+    count_week = int(daily.loc[daily["date"] >= week_ago.date(), "news_count"].sum())
+    count_month = int(daily["news_count"].sum())
+    top_covered = {
+        label: f"{df['ticker'].iloc[0]} ({df['news_count'].iloc[0]})" if len(df) else "N/A"
+        for label, df in covered.items()
+    }
 
     top_week = "N/A"
     top_week_val = 0.0
     top_month = "N/A"
     top_month_val = 0.0
 
-    if not price_df.empty:
-        price_df["date"] = pd.to_datetime(price_df["date"])
-        wide = (
-            price_df.pivot_table(index="date", columns="ticker", values="close")
-            .sort_index()
-            .ffill()
-        )
-        if len(wide) > 1:
-            last = wide.iloc[-1]
-            week_start = wide[wide.index >= week_ago].iloc[0]
-            month_start = wide.iloc[0]
-            week_change = (last - week_start) / week_start
-            month_change = (last - month_start) / month_start
-            if not week_change.empty:
-                top_week = week_change.abs().idxmax()
-                top_week_val = week_change[top_week]
-            if not month_change.empty:
-                top_month = month_change.abs().idxmax()
-                top_month_val = month_change[top_month]
+    # Price changes over the window compound the cached daily returns after
+    # the window's first trading day.
+    window = returns[returns.index >= month_ago].dropna(axis=1, how="all")
+    if len(window) > 1:
+        month_change = (1 + window.iloc[1:].fillna(0.0)).prod() - 1
+        week = window[window.index >= week_ago]
+        week_change = (1 + week.iloc[1:].fillna(0.0)).prod() - 1
+        if not week_change.empty:
+            top_week = week_change.abs().idxmax()
+            top_week_val = week_change[top_week]
+        if not month_change.empty:
+            top_month = month_change.abs().idxmax()
+            top_month_val = month_change[top_month]
 
     html = (
         "<html><head><meta charset='utf-8'>"
@@ -215,39 +497,63 @@ def build_insights(engine) -> Path:
         "<h1>Insights</h1>"
         "<div class='card'><h2>Week</h2>"
         f"<p>News: {count_week}</p>"
+        f"<p>Most covered: {top_covered.get('week', 'N/A')}</p>"
         f"<p>Top move: {top_week} {top_week_val:+.2%}</p></div>"
         "<div class='card'><h2>Month</h2>"
         f"<p>News: {count_month}</p>"
+        f"<p>Most covered: {top_covered.get('month', 'N/A')}</p>"
         f"<p>Top move: {top_month} {top_month_val:+.2%}</p></div>"
         "</body></html>"
     )
-    out_path = DOCS_DIR / "assets" / "insights.html"
     ensure_dirs(out_path.parent)
     out_path.write_text(html, encoding="utf-8")
+    if manifest is not None and fingerprint is not None:
+        manifest.record("assets/insights.html", fingerprint)
     return out_path
 
 
-def build_site(engine = None) -> Path:
-    """Generate full static site under ``docs`` directory."""
+def build_site(engine = None, workers: int | None = None) -> Path:
+    """Generate full static site under ``docs`` directory.
 
-    from .db import engine as default_engine
+    The build is incremental: ``docs/build_manifest.json`` stores a
+    fingerprint of each artifact's inputs and unchanged artifacts are
+    skipped.  Without an explicit ``engine`` the database is opened with the
+    read-only ``report`` profile so the build can run while a refresh is
+    writing.  ``workers`` overrides the number of chart rendering processes.
+    With ``MMW_PRICE_SOURCE=columnar`` the Parquet mirror is synced first:
+    charts are read from it while their fingerprints come from SQL.
+    """
 
-    engine = engine or default_engine
+    engine = engine or create_db_engine(profile="report")
+    if PRICE_SOURCE == "columnar":
+        sync_mirror(engine)
     ensure_dirs(DOCS_DIR, DOCS_DIR / "assets")
+    manifest = BuildManifest(DOCS_DIR)
+
+    price_files = build_price_charts(engine, manifest, workers)
+    index_files = build_index_charts(engine, manifest, workers)
+    build_news_dash(engine, manifest)
+    build_insights(engine, manifest)
+    manifest.save()
+    logger.info(
+        "Site build: %d artifacts rendered, %d unchanged skipped",
+        manifest.rendered,
+        manifest.skipped,
+    )
 
-    price_files = build_price_charts(engine)
-    index_files = build_index_charts(engine)
-    build_news_dash(engine)
-    build_insights(engine)
+    chart_page = DOCS_DIR / "assets" / "chart.html"
+    chart_page.write_text(CHART_PAGE % {"plotly": get_plotlyjs_version()}, encoding="utf-8")
 
-    price_links = "".join(
-        f'<li><a href="assets/{p.name}">{p.stem.replace("price_", "")}</a></li>'
-        for p in price_files
-    )
-    index_links = "".join(
-        f'<li><a href="assets/{p.name}">{p.stem.replace("index_", "")}</a></li>'
-        for p in index_files
-    )
+    def _chart_links(files: List[Path]) -> str:
+        links = []
+        for p in files:
+            kind, key = p.stem.split("_", 1)
+            href = f"assets/chart.html?kind={kind}&amp;key={quote(key, safe='')}"
+            links.append(f'<li><a href="{href}">{escape(key)}</a></li>')
+        return "".join(links)
+
+    price_links = _chart_links(price_files)
+    index_links = _chart_links(index_files)
 
     index_html = (
         "<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'>"
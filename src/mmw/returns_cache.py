@@ -0,0 +1,182 @@
+"""Cache of wide ``date x ticker`` daily returns matrices.
+
+Event studies, rolling correlations and the report insights all start from
+the same returns matrix.  :class:`ReturnsCache` keeps recently used matrices
+in memory with LRU eviction and, for file databases, persists them as Parquet
+under ``RETURNS_CACHE_DIR`` so later CLI runs can reuse them.
+
+Entries are keyed by a watermark of the price data (see
+:func:`prices_watermark`): the ``prices.version`` checkpoint bumped by every
+price writer, the highest ``prices.id`` and, when reads go to the Parquet
+mirror, a hash of its manifest.  A matrix is therefore recomputed only after
+prices changed.  A request for a subset of the tickers of a cached matrix is
+served from that matrix.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from itertools import count
+from pathlib import Path
+from typing import Callable, FrozenSet, Iterable, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from .columnar import mirror_version
+from .config import RETURNS_CACHE_DIR, RETURNS_CACHE_SIZE
+from .db import PRICES_VERSION, Price, get_checkpoint
+from .utils import ensure_dirs
+
+logger = logging.getLogger(__name__)
+
+# (database, tickers or None for all, watermark)
+CacheKey = Tuple[str, Optional[FrozenSet[str]], str]
+
+# In-memory databases are identified per engine; ``id()`` could be reused.
+_memory_ids: "weakref.WeakKeyDictionary[object, int]" = weakref.WeakKeyDictionary()
+_next_memory_id = count(1)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def database_key(engine) -> Tuple[str, bool]:
+    """Return ``(identity, persistable)`` for ``engine``'s database.
+
+    In-memory databases are private to their engine and never persisted.
+    """
+
+    database = engine.url.database
+    if not database or database == ":memory:":
+        if engine not in _memory_ids:
+            _memory_ids[engine] = next(_next_memory_id)
+        return f"memory:{_memory_ids[engine]}", False
+    return str(Path(database).resolve()), True
+
+
+def prices_watermark(engine, source: str | None = None) -> str:
+    """Return a string that changes whenever the stored prices change."""
+
+    with engine.connect() as conn:
+        version = get_checkpoint(conn, PRICES_VERSION, "0")
+        max_id = conn.scalar(select(func.max(Price.id))) or 0
+    mirror = mirror_version("prices", source)
+    return f"{version}-{max_id}" + (f"-{mirror}" if mirror else "")
+
+
+class ReturnsCache:
+    """LRU cache of returns matrices with optional Parquet persistence.
+
+    ``maxsize`` bounds the number of matrices held in memory; ``directory``
+    (``None`` disables persistence) receives one Parquet file per database
+    and ticker set, replaced whenever the watermark moves on.  ``stats``
+    counts ``hits``, ``disk_hits`` and ``misses``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RETURNS_CACHE_SIZE,
+        directory: Path | str | None = RETURNS_CACHE_DIR or None,
+    ):
+        self.maxsize = maxsize
+        self.directory = Path(directory) if directory else None
+        self.stats: Counter = Counter()
+        self._entries: "OrderedDict[CacheKey, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (files on disk are kept)."""
+
+        with self._lock:
+            self._entries.clear()
+
+    def get(
+        self,
+        database: str,
+        tickers: Iterable[str] | None,
+        watermark: str,
+        compute: Callable[[], pd.DataFrame],
+        persist: bool = True,
+    ) -> pd.DataFrame:
+        """Return the matrix for ``tickers``, calling ``compute`` on a miss.
+
+        The returned frame is a shallow copy: with pandas copy-on-write it
+        can be modified without affecting the cached matrix.
+        """
+
+        wanted = None if tickers is None else frozenset(tickers)
+        key: CacheKey = (database, wanted, watermark)
+        frame = self._memory_lookup(key)
+        if frame is not None:
+            self.stats["hits"] += 1
+            return frame.copy(deep=False)
+
+        path = self._path(key) if persist else None
+        if path is not None and path.exists():
+            try:
+                frame = pd.read_parquet(path)
+                self.stats["disk_hits"] += 1
+            except Exception as exc:
+                logger.warning("Ignoring unreadable returns cache %s: %s", path, exc)
+        if frame is None:
+            self.stats["misses"] += 1
+            frame = compute()
+            if path is not None:
+                self._save(path, frame)
+        self._remember(key, frame)
+        return frame.copy(deep=False)
+
+    # -- memory ------------------------------------------------------------
+
+    def _memory_lookup(self, key: CacheKey) -> pd.DataFrame | None:
+        database, wanted, watermark = key
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if wanted is None:
+                return None
+            for (db, have, mark), frame in reversed(self._entries.items()):
+                if db == database and mark == watermark and (have is None or wanted <= have):
+                    self._entries.move_to_end((db, have, mark))
+                    columns = [c for c in frame.columns if c in wanted]
+                    return frame[columns].dropna(how="all")
+        return None
+
+    def _remember(self, key: CacheKey, frame: pd.DataFrame) -> None:
+        with self._lock:
+            self._entries[key] = frame
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # -- disk --------------------------------------------------------------
+
+    def _path(self, key: CacheKey) -> Path | None:
+        if self.directory is None:
+            return None
+        database, wanted, watermark = key
+        tickers = "*" if wanted is None else ",".join(sorted(wanted))
+        return self.directory / _digest(database) / f"{_digest(tickers)}-{watermark}.parquet"
+
+    def _save(self, path: Path, frame: pd.DataFrame) -> None:
+        prefix = path.name.split("-", 1)[0]
+        try:
+            ensure_dirs(path.parent)
+            for stale in path.parent.glob(f"{prefix}-*.parquet"):
+                stale.unlink(missing_ok=True)
+            tmp = path.with_suffix(".tmp")
+            frame.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception as exc:
+            logger.warning("Could not persist returns cache %s: %s", path, exc)
+
+
+returns_cache = ReturnsCache()
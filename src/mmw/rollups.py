@@ -0,0 +1,269 @@
+"""Materialized daily rollups maintained incrementally.
+
+Four tables hold aggregates the report, the Streamlit app and analytics
+would otherwise recompute from raw rows:
+
+* ``news_daily`` - articles and total ``summary_ai`` length per day/source;
+* ``ticker_news_daily`` - linked articles per ticker and day;
+* ``price_weekly`` / ``price_monthly`` - last close per asset and period.
+
+Changed days are queued in ``rollup_dirty`` by database triggers (see
+:data:`mmw.db.ROLLUP_TRIGGERS`), and newly inserted prices are found through
+the ``rollup.prices.last_id`` watermark.  :func:`refresh_rollups` recomputes
+only the queued days and periods and runs after every ingest.  Readers check
+:func:`rollups_current` and fall back to raw queries while work is pending.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, delete, func, insert, select
+
+from .db import (
+    QUEUE_ALL_NEWS_DAYS,
+    Checkpoint,
+    Link,
+    News,
+    NewsDaily,
+    Price,
+    PriceMonthly,
+    PriceWeekly,
+    RollupDirty,
+    TickerNewsDaily,
+    chunked,
+    engine,
+    get_checkpoint,
+    init_db,
+    set_checkpoint,
+)
+
+logger = logging.getLogger(__name__)
+
+PRICES_CHECKPOINT = "rollup.prices.last_id"
+
+# Dirty days recomputed per query (one index range over published_at).
+DAY_CHUNK = 200
+
+FREQUENCIES: Dict[str, Any] = {"weekly": PriceWeekly, "monthly": PriceMonthly}
+
+
+# ---------------------------------------------------------------------------
+# helpers
+# ---------------------------------------------------------------------------
+
+def period_start(day: date, freq: str) -> date:
+    """Return the Monday of ``day``'s week or the first day of its month."""
+
+    if freq == "weekly":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _next_period(day: date, freq: str) -> date:
+    start = period_start(day, freq)
+    if freq == "weekly":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def period_closes(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Reduce ``date``/``close`` rows to the last bar of each period.
+
+    Any extra key columns (e.g. ``asset_id`` or ``ticker``) are kept and
+    grouped by.  Returns those keys plus ``period``, ``last_date``, ``close``.
+    """
+
+    keys = [c for c in df.columns if c not in ("date", "close")]
+    if df.empty:
+        return pd.DataFrame(columns=[*keys, "period", "last_date", "close"])
+    dates = pd.to_datetime(df["date"])
+    if freq == "weekly":
+        period = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+    else:
+        period = dates.dt.to_period("M").dt.start_time
+    out = df.assign(date=dates, period=period.dt.date).sort_values("date")
+    last = out.groupby([*keys, "period"], sort=True).tail(1)
+    return last.rename(columns={"date": "last_date"})[
+        [*keys, "period", "last_date", "close"]
+    ].reset_index(drop=True)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def _on_days(column, days: List[date]):
+    """Restrict ``column`` to ``days``: an index range plus an exact filter."""
+
+    return and_(
+        column >= _midnight(days[0]),
+        column < _midnight(days[-1] + timedelta(days=1)),
+        func.date(column).in_([d.isoformat() for d in days]),
+    )
+
+
+def rollups_current(conn, kind: str) -> bool:
+    """Return ``True`` if no ``kind`` (``news``/``prices``) work is pending."""
+
+    if conn.scalar(select(RollupDirty.id).where(RollupDirty.kind == kind).limit(1)):
+        return False
+    if kind == "prices":
+        last_id = int(get_checkpoint(conn, PRICES_CHECKPOINT, "0"))
+        return (conn.scalar(select(func.max(Price.id))) or 0) <= last_id
+    return True
+
+
+# ---------------------------------------------------------------------------
+# refresh
+# ---------------------------------------------------------------------------
+
+def _refresh_news(conn) -> int:
+    days = sorted(
+        conn.scalars(select(RollupDirty.day).where(RollupDirty.kind == "news").distinct())
+    )
+    for chunk in chunked(days, DAY_CHUNK):
+        chunk = list(chunk)
+        day = func.date(News.published_at)
+        daily = conn.execute(
+            select(
+                day,
+                func.coalesce(News.source, ""),
+                func.count(),
+                func.total(func.length(News.summary_ai)),
+            )
+            .where(_on_days(News.published_at, chunk))
+            .group_by(day, News.source)
+        ).all()
+        tickers = conn.execute(
+            select(Link.asset_ticker, day, func.count(func.distinct(News.id)))
+            .join(News, Link.news_id == News.id)
+            .where(_on_days(News.published_at, chunk), Link.asset_ticker.is_not(None))
+            .group_by(Link.asset_ticker, day)
+        ).all()
+
+        conn.execute(delete(NewsDaily).where(NewsDaily.date.in_(chunk)))
+        conn.execute(delete(TickerNewsDaily).where(TickerNewsDaily.date.in_(chunk)))
+        news_rows: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+        for d, source, n, length in daily:
+            acc = news_rows[(date.fromisoformat(d), source)]
+            acc[0] += n
+            acc[1] += int(length)
+        if news_rows:
+            conn.execute(
+                insert(NewsDaily),
+                [
+                    {"date": d, "source": src, "news_count": n, "summary_len": length}
+                    for (d, src), (n, length) in news_rows.items()
+                ],
+            )
+        if tickers:
+            conn.execute(
+                insert(TickerNewsDaily),
+                [
+                    {"ticker": t, "date": date.fromisoformat(d), "news_count": n}
+                    for t, d, n in tickers
+                ],
+            )
+    conn.execute(delete(RollupDirty).where(RollupDirty.kind == "news"))
+    return len(days)
+
+
+def _refresh_prices(conn) -> int:
+    last_id = int(get_checkpoint(conn, PRICES_CHECKPOINT, "0"))
+    max_id = conn.scalar(select(func.max(Price.id))) or 0
+
+    # asset id -> [first, last] changed day
+    spans: Dict[int, List[date]] = {}
+
+    def _widen(asset_id: int, lo, hi) -> None:
+        lo, hi = pd.Timestamp(lo).date(), pd.Timestamp(hi).date()
+        span = spans.setdefault(asset_id, [lo, hi])
+        span[0], span[1] = min(span[0], lo), max(span[1], hi)
+
+    for asset_id, lo, hi in conn.execute(
+        select(Price.asset_id, func.min(Price.date), func.max(Price.date))
+        .where(Price.id > last_id)
+        .group_by(Price.asset_id)
+    ):
+        _widen(asset_id, lo, hi)
+    for asset_id, lo, hi in conn.execute(
+        select(RollupDirty.key, func.min(RollupDirty.day), func.max(RollupDirty.day))
+        .where(RollupDirty.kind == "prices")
+        .group_by(RollupDirty.key)
+    ):
+        _widen(asset_id, lo, hi)
+
+    for asset_id, (lo, hi) in spans.items():
+        start = min(period_start(lo, f) for f in FREQUENCIES)
+        end = max(_next_period(hi, f) for f in FREQUENCIES)
+        df = pd.read_sql(
+            select(Price.date, Price.close).where(
+                Price.asset_id == asset_id,
+                Price.date >= _midnight(start),
+                Price.date < _midnight(end),
+            ),
+            conn,
+        )
+        for freq, model in FREQUENCIES.items():
+            first, stop = period_start(lo, freq), _next_period(hi, freq)
+            conn.execute(
+                delete(model).where(
+                    model.asset_id == asset_id, model.period >= first, model.period < stop
+                )
+            )
+            rows = period_closes(df, freq)
+            rows = rows[(rows["period"] >= first) & (rows["period"] < stop)]
+            if not rows.empty:
+                conn.execute(
+                    insert(model),
+                    [
+                        {
+                            "asset_id": asset_id,
+                            "period": r.period,
+                            "last_date": r.last_date.to_pydatetime(),
+                            "close": r.close,
+                        }
+                        for r in rows.itertuples(index=False)
+                    ],
+                )
+
+    conn.execute(delete(RollupDirty).where(RollupDirty.kind == "prices"))
+    set_checkpoint(conn, PRICES_CHECKPOINT, max_id)
+    return len(spans)
+
+
+def refresh_rollups(engine=engine, full: bool = False) -> Dict[str, int]:
+    """Bring all rollup tables up to date, recomputing only what changed.
+
+    With ``full=True`` the rollups are rebuilt from scratch.  Returns the
+    number of refreshed news days and price assets.
+    """
+
+    with engine.begin() as conn:
+        if full:
+            for model in (NewsDaily, TickerNewsDaily, PriceWeekly, PriceMonthly, RollupDirty):
+                conn.execute(delete(model))
+            conn.execute(delete(Checkpoint).where(Checkpoint.name == PRICES_CHECKPOINT))
+            conn.exec_driver_sql(QUEUE_ALL_NEWS_DAYS)
+        stats = {"news_days": _refresh_news(conn), "price_assets": _refresh_prices(conn)}
+    logger.info(
+        "Rollups refreshed: %d news days, %d price assets",
+        stats["news_days"],
+        stats["price_assets"],
+    )
+    return stats
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh rollup tables")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch")
+    args = parser.parse_args()
+    init_db()
+    refresh_rollups(engine, full=args.full)
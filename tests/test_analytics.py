@@ -1,12 +1,20 @@
 from datetime import datetime
+from itertools import combinations
 
+import numpy as np
 import pandas as pd
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from mmw import db
-from mmw.analytics import compute_daily_returns, news_intensity
+from mmw.analytics import (
+    RollingCorrelation,
+    compute_daily_returns,
+    news_intensity,
+    rolling_corr,
+    rolling_corr_matrix,
+)
 
 
 def test_compute_daily_returns_percentage_changes():
@@ -74,3 +82,121 @@ def test_news_intensity_daily_aggregation():
     assert df.loc[1, "date"] == datetime(2024, 1, 2).date()
     assert df.loc[1, "news_count"] == 1
     assert df.loc[1, "avg_sentiment"] == pytest.approx(3)
+
+
+def test_news_intensity_filters_by_day_and_source():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, future=True)
+
+    with Session.begin() as session:
+        session.add_all([
+            db.News(url="u1", title="t", source="a", summary_ai="abcd",
+                    published_at=datetime(2024, 1, 1, 23, 59)),
+            db.News(url="u2", title="t", source="b", summary_ai=None,
+                    published_at=datetime(2024, 1, 2, 0, 0)),
+            db.News(url="u3", title="t", source="a", summary_ai="ab",
+                    published_at=datetime(2024, 1, 2, 18, 30)),
+            db.News(url="u4", title="t", source="a", summary_ai="x", published_at=None),
+        ])
+
+    df = news_intensity(engine, start="2024-01-02", end="2024-01-02")
+    assert df["date"].tolist() == [datetime(2024, 1, 2).date()]
+    assert df.loc[0, "news_count"] == 2
+    assert df.loc[0, "avg_sentiment"] == pytest.approx(1.0)
+
+    df = news_intensity(engine, sources=["a"])
+    assert df["news_count"].tolist() == [1, 1]
+    assert news_intensity(engine, start="2024-02-01").empty
+
+
+def _random_returns(n_tickers=5, n_days=80):
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2024-01-01", periods=n_days)
+    frames = []
+    for k in range(n_tickers):
+        ret = rng.normal(0, 0.02, n_days)
+        if k == 1:
+            ret[[5, n_days // 2, n_days // 2 + 1]] = np.nan
+        frames.append(pd.DataFrame({"date": dates, "ticker": f"T{k}", "ret": ret}))
+    return pd.concat(frames).dropna()
+
+
+@pytest.mark.parametrize("upper", [False, True])
+def test_rolling_corr_matrix_matches_pandas(upper):
+    ret_df = _random_returns()
+    wide = ret_df.pivot(index="date", columns="ticker", values="ret").sort_index()
+    # a tiny memory budget forces several row blocks
+    values = rolling_corr_matrix(wide.to_numpy(), 10, upper=upper, block_bytes=2000)
+    result = RollingCorrelation(wide.index, list(wide.columns), 10, values)
+
+    for a, b in combinations(wide.columns, 2):
+        expected = wide[a].rolling(10).corr(wide[b])
+        np.testing.assert_allclose(result.pair(a, b).to_numpy(), expected.to_numpy(), atol=1e-12)
+
+
+def test_rolling_corr_tidy_view():
+    ret_df = _random_returns(n_tickers=3, n_days=20)
+    df = rolling_corr(ret_df, window=5)
+    assert list(df.columns) == ["date", "pair", "corr"]
+    assert list(df["pair"].unique()) == ["T0-T1", "T0-T2", "T1-T2"]
+    assert len(df) == 3 * 20
+    assert df["corr"].iloc[:4].isna().all()
+    assert rolling_corr(ret_df.iloc[0:0]).empty
+
+
+def _event_engine(monkeypatch):
+    from mmw import analytics
+
+    monkeypatch.setattr(analytics, "WATCHLIST_TICKERS", ["AAA", "BBB"])
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    days = pd.bdate_range("2024-01-01", periods=10)  # Mon 1st .. Fri 12th
+    Session = sessionmaker(bind=engine, future=True)
+    with Session.begin() as session:
+        for ticker, step in (("AAA", 0.02), ("BBB", 0.0)):
+            asset = db.Asset(ticker=ticker)
+            session.add(asset)
+            session.flush()
+            close = 100.0
+            for k, day in enumerate(days):
+                close *= 1 + (step if k % 2 else -step)
+                session.add(db.Price(asset_id=asset.id, date=day.to_pydatetime(), close=close))
+        # Saturday news maps to Monday 8th; Tuesday news to itself
+        for i, published in enumerate([datetime(2024, 1, 6, 9), datetime(2024, 1, 2, 12)]):
+            news = db.News(url=f"u{i}", title="t", published_at=published)
+            session.add(news)
+            session.flush()
+            session.add(db.Link(news_id=news.id, asset_ticker="AAA", score=1.0))
+    return engine, days
+
+
+def test_event_windows_use_trading_days(monkeypatch):
+    from mmw.analytics import event_windows
+
+    engine, days = _event_engine(monkeypatch)
+    result = event_windows(engine, ["AAA", "BBB"], window=(-2, 2))
+
+    assert list(result.rel_days) == [-2, -1, 0, 1, 2]
+    assert list(result.events["day0"]) == [days[1], days[5]]
+    assert result.abret.shape == (2, 5)
+    # returns start on the 2nd bar, so the first event's day -2 is missing
+    assert np.isnan(result.abret[0, 0])
+    # AAA alternates +-2%, BBB is flat: abnormal return is half of AAA's
+    assert result.abret[1, 2] == pytest.approx(0.01)
+    assert result.abret[1, 3] == pytest.approx(-0.01)
+
+
+def test_event_study_many_summarises_per_ticker(monkeypatch):
+    from mmw.analytics import event_study, event_study_many
+
+    engine, _ = _event_engine(monkeypatch)
+    many = event_study_many(engine, window=(-1, 1))
+    assert list(many.columns) == ["ticker", "rel_day", "abret_mean", "abret_std", "n_events"]
+    assert set(many["ticker"]) == {"AAA"}
+    assert list(many["n_events"]) == [1, 2, 2]
+
+    single = event_study(engine, "AAA", window=(-1, 1))
+    pd.testing.assert_frame_equal(
+        single, many.drop(columns="ticker").reset_index(drop=True)
+    )
@@ -0,0 +1,88 @@
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+
+from mmw import async_ingest, db, indices, news, prices
+
+
+def _fake_sources(monkeypatch, engine):
+    def fake_chunk(tickers, start, end, retries, backoff):
+        df = pd.DataFrame(
+            {
+                "ticker": tickers,
+                "date": pd.Timestamp("2024-01-02"),
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 1.0,
+                "volume": 1.0,
+            }
+        )
+        return df, []
+
+    def fake_rss(url):
+        return [
+            {
+                "source": url,
+                "url": f"{url}/a",
+                "title": "t",
+                "summary": "s",
+                "published": "2024-01-02T00:00:00Z",
+            }
+        ], {"url": url, "etag": "v1", "last_modified": None, "checked_at": datetime(2024, 1, 2)}
+
+    def fake_scraper():
+        return pd.DataFrame(
+            [{"date": pd.Timestamp("2024-01-02"), "index_code": "SCFI", "value": 1.5}]
+        )
+
+    monkeypatch.setattr(prices, "engine", engine)
+    monkeypatch.setattr(prices, "WATCHLIST_TICKERS", ["AAA", "BBB", "CCC"])
+    monkeypatch.setattr(prices, "fetch_price_chunk", fake_chunk)
+    monkeypatch.setattr(async_ingest, "PRICE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(news, "RSS_FEEDS", ["f1", "f2"])
+    monkeypatch.setattr(news, "fetch_rss", fake_rss)
+    monkeypatch.setattr(indices, "SCRAPERS", (fake_scraper,))
+    monkeypatch.setattr(indices, "load_indices_csv", lambda: None)
+
+
+def test_run_async_ingest_writes_all_sources(tmp_path, monkeypatch):
+    path = tmp_path / "mmw.sqlite"
+    engine = db.create_db_engine(f"sqlite:///{path}", profile="test")
+    db.init_db(engine)
+    _fake_sources(monkeypatch, engine)
+
+    stats = async_ingest.ingest(since="2024-01-01", db_path=path, concurrency=2)
+    assert stats == {"prices": 3, "news": 2, "index_points": 1, "failed_tickers": []}
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(db.Price)) == 3
+        assert conn.scalar(select(func.count()).select_from(db.News)) == 2
+        assert conn.scalar(select(db.IndexPoint.date)) == pd.Timestamp("2024-01-02")
+        # feed validators are committed together with the articles
+        assert conn.scalars(select(db.HttpValidator.url)).all() == ["f1", "f2"]
+
+    # a second run updates in place and reports no new articles
+    stats = async_ingest.ingest(since="2024-01-01", db_path=path, concurrency=2)
+    assert stats["news"] == 0
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(db.Price)) == 3
+
+
+def test_run_async_ingest_raises_when_writer_fails(tmp_path, monkeypatch):
+    path = tmp_path / "mmw.sqlite"
+    engine = db.create_db_engine(f"sqlite:///{path}", profile="test")
+    db.init_db(engine)
+    _fake_sources(monkeypatch, engine)
+    monkeypatch.setattr(news, "RSS_FEEDS", [f"f{i}" for i in range(10)])
+
+    def broken_connect(*args, **kwargs):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(async_ingest.aiosqlite, "connect", broken_connect)
+    # more results than the queue holds: producers would block without a writer
+    with pytest.raises(sqlite3.OperationalError):
+        async_ingest.ingest(since="2024-01-01", db_path=path, concurrency=1)
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, update
+
+from mmw import db
+from mmw.columnar import read_index_points, read_prices, sync_mirror
+from mmw.prices import upsert_prices
+
+
+def _prices(rows):
+    df = pd.DataFrame(rows, columns=["ticker", "date", "close"])
+    df["date"] = pd.to_datetime(df["date"])
+    for col in ("open", "high", "low"):
+        df[col] = df["close"]
+    df["volume"] = 1.0
+    return df
+
+
+def test_sync_mirror_rewrites_only_changed_partitions(tmp_path):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    upsert_prices(
+        _prices(
+            [
+                ("AAA", "2023-12-29", 1.0),
+                ("AAA", "2024-01-02", 2.0),
+                ("BBB", "2024-01-02", 3.0),
+            ]
+        ),
+        engine,
+    )
+    root = tmp_path / "columnar"
+
+    assert sync_mirror(engine, root) == {"prices": 3, "index_points": 0}
+    assert sync_mirror(engine, root) == {"prices": 0, "index_points": 0}
+
+    upsert_prices(_prices([("AAA", "2024-01-03", 2.5)]), engine)
+    with engine.begin() as conn:
+        conn.execute(update(db.Price).where(db.Price.close == 3.0).values(close=3.5))
+    assert sync_mirror(engine, root)["prices"] == 2
+
+    mirror = read_prices(engine, source="columnar", root=root)
+    sql = read_prices(engine, source="sql")
+    pd.testing.assert_frame_equal(mirror, sql, check_dtype=False)
+
+    tail = read_prices(
+        engine,
+        ["AAA"],
+        columns=("close",),
+        start=datetime(2024, 1, 1),
+        source="columnar",
+        root=root,
+    )
+    assert list(tail.columns) == ["ticker", "date", "close"]
+    assert tail["close"].tolist() == [2.0, 2.5]
+
+    # revisions of non-close columns, and close revisions that cancel out
+    revised = _prices([("AAA", "2024-01-02", 2.0), ("AAA", "2024-01-03", 2.5)])
+    revised["high"] = [2.2, 2.7]
+    revised["volume"] = [5.0, 1.0]
+    upsert_prices(revised, engine)
+    assert sync_mirror(engine, root)["prices"] == 1
+    upsert_prices(_prices([("AAA", "2024-01-02", 2.5), ("AAA", "2024-01-03", 2.0)]), engine)
+    assert sync_mirror(engine, root)["prices"] == 1
+    pd.testing.assert_frame_equal(
+        read_prices(engine, source="columnar", root=root),
+        read_prices(engine, source="sql"),
+        check_dtype=False,
+    )
+
+
+def test_read_index_points_falls_back_to_sql(tmp_path):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(db.Index.__table__.insert(), [{"id": 1, "code": "SCFI"}])
+        conn.execute(
+            db.IndexPoint.__table__.insert(),
+            [{"index_id": 1, "date": datetime(2024, 1, 1), "value": 1.5}],
+        )
+
+    df = read_index_points(engine, source="columnar", root=tmp_path / "missing")
+    assert df.to_dict(orient="records") == [
+        {"code": "SCFI", "date": pd.Timestamp("2024-01-01"), "value": 1.5}
+    ]
@@ -0,0 +1,290 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from mmw import db
+
+# Baseline schema as shipped before versioned migrations were introduced.
+LEGACY_SCHEMA = [
+    "CREATE TABLE assets (id INTEGER PRIMARY KEY, ticker VARCHAR NOT NULL UNIQUE, name VARCHAR)",
+    "CREATE TABLE prices (id INTEGER PRIMARY KEY, asset_id INTEGER NOT NULL REFERENCES assets(id), "
+    "date DATETIME NOT NULL, open FLOAT, high FLOAT, low FLOAT, close FLOAT, volume FLOAT, "
+    "CONSTRAINT uix_price_asset_date UNIQUE (asset_id, date))",
+    "CREATE TABLE indices (id INTEGER PRIMARY KEY, code VARCHAR NOT NULL UNIQUE, name VARCHAR)",
+    "CREATE TABLE index_points (id INTEGER PRIMARY KEY, index_id INTEGER NOT NULL "
+    "REFERENCES indices(id), date DATETIME NOT NULL, value FLOAT NOT NULL)",
+    "CREATE TABLE news (id INTEGER PRIMARY KEY, url VARCHAR NOT NULL UNIQUE, title VARCHAR NOT NULL, "
+    "summary TEXT, summary_ai TEXT, published_at DATETIME, source VARCHAR)",
+    "CREATE TABLE entities (id INTEGER PRIMARY KEY, news_id INTEGER NOT NULL REFERENCES news(id), "
+    "type VARCHAR NOT NULL, value VARCHAR NOT NULL, score FLOAT)",
+    "CREATE TABLE links (id INTEGER PRIMARY KEY, news_id INTEGER NOT NULL REFERENCES news(id), "
+    "asset_ticker VARCHAR, index_code VARCHAR, score FLOAT NOT NULL)",
+    "CREATE TABLE runs (id INTEGER PRIMARY KEY, started_at DATETIME NOT NULL, "
+    "completed_at DATETIME, status VARCHAR)",
+]
+
+# Tables that grow with history and must never be scanned without an index.
+HOT_TABLES = {"prices", "index_points", "news", "entities", "links"}
+
+# Queries that intentionally read a whole table: (caller, table).
+FULL_SCANS = {
+    ("link_news_full", "news"),
+    ("news_intensity", "news"),
+}
+
+# Callers allowed a temp B-tree, e.g. to group by a derived year: caller names.
+TEMP_SORTS = {
+    "sync_mirror",
+    "news_intensity",
+    "ticker_news_counts",
+    "ticker_news_counts_rollup",
+    "build_insights",
+    "build_site",
+    "refresh_rollups",
+    "refresh_rollups_full",
+}
+
+
+def _index_names(engine):
+    insp = inspect(engine)
+    return {
+        table: {ix["name"] for ix in insp.get_indexes(table)}
+        for table in insp.get_table_names()
+    }
+
+
+def _triggers(engine):
+    with engine.connect() as conn:
+        return set(
+            conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars()
+        )
+
+
+def test_init_db_fresh_is_stamped(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.sqlite'}", future=True)
+    db.init_db(engine)
+    with engine.connect() as conn:
+        assert db.schema_version(conn) == db.SCHEMA_VERSION
+
+
+def test_migrate_upgrades_legacy_database(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}", future=True)
+    with legacy.begin() as conn:
+        for ddl in LEGACY_SCHEMA:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO indices (id, code) VALUES (1, 'X')")
+        for value in (1.0, 2.0):
+            conn.exec_driver_sql(
+                "INSERT INTO index_points (index_id, date, value) "
+                f"VALUES (1, '2024-01-01 00:00:00.000000', {value})"
+            )
+
+    db.init_db(legacy)
+
+    fresh = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(fresh)
+    assert _index_names(legacy) == _index_names(fresh)
+    assert _triggers(legacy) == _triggers(fresh) == {
+        "trg_news_relink",
+        "trg_entities_relink",
+        "trg_news_rollup_insert",
+        "trg_news_rollup_update",
+        "trg_news_rollup_delete",
+        "trg_links_rollup_insert",
+        "trg_links_rollup_delete",
+        "trg_prices_rollup_update",
+        "trg_prices_rollup_delete",
+        "trg_rollup_dirty_dedupe",
+    }
+    assert {c["name"] for c in inspect(legacy).get_columns("news")} == {
+        c["name"] for c in inspect(fresh).get_columns("news")
+    }
+    with legacy.connect() as conn:
+        assert db.schema_version(conn) == db.SCHEMA_VERSION
+        assert conn.exec_driver_sql("SELECT value FROM index_points").scalars().all() == [2.0]
+
+
+@pytest.fixture
+def seeded_engine():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    with Session.begin() as session:
+        for t in ("AAA", "BBB", "CCC"):
+            asset = db.Asset(ticker=t)
+            session.add(asset)
+            session.flush()
+            for day in range(1, 28):
+                session.add(
+                    db.Price(
+                        asset_id=asset.id,
+                        date=datetime(2024, 1, day),
+                        open=1.0,
+                        high=1.0,
+                        low=1.0,
+                        close=1.0 + day / 100,
+                    )
+                )
+        idx = db.Index(code="SCFI")
+        session.add(idx)
+        session.flush()
+        session.add(db.IndexPoint(index_id=idx.id, date=datetime(2024, 1, 1), value=1.0))
+        for i in range(20):
+            news = db.News(
+                url=f"u{i}",
+                title=f"AAA news {i} SCFI",
+                summary="summary",
+                published_at=datetime(2024, 1, 1 + i),
+            )
+            session.add(news)
+            session.flush()
+            session.add(db.Entity(news_id=news.id, type="ORG", value="AAA"))
+            session.add(db.Link(news_id=news.id, asset_ticker="AAA", score=1.0))
+    with engine.begin() as conn:
+        # steady state: everything but the two newest articles is linked
+        from mmw import linker
+
+        signature = linker.mapping_signature()
+        conn.execute(db.News.__table__.update().where(db.News.id <= 18).values(link_sig=signature))
+        db.set_checkpoint(conn, linker.SIGNATURE_CHECKPOINT, signature)
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+def _plans(engine, fn):
+    """Run ``fn`` and return ``[(sql, plan_details)]`` for every statement."""
+
+    captured = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        head = statement.lstrip().split(None, 1)[0].upper()
+        if head in {"SELECT", "UPDATE", "DELETE"}:
+            params = parameters[0] if executemany else parameters
+            captured.append((statement, params))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    out = []
+    with engine.connect() as conn:
+        for statement, params in captured:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).all()
+            out.append((statement, [r[-1] for r in rows]))
+    return out
+
+
+def _callers(engine, tmp_path, monkeypatch):
+    import pandas as pd
+
+    from mmw import analytics, columnar, indices, linker, news, nlp, prices, report, rollups
+
+    monkeypatch.setattr(report, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(report, "REPORT_WORKERS", 1)
+    monkeypatch.setattr(analytics, "WATCHLIST_TICKERS", ["AAA", "BBB", "CCC"])
+    monkeypatch.setattr(news, "engine", engine)
+    monkeypatch.setattr(indices, "engine", engine)
+    monkeypatch.setattr(nlp, "SessionLocal", sessionmaker(bind=engine, future=True))
+    monkeypatch.setattr(nlp, "extract_entities_batch", lambda texts, *a: ([] for _ in texts))
+
+    prices_df = pd.DataFrame(
+        {
+            "ticker": ["AAA"],
+            "date": [datetime(2024, 1, 2)],
+            "open": [1.0],
+            "high": [1.0],
+            "low": [1.0],
+            "close": [1.0],
+            "volume": [1.0],
+        }
+    )
+    news_df = news.normalize_news(
+        [{"source": "s", "url": "u1", "title": "t", "summary": "", "published": None}]
+    )
+    index_df = pd.DataFrame(
+        {"date": [datetime(2024, 1, 1)], "index_code": ["SCFI"], "value": [2.0]}
+    )
+    return {
+        "compute_daily_returns": lambda: analytics.compute_daily_returns(engine, ["AAA"]),
+        "news_intensity": lambda: analytics.news_intensity(engine),
+        "ticker_news_counts": lambda: analytics.ticker_news_counts(engine, start="2024-01-01"),
+        "price_snapshots": lambda: analytics.price_snapshots(engine, "weekly"),
+        "event_study": lambda: analytics.event_study(engine, "AAA"),
+        "enrich_news": lambda: nlp.enrich_news(),
+        "enrich_backlog": lambda: nlp.enrich_backlog(engine, workers=1, restart=True),
+        "link_news": lambda: linker.link_news(engine),
+        "link_news_full": lambda: linker.link_news(engine, full=True, batch_size=5),
+        "build_price_charts": lambda: report.build_price_charts(engine),
+        "build_index_charts": lambda: report.build_index_charts(engine),
+        "build_news_dash": lambda: report.build_news_dash(engine),
+        "build_insights": lambda: report.build_insights(engine),
+        "build_site": lambda: report.build_site(engine),
+        "latest_price_dates": lambda: prices.latest_price_dates(engine, ["AAA", "BBB"]),
+        "sync_mirror": lambda: columnar.sync_mirror(engine, tmp_path / "columnar"),
+        "upsert_prices": lambda: prices.upsert_prices(prices_df, engine),
+        "upsert_news": lambda: news.upsert_news(news_df),
+        "upsert_index_points": lambda: indices._upsert_df(index_df),
+        "refresh_rollups": lambda: rollups.refresh_rollups(engine),
+        # the readers again, now answered from up-to-date rollups
+        "news_intensity_rollup": lambda: analytics.news_intensity(engine, start="2024-01-01"),
+        "ticker_news_counts_rollup": lambda: analytics.ticker_news_counts(engine),
+        "price_snapshots_rollup": lambda: analytics.price_snapshots(engine, "monthly", ["AAA"]),
+        "refresh_rollups_full": lambda: rollups.refresh_rollups(engine, full=True),
+    }
+
+
+def test_query_plans_use_indexes(seeded_engine, tmp_path, monkeypatch):
+    callers = _callers(seeded_engine, tmp_path, monkeypatch)
+    for name, fn in callers.items():
+        plans = _plans(seeded_engine, fn)
+        assert plans, name
+        for statement, details in plans:
+            for detail in details:
+                if "TEMP B-TREE" in detail:
+                    assert name in TEMP_SORTS, (name, statement, details)
+                words = detail.split()
+                if words[0] == "SCAN" and words[1] in HOT_TABLES and "USING" not in words:
+                    assert (name, words[1]) in FULL_SCANS, (name, statement, details)
+
+
+def _pragma(conn, name):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_create_db_engine_applies_profile(tmp_path):
+    path = tmp_path / "mmw.sqlite"
+    writer = db.create_db_engine(f"sqlite:///{path}", profile="ingest")
+    with writer.connect() as conn:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1
+        assert _pragma(conn, "temp_store") == 2
+        assert _pragma(conn, "busy_timeout") == 30000
+
+    override = db.create_db_engine(f"sqlite:///{path}", profile="ingest", busy_timeout=5)
+    with override.connect() as conn:
+        assert _pragma(conn, "busy_timeout") == 5
+
+    with pytest.raises(ValueError):
+        db.create_db_engine(f"sqlite:///{path}", profile="nope")
+
+
+def test_report_profile_reads_during_write(tmp_path):
+    path = tmp_path / "mmw.sqlite"
+    writer = db.create_db_engine(f"sqlite:///{path}", profile="ingest")
+    db.init_db(writer)
+    reader = db.create_db_engine(f"sqlite:///{path}", profile="report")
+
+    with writer.begin() as wconn:
+        wconn.exec_driver_sql("INSERT INTO assets (ticker) VALUES ('AAA')")
+        # an uncommitted write must not block or leak into readers
+        with reader.connect() as rconn:
+            assert rconn.exec_driver_sql("SELECT COUNT(*) FROM assets").scalar() == 0
+            with pytest.raises(Exception, match="readonly"):
+                rconn.exec_driver_sql("INSERT INTO assets (ticker) VALUES ('BBB')")
+
+    with reader.connect() as rconn:
+        assert rconn.exec_driver_sql("SELECT COUNT(*) FROM assets").scalar() == 1
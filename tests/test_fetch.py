@@ -0,0 +1,164 @@
+import socket
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from mmw import db, fetch
+
+
+class FakeResponse:
+    def __init__(self, content, delay=0.0, status_code=200, headers=None):
+        self.content = content
+        self.delay = delay
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), 2):
+            time.sleep(self.delay)
+            yield self.content[i : i + 2]
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+        self.sent_headers = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.calls.append(url)
+        self.sent_headers.append(headers or {})
+        if callable(self.response):
+            return self.response(headers or {})
+        return self.response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    yield tmp_path
+    fetch.configure("off", fetch.HTTP_CACHE_DIR)
+
+
+def test_record_then_replay_bytes(cache, monkeypatch):
+    fake = FakeSession(FakeResponse(b"<rss/>"))
+    monkeypatch.setattr(fetch, "session", lambda: fake)
+    fetch.configure("record", cache)
+    assert fetch.get_bytes("https://example.com/feed") == b"<rss/>"
+
+    fetch.configure("replay")
+    assert fetch.get_bytes("https://example.com/feed") == b"<rss/>"
+    assert fake.calls == ["https://example.com/feed"]
+    with pytest.raises(fetch.CacheMiss):
+        fetch.get_bytes("https://example.com/other")
+
+
+def test_record_then_replay_frame(cache):
+    df = pd.DataFrame({"close": [1.0, 2.0]}, index=pd.date_range("2024-01-01", periods=2))
+    params = {"tickers": ["AAA"], "start": "2024-01-01"}
+
+    fetch.configure("record", cache)
+    fetch.cached_frame("yfinance", params, lambda: df)
+
+    fetch.configure("replay")
+    replayed = fetch.cached_frame("yfinance", params, lambda: pytest.fail("network"))
+    pd.testing.assert_frame_equal(replayed, df)
+
+
+def _trickle_server(body, interval):
+    """Serve one HTTP response whose body arrives a byte every ``interval``s."""
+
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(65536)
+            head = f"HTTP/1.1 200 OK\r\nContent-Length: {len(body)}\r\n\r\n"
+            conn.sendall(head.encode())
+            try:
+                for i in range(len(body)):
+                    time.sleep(interval)
+                    conn.sendall(body[i : i + 1])
+            except OSError:
+                pass
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/slow"
+
+
+def test_get_bytes_enforces_total_deadline():
+    url = _trickle_server(b"x" * 40, interval=0.1)
+    started = time.monotonic()
+    with pytest.raises(fetch.DeadlineExceeded):
+        fetch.get_bytes(url, timeout=(1, 1), deadline=0.5)
+    assert time.monotonic() - started < 1.5
+
+
+def test_conditional_get_sends_validators_and_skips_on_304(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(fetch, "engine", engine)
+
+    def respond(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(b"", status_code=304)
+        return FakeResponse(b"<rss/>", headers={"ETag": '"v1"', "Last-Modified": "Mon"})
+
+    fake = FakeSession(respond)
+    monkeypatch.setattr(fetch, "session", lambda: fake)
+    before = fetch.conditional_stats()
+
+    url = "https://example.com/feed"
+    body, validators = fetch.get_conditional(url)
+    assert body == b"<rss/>"
+    # validators are only stored once the caller has committed the content
+    assert fetch.get_conditional(url)[0] == b"<rss/>"
+    assert "If-None-Match" not in fake.sent_headers[1]
+    fetch.save_validators(validators)
+    assert fetch.get_conditional(url) == (None, None)
+    assert fake.sent_headers[2]["If-None-Match"] == '"v1"'
+    assert fake.sent_headers[2]["If-Modified-Since"] == "Mon"
+
+    now = fetch.conditional_stats()
+    assert now["requests"] - before["requests"] == 3
+    assert now["not_modified"] - before["not_modified"] == 1
+
+
+def test_recording_fetches_full_bodies_despite_stored_validators(cache, monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(fetch, "engine", engine)
+
+    def respond(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(b"", status_code=304)
+        return FakeResponse(b"<rss/>", headers={"ETag": '"v1"'})
+
+    fake = FakeSession(respond)
+    monkeypatch.setattr(fetch, "session", lambda: fake)
+    url = "https://example.com/feed"
+    fetch.save_validators(fetch.get_conditional(url)[1])
+    assert fetch.get_conditional(url) == (None, None)  # 304 outside recording
+
+    fetch.configure("record", cache)
+    assert fetch.get_conditional(url)[0] == b"<rss/>"
+    assert "If-None-Match" not in fake.sent_headers[-1]
+
+    fetch.configure("replay")
+    assert fetch.get_conditional(url) == (b"<rss/>", None)
+    assert len(fake.calls) == 3
@@ -1,10 +1,11 @@
 import logging
 from datetime import datetime
 
+import pytest
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 
-from mmw import db
+from mmw import db, fetch, indices
 from mmw.indices import import_indices_from_csv
 
 
@@ -37,3 +38,35 @@ def test_import_indices_from_csv_inserts_data(tmp_path, monkeypatch):
         )
         assert point.value == 123.45
         assert point.date == datetime(2024, 1, 1)
+
+
+def test_import_indices_from_csv_updates_existing(tmp_path, monkeypatch):
+    csv_path = tmp_path / "indices.csv"
+    csv_path.write_text("date,index_code,value,source\n2024-01-01,TEST,1.0,unit\n")
+
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    import mmw.indices as indices
+    monkeypatch.setattr(indices, "engine", engine)
+
+    import_indices_from_csv(csv_path)
+    csv_path.write_text(
+        "date,index_code,value,source\n2024-01-01,TEST,2.0,unit\n2024-01-02,TEST,3.0,unit\n"
+    )
+    import_indices_from_csv(csv_path)
+
+    Session = sessionmaker(bind=engine, future=True)
+    with Session() as session:
+        values = session.execute(
+            select(db.IndexPoint.date, db.IndexPoint.value).order_by(db.IndexPoint.date)
+        ).all()
+    assert [v for _, v in values] == [2.0, 3.0]
+
+
+def test_request_soup_raises_on_replay_miss(tmp_path):
+    fetch.configure("replay", tmp_path)
+    try:
+        with pytest.raises(fetch.CacheMiss):
+            indices._request_soup("https://example.com/index")
+    finally:
+        fetch.configure("off", fetch.HTTP_CACHE_DIR)
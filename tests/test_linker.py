@@ -0,0 +1,78 @@
+from sqlalchemy import create_engine, select
+
+from mmw import db, linker, news
+
+
+def test_matcher_respects_word_boundaries():
+    matcher = linker.KeywordMatcher({"zim": ["ZIM"], "maersk": ["Maersk", "MAERSK-B.CO"]})
+    assert matcher.scores("Zimbabwe exports rise; ZIMMER unchanged") == {}
+    assert matcher.scores("zim and Maersk (MAERSK-B.CO) rally") == {"zim": 1, "maersk": 2}
+    assert matcher.scores("") == {}
+
+
+def test_build_matcher_scores_assets_and_indices_in_one_pass():
+    matcher = linker.build_matcher()
+    scores = matcher.scores("ZIM results lift freight; Drewry World Container Index and SCFI")
+    assert scores == {("asset", "ZIM"): 2, ("index", "WCI"): 2, ("index", "SCFI"): 1}
+
+
+def test_link_news_creates_links_per_target():
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            db.News.__table__.insert(),
+            [
+                {"url": "a", "title": "Hapag rates and FBX", "summary": "", "source": "s"},
+                {"url": "b", "title": "Zimbabwe tobacco", "summary": "", "source": "s"},
+            ],
+        )
+    assert linker.link_news(engine, batch_size=1) == 2
+    assert linker.link_news(engine, full=True, batch_size=1) == 2
+    with engine.connect() as conn:
+        links = conn.execute(
+            select(db.Link.news_id, db.Link.asset_ticker, db.Link.index_code)
+        ).all()
+    assert sorted(links, key=str) == sorted(
+        [(1, "HLAG.DE", None), (1, "HLAG.F", None), (1, None, "FBX")], key=str
+    )
+
+
+def _linked(engine):
+    with engine.connect() as conn:
+        return conn.scalars(select(db.News.id).where(db.News.link_sig.is_not(None))).all()
+
+
+def test_link_news_is_incremental(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(news, "engine", engine)
+
+    def add(url, title):
+        news.upsert_news(
+            news.normalize_news(
+                [{"source": "s", "url": url, "title": title, "summary": "", "published": None}]
+            )
+        )
+
+    add("a", "ZIM expands")
+    add("b", "SCFI up")
+    assert linker.link_news(engine) == 2
+    assert linker.link_news(engine) == 0
+
+    add("c", "Maersk orders")
+    add("a", "ZIM expands")  # unchanged copy of a known article
+    assert linker.link_news(engine) == 1
+
+    add("b", "SCFI and FBX up")  # changed title
+    assert linker.link_news(engine) == 1
+
+    with engine.begin() as conn:
+        conn.execute(db.Entity.__table__.insert(), {"news_id": 3, "type": "ORG", "value": "x"})
+    assert _linked(engine) == [1, 2]
+    assert linker.link_news(engine) == 1
+
+    monkeypatch.setitem(linker.INDEX_KEYWORDS, "BDI", ["Baltic Dry"])
+    assert linker.link_news(engine) == 3
+    assert linker.link_news(engine) == 0
+    assert linker.link_news(engine, full=True) == 3
@@ -1,6 +1,11 @@
+import logging
+import threading
+
 import pandas as pd
+import pytest
 
 import mmw.news as news
+from mmw import fetch
 from mmw.news import normalize_news, refresh_news
 
 
@@ -45,7 +50,7 @@ def test_refresh_news_drops_duplicates(monkeypatch):
     ]
 
     monkeypatch.setattr(news, "RSS_FEEDS", ["dummy"])
-    monkeypatch.setattr(news, "fetch_rss", lambda feed: items)
+    monkeypatch.setattr(news, "fetch_rss", lambda feed: (items, None))
 
     captured = {}
 
@@ -59,3 +64,78 @@ def test_refresh_news_drops_duplicates(monkeypatch):
 
     assert len(captured["df"]) == 1
     assert captured["df"].iloc[0]["url"] == "https://example.com/a"
+
+
+def test_refresh_news_fetches_feeds_concurrently(monkeypatch, caplog):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_fetch(feed):
+        barrier.wait()  # deadlocks unless all three feeds are in flight together
+        if feed == "bad":
+            news.FEED_FAILURES[feed] += 1
+            return [], None
+        return [
+            {
+                "title": feed,
+                "summary": "",
+                "published": "2024-01-01T00:00:00Z",
+                "source": feed,
+                "url": f"https://example.com/{feed}",
+            }
+        ], None
+
+    monkeypatch.setattr(news, "RSS_FEEDS", ["a", "b", "bad"])
+    monkeypatch.setattr(news, "fetch_rss", fake_fetch)
+    upserted = []
+    monkeypatch.setattr(news, "upsert_news", lambda df: upserted.extend(df["url"]) or len(df))
+
+    with caplog.at_level(logging.INFO):
+        refresh_news(max_workers=3)
+
+    assert sorted(upserted) == ["https://example.com/a", "https://example.com/b"]
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("bad: failed after") for m in messages)
+    assert any(m.startswith("Fetched 3 feeds") and "(1 failed" in m for m in messages)
+
+
+def test_refresh_news_stores_validators_only_after_upsert(monkeypatch):
+    item = {
+        "title": "t",
+        "summary": "",
+        "published": "2024-01-01T00:00:00Z",
+        "source": "Feed",
+        "url": "https://example.com/a",
+    }
+    monkeypatch.setattr(news, "RSS_FEEDS", ["ok", "empty", "broken"])
+    monkeypatch.setattr(
+        news,
+        "fetch_rss",
+        lambda feed: ([] if feed == "empty" else [{**item, "source": feed}], {"url": feed}),
+    )
+    saved = []
+    monkeypatch.setattr(news, "save_validators", lambda v: saved.append(v["url"]))
+
+    def upsert(df):
+        if df["source"].iloc[0] == "broken":
+            raise RuntimeError("database is locked")
+        return len(df)
+
+    monkeypatch.setattr(news, "upsert_news", upsert)
+    with pytest.raises(RuntimeError):
+        refresh_news(max_workers=1)
+    assert "broken" not in saved
+    monkeypatch.setattr(news, "RSS_FEEDS", ["ok", "empty"])
+    saved.clear()
+    refresh_news(max_workers=1)
+    assert sorted(saved) == ["empty", "ok"]
+
+
+def test_refresh_news_raises_on_replay_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(news, "RSS_FEEDS", ["https://example.com/feed"])
+    fetch.configure("replay", tmp_path)
+    try:
+        with pytest.raises(fetch.CacheMiss):
+            refresh_news(max_workers=1)
+        assert news.FEED_FAILURES["https://example.com/feed"] == 0
+    finally:
+        fetch.configure("off", fetch.HTTP_CACHE_DIR)
@@ -0,0 +1,180 @@
+from datetime import datetime
+
+import spacy
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from mmw import db, nlp
+
+
+def _ruler_nlp():
+    pipeline = spacy.blank("en")
+    ruler = pipeline.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [
+            {"label": "ORG", "pattern": "Maersk"},
+            {"label": "GPE", "pattern": "Rotterdam"},
+            {"label": "PERSON", "pattern": "Smith"},
+        ]
+    )
+    return pipeline
+
+
+def test_extract_entities_batch_keeps_order_and_labels(monkeypatch):
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    out = list(
+        nlp.extract_entities_batch(
+            ["Maersk calls at Rotterdam", "nothing here", "Smith at Maersk"], batch_size=2
+        )
+    )
+    assert out == [
+        [("ORG", "Maersk", 1.0), ("GPE", "Rotterdam", 1.0)],
+        [],
+        [("ORG", "Maersk", 1.0)],
+    ]
+
+
+def test_enrich_news_batches_and_respects_limit(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "SessionLocal", sessionmaker(bind=engine, future=True))
+    with engine.begin() as conn:
+        conn.execute(
+            db.News.__table__.insert(),
+            [
+                {
+                    "url": f"u{i}",
+                    "title": f"Maersk update {i}",
+                    "summary": "s",
+                    "source": "src",
+                    "published_at": datetime(2024, 1, i + 1),
+                }
+                for i in range(5)
+            ],
+        )
+
+    assert nlp.enrich_news(limit=3, batch_size=2) == 3
+    assert nlp.enrich_news(limit=0) == 2
+    with engine.connect() as conn:
+        values = conn.scalars(select(db.Entity.value)).all()
+    assert values == ["Maersk"] * 5
+
+
+def _insert_news(engine, n):
+    with engine.begin() as conn:
+        conn.execute(
+            db.News.__table__.insert(),
+            [
+                {"url": f"u{i}", "title": f"Maersk {i}", "summary": "s", "source": "src"}
+                for i in range(n)
+            ],
+        )
+
+
+def test_enrich_backlog_commits_chunks_and_resumes(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    _insert_news(engine, 7)
+
+    calls = []
+    real = nlp.enrich_rows
+
+    def failing(rows):
+        calls.append(rows[0][0])
+        if len(calls) == 3:
+            raise RuntimeError("worker crashed")
+        return real(rows)
+
+    monkeypatch.setattr(nlp, "enrich_rows", failing)
+    assert nlp.enrich_backlog(engine, chunk_size=2, workers=1) == 5
+    with engine.connect() as conn:
+        assert db.get_checkpoint(conn, nlp.BACKLOG_CHECKPOINT) == "4"
+        assert conn.scalar(select(func.count()).select_from(db.Entity)) == 5
+
+    monkeypatch.setattr(nlp, "enrich_rows", real)
+    assert nlp.enrich_backlog(engine, chunk_size=2, workers=1) == 2
+    with engine.connect() as conn:
+        assert db.get_checkpoint(conn, nlp.BACKLOG_CHECKPOINT) == "6"
+        assert conn.scalar(select(func.count()).select_from(db.Entity)) == 7
+        assert conn.scalar(
+            select(func.count()).select_from(db.News).where(db.News.summary_ai == "s")
+        ) == 7
+    assert nlp.enrich_backlog(engine, chunk_size=2, workers=1) == 0
+
+
+def test_enrich_news_reuses_cache_for_duplicate_texts(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "SessionLocal", sessionmaker(bind=engine, future=True))
+    processed = []
+    real = nlp.extract_entities_batch
+
+    def counting(texts, *args):
+        texts = list(texts)
+        processed.extend(texts)
+        return real(texts, *args)
+
+    monkeypatch.setattr(nlp, "extract_entities_batch", counting)
+
+    def add(url, title):
+        with engine.begin() as conn:
+            conn.execute(
+                db.News.__table__.insert(),
+                {"url": url, "title": title, "summary": "Port of Rotterdam", "source": "s"},
+            )
+
+    add("a", "Maersk orders ships")
+    add("b", "Maersk  orders ships")
+    assert nlp.enrich_news() == 2
+    assert len(processed) == 1
+
+    add("c", "Maersk orders\tships")
+    assert nlp.enrich_news() == 1
+    assert len(processed) == 1
+
+    # NER is case-sensitive, so a different casing is not served from the cache
+    add("e", "MAERSK orders ships")
+    assert nlp.enrich_news() == 1
+    assert len(processed) == 2
+
+    monkeypatch.setattr(nlp, "PIPELINE_VERSION", "next")
+    add("d", "Maersk orders ships")
+    assert nlp.enrich_news() == 1
+    assert len(processed) == 3
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(db.Entity.news_id, db.Entity.value)).all()
+    # "e" only matches Rotterdam
+    assert len(rows) == 9
+    assert nlp.text_key("Cafe\u0301", None) == nlp.text_key("Caf\u00e9", None)
+
+
+def test_enrich_news_commits_each_slice(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "SessionLocal", sessionmaker(bind=engine, future=True))
+    _insert_news(engine, 5)
+
+    sent = []
+    monkeypatch.setattr(nlp, "remote_enrich", lambda rows: sent.append(len(rows)))
+    real = nlp.enrich_rows
+
+    def failing(rows, *args):
+        if any(title == "Maersk 2" for _, title, _ in rows):
+            raise RuntimeError("bad row")
+        return real(rows, *args)
+
+    monkeypatch.setattr(nlp, "enrich_rows", failing)
+    assert nlp.enrich_news(batch_size=1) == 4
+    assert sent == [1]  # the worker is not asked again once it is unavailable
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(db.Entity)) == 4
+
+    monkeypatch.setattr(nlp, "enrich_rows", real)
+    assert nlp.enrich_news(batch_size=1) == 1
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(db.Entity)) == 5
@@ -0,0 +1,121 @@
+import os
+import socket
+import struct
+import threading
+import time
+
+from test_nlp import _ruler_nlp
+
+from mmw import nlp, nlp_worker
+
+
+def _start(address):
+    thread = threading.Thread(target=nlp_worker.serve, args=(address,), daemon=True)
+    thread.start()
+    for _ in range(100):
+        if nlp_worker.ping(address):
+            return thread
+        time.sleep(0.02)
+    raise AssertionError("worker did not start")
+
+
+def test_remote_enrich_round_trip_and_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "summarize_text", lambda text, sentences=3: text.upper())
+    address = tmp_path / "nlp.sock"
+    rows = [(1, "Maersk calls at Rotterdam", ""), (2, "quiet day", "nothing")]
+
+    assert nlp_worker.remote_enrich(rows, address) is None
+
+    thread = _start(address)
+    assert nlp_worker.ping(address) == nlp.PIPELINE_VERSION
+    assert nlp_worker.remote_enrich(rows, address) == [
+        (1, "MAERSK CALLS AT ROTTERDAM", [("ORG", "Maersk", 1.0), ("GPE", "Rotterdam", 1.0)]),
+        (2, "nothing", []),
+    ]
+
+    assert nlp_worker._request(("enrich", "stale-pipeline", rows), address) is None
+
+    nlp_worker.stop(address)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not address.exists()
+
+
+def test_worker_writes_private_key_and_clients_need_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "summarize_text", lambda text, sentences=3: text)
+    address = tmp_path / "nlp.sock"
+    thread = _start(address)
+
+    key = tmp_path / "nlp.key"
+    assert key.stat().st_mode & 0o777 == 0o600
+    secret = key.read_text()
+    assert len(secret) == 64
+
+    key.write_text("0" * 64)  # a client holding the wrong key is rejected
+    assert nlp_worker.ping(address) is None
+
+    key.unlink()  # no key file means no worker to talk to
+    assert nlp_worker.ping(address) is None
+
+    monkeypatch.setattr(nlp_worker, "NLP_AUTHKEY", secret.encode())
+    nlp_worker.stop(address)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_busy_or_stuck_worker_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "summarize_text", lambda text, sentences=3: text)
+    monkeypatch.setattr(nlp_worker, "NLP_CONNECT_TIMEOUT", 0.2)
+    monkeypatch.setattr(nlp_worker, "NLP_REQUEST_TIMEOUT", 0.2)
+    address = tmp_path / "nlp.sock"
+    rows = [(1, "Maersk calls at Rotterdam", "")]
+    thread = _start(address)
+
+    # An idle client holds the single-connection worker.
+    holder = nlp_worker._connect(str(address), nlp_worker._authkey(address), 1)
+    started = time.monotonic()
+    assert nlp_worker.remote_enrich(rows, address) is None
+    assert time.monotonic() - started < 2
+    holder.close()
+
+    # A batch that outlives the request timeout is abandoned by the client.
+    release = threading.Event()
+    monkeypatch.setattr(nlp, "enrich_rows", lambda rows: release.wait(5) and [])
+    assert nlp_worker.remote_enrich(rows, address) is None
+    release.set()
+
+    # The worker survives the client hanging up on it.
+    monkeypatch.setattr(nlp_worker, "NLP_CONNECT_TIMEOUT", 2)
+    assert nlp_worker.ping(address) == nlp.PIPELINE_VERSION
+    nlp_worker.stop(address)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_worker_drops_silent_clients(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp, "_nlp", _ruler_nlp())
+    monkeypatch.setattr(nlp, "summarize_text", lambda text, sentences=3: text)
+    monkeypatch.setattr(nlp_worker, "NLP_IDLE_TIMEOUT", 0.2)
+    address = tmp_path / "nlp.sock"
+    thread = _start(address)
+
+    # silent during the handshake
+    raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    raw.connect(str(address))
+    assert nlp_worker.ping(address) == nlp.PIPELINE_VERSION
+    raw.close()
+
+    # authenticated, then silent before a request and in the middle of one
+    for partial in (b"", struct.pack("!i", 100) + b"\x80"):
+        holder = nlp_worker._connect(str(address), nlp_worker._authkey(address), 1)
+        if partial:
+            os.write(holder.fileno(), partial)
+        assert nlp_worker.ping(address) == nlp.PIPELINE_VERSION
+        holder.close()
+
+    nlp_worker.stop(address)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
@@ -1,6 +1,12 @@
 import logging
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
 
 import mmw.prices as prices
+from mmw import db, fetch
 
 
 def test_fetch_prices_yf_handles_error(monkeypatch, caplog):
@@ -14,3 +20,149 @@ def test_fetch_prices_yf_handles_error(monkeypatch, caplog):
 
     assert df.empty
     assert any("Failed to download prices" in r.getMessage() for r in caplog.records)
+
+
+def test_upsert_prices_inserts_and_updates():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    df = pd.DataFrame(
+        {
+            "ticker": ["AAA", "AAA", "BBB"],
+            "date": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-01"]),
+            "open": [1.0, 2.0, 3.0],
+            "high": [1.0, 2.0, 3.0],
+            "low": [1.0, 2.0, 3.0],
+            "close": [1.0, 2.0, float("nan")],
+            "volume": [10, 20, 30],
+        }
+    )
+
+    assert prices.upsert_prices(df, engine, batch_size=2) == 3
+    df.loc[1, "close"] = 2.5
+    prices.upsert_prices(df, engine)
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(db.Price)) == 3
+        assert conn.scalar(select(func.count()).select_from(db.Asset)) == 2
+        close = conn.scalar(
+            select(db.Price.close)
+            .join(db.Asset)
+            .where(db.Asset.ticker == "AAA", db.Price.date == datetime(2024, 1, 2))
+        )
+    assert close == 2.5
+
+
+def test_refresh_watchlist_prices_fetches_missing_tail(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    existing = pd.DataFrame(
+        {
+            "ticker": ["AAA", "BBB"],
+            "date": pd.to_datetime(["2024-01-10", "2024-01-10"]),
+            "open": [1.0, 1.0],
+            "high": [1.0, 1.0],
+            "low": [1.0, 1.0],
+            "close": [1.0, 1.0],
+            "volume": [1.0, 1.0],
+        }
+    )
+    prices.upsert_prices(existing, engine)
+
+    calls = []
+
+    def fake_fetch(tickers, start=None, end=None, **kwargs):
+        calls.append((sorted(tickers), start))
+        return existing.iloc[0:0]
+
+    monkeypatch.setattr(prices, "engine", engine)
+    monkeypatch.setattr(prices, "WATCHLIST_TICKERS", ["AAA", "BBB", "CCC"])
+    monkeypatch.setattr(prices, "fetch_prices_yf", fake_fetch)
+    monkeypatch.setattr(prices, "PRICE_OVERLAP_DAYS", 3)
+    monkeypatch.setattr(prices, "PRICE_RETRIES", 0)
+
+    prices.refresh_watchlist_prices(since="2020-01-01")
+    assert calls == [(["CCC"], "2020-01-01"), (["AAA", "BBB"], "2024-01-07")]
+
+    calls.clear()
+    prices.refresh_watchlist_prices(since="2020-01-01", full=True)
+    assert calls == [(["AAA", "BBB", "CCC"], "2020-01-01")]
+
+
+def test_download_prices_chunked_retries_and_reports_failures(monkeypatch):
+    attempts = {}
+
+    def fake_fetch(tickers, start=None, end=None, **kwargs):
+        rows = []
+        for t in tickers:
+            attempts[t] = attempts.get(t, 0) + 1
+            if t == "BAD" or (t == "FLAKY" and attempts[t] == 1):
+                continue
+            rows.append(
+                {
+                    "ticker": t,
+                    "date": pd.Timestamp("2024-01-02"),
+                    "open": 1.0,
+                    "high": 1.0,
+                    "low": 1.0,
+                    "close": 1.0,
+                    "volume": 1.0,
+                }
+            )
+        return pd.DataFrame(rows, columns=prices.PRICE_COLUMNS)
+
+    monkeypatch.setattr(prices, "fetch_prices_yf", fake_fetch)
+    seen = []
+
+    def on_chunk(df):
+        seen.append(sorted(df["ticker"]))
+        return len(df)
+
+    summary = prices.download_prices_chunked(
+        ["AAA", "FLAKY", "BAD", "BBB", "CCC"],
+        on_chunk=on_chunk,
+        chunk_size=2,
+        max_workers=2,
+        retries=2,
+        backoff=0,
+    )
+
+    assert summary.rows == 4
+    assert summary.chunks == 3
+    assert summary.failed == ["BAD"]
+    assert attempts == {"AAA": 1, "FLAKY": 2, "BAD": 3, "BBB": 1, "CCC": 1}
+    assert sorted(seen) == [["AAA", "FLAKY"], ["BBB"], ["CCC"]]
+
+
+def test_replay_repeats_recorded_plan_and_raises_on_miss(tmp_path, monkeypatch):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.Base.metadata.create_all(engine)
+    bar = pd.DataFrame(
+        {"Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [1.0]},
+        index=pd.DatetimeIndex(["2024-01-10"], name="Date"),
+    )
+    downloads = []
+
+    def fake_download(tickers, start=None, **kwargs):
+        downloads.append((list(tickers), start))
+        return bar
+
+    monkeypatch.setattr(prices.yf, "download", fake_download)
+    monkeypatch.setattr(prices, "engine", engine)
+    monkeypatch.setattr(prices, "WATCHLIST_TICKERS", ["AAA"])
+    monkeypatch.setattr(prices.time, "sleep", lambda s: pytest.fail("backoff in replay"))
+    try:
+        fetch.configure("record", tmp_path)
+        assert prices.refresh_watchlist_prices(since="2020-01-01") == 1
+
+        # the stored high-water mark would now plan a different start date
+        fetch.configure("replay")
+        monkeypatch.setattr(prices.yf, "download", lambda *a, **k: pytest.fail("network"))
+        assert prices.refresh_watchlist_prices(since="2020-01-01") == 1
+        assert downloads == [(["AAA"], "2020-01-01")]
+
+        with pytest.raises(fetch.CacheMiss):
+            prices.refresh_watchlist_prices(since="2021-01-01")
+        with pytest.raises(fetch.CacheMiss):
+            prices.fetch_price_chunk(["AAA"], "2019-01-01", None, retries=2, backoff=1.0)
+    finally:
+        fetch.configure("off", fetch.HTTP_CACHE_DIR)
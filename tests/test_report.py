@@ -0,0 +1,154 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from mmw import columnar, db, report
+from mmw.indices import _upsert_df
+from mmw.prices import upsert_prices
+
+
+def _prices(ticker, closes):
+    dates = pd.bdate_range("2024-01-01", periods=len(closes))
+    return pd.DataFrame(
+        {"ticker": ticker, "date": dates, "open": closes, "high": closes, "low": closes,
+         "close": closes, "volume": 0.0}
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.init_db(engine)
+    monkeypatch.setattr(report, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(report, "REPORT_WORKERS", 1)
+    monkeypatch.setattr("mmw.indices.engine", engine)
+    upsert_prices(_prices("AAA", [1.0, 2.0, 3.0]), engine)
+    upsert_prices(_prices("BBB", [5.0, 4.0, 3.0]), engine)
+    _upsert_df(pd.DataFrame(
+        {"date": pd.bdate_range("2024-01-01", periods=2), "index_code": "SCFI", "value": 2.0}
+    ))
+    return engine, tmp_path
+
+
+def _build(engine, root):
+    report.build_site(engine)
+    data = json.loads((root / report.MANIFEST).read_text(encoding="utf-8"))
+    return data["artifacts"]
+
+
+def test_build_site_rerenders_only_changed_artifacts(site, monkeypatch):
+    engine, root = site
+    rendered = []
+    write_series = report._write_series
+    monkeypatch.setattr(
+        report, "_write_series", lambda path, s: rendered.append(path.name) or write_series(path, s)
+    )
+
+    artifacts = _build(engine, root)
+    assert sorted(rendered) == ["index_SCFI.js", "price_AAA.js", "price_BBB.js"]
+    assert {"assets/news.html", "assets/insights.html"} <= set(artifacts)
+
+    rendered.clear()
+    news_page = (root / "assets" / "news.html").stat().st_mtime_ns
+    assert _build(engine, root) == artifacts
+    assert rendered == []
+    assert (root / "assets" / "news.html").stat().st_mtime_ns == news_page
+
+    # a revised close re-renders that ticker only
+    upsert_prices(_prices("BBB", [5.0, 4.5]), engine)
+    rendered.clear()
+    _build(engine, root)
+    assert rendered == ["price_BBB.js"]
+    # so does a revision of another charted field alone
+    upsert_prices(_prices("AAA", [1.0, 2.0]).assign(high=[1.0, 2.5]), engine)
+    rendered.clear()
+    _build(engine, root)
+    assert rendered == ["price_AAA.js"]
+    # while volume is not charted
+    upsert_prices(_prices("AAA", [1.0, 2.0]).assign(high=[1.0, 2.5], volume=9.0), engine)
+    rendered.clear()
+    _build(engine, root)
+    assert rendered == []
+    index_html = (root / "index.html").read_text(encoding="utf-8")
+    assert "chart.html?kind=price&amp;key=AAA" in index_html
+    assert "chart.html?kind=index&amp;key=SCFI" in index_html
+
+    # a deleted data file is rebuilt even though its inputs did not change
+    (root / "assets" / "data" / "index_SCFI.js").unlink()
+    rendered.clear()
+    _build(engine, root)
+    assert rendered == ["index_SCFI.js"]
+
+
+def test_build_manifest_discards_other_report_versions(tmp_path, monkeypatch):
+    (tmp_path / "a.html").write_text("x", encoding="utf-8")
+    manifest = report.BuildManifest(tmp_path)
+    manifest.record("a.html", [1, "2024-01-01"])
+    manifest.save()
+    assert report.BuildManifest(tmp_path).is_fresh("a.html", (1, "2024-01-01"))
+
+    monkeypatch.setattr(report, "REPORT_VERSION", report.REPORT_VERSION + 1)
+    stale = report.BuildManifest(tmp_path)
+    assert not stale.is_fresh("a.html", [1, "2024-01-01"])
+    assert (stale.rendered, stale.skipped) == (0, 0)
+    # files of the old version that were not rebuilt are removed
+    stale.save()
+    assert not (tmp_path / "a.html").exists()
+
+
+def _decode(column):
+    """Mirror of ``decode`` in the chart page."""
+
+    values = np.array([np.nan if d is None else d for d in column["d"]], dtype=float)
+    finite = ~np.isnan(values)
+    values[finite] = np.cumsum(values[finite])
+    return values / 10.0 ** column["e"]
+
+
+def test_series_encoding_round_trips_with_gaps():
+    dates = pd.bdate_range("2024-01-01", periods=5).to_numpy()
+    closes = np.array([12.3456789, np.nan, 12.5, 0.0, 1234.5])
+    days = np.cumsum(report.encode_dates(dates))
+    assert days.tolist() == (dates.astype("datetime64[D]").astype(int)).tolist()
+
+    column = report.encode_column(closes)
+    assert column["e"] == 2  # six significant digits of 1234.5
+    np.testing.assert_allclose(_decode(column), closes.round(2))
+    assert report.encode_column(np.array([np.nan])) == {"e": 0, "d": [None]}
+    assert report.encode_column(np.array([0.00012345, 0.0001]))["d"] == [123450, -23450]
+
+
+def test_chart_pool_matches_serial_rendering(site, monkeypatch):
+    engine, root = site
+
+    def _charts():
+        paths = report.build_price_charts(engine) + report.build_index_charts(engine)
+        return {p.name: p.read_text() for p in paths}
+
+    serial = _charts()
+    monkeypatch.setattr(report, "REPORT_WORKERS", 2)
+    assert _charts() == serial
+    assert sorted(serial) == ["index_SCFI.js", "price_AAA.js", "price_BBB.js"]
+    payload = json.loads(serial["price_AAA.js"].removeprefix("mmwSeries(").removesuffix(");\n"))
+    assert payload["title"] == "AAA" and set(payload["c"]) == set(report.PRICE_CHART_FIELDS)
+    np.testing.assert_allclose(_decode(payload["c"]["close"]), [1.0, 2.0, 3.0])
+
+
+def test_build_site_syncs_a_stale_columnar_mirror(site, tmp_path, monkeypatch):
+    engine, root = site
+    mirror = tmp_path / "columnar"
+    monkeypatch.setattr(columnar, "COLUMNAR_DIR", mirror)
+    monkeypatch.setattr(columnar, "PRICE_SOURCE", "columnar")
+    monkeypatch.setattr(report, "PRICE_SOURCE", "columnar")
+    columnar.sync_mirror(engine)
+    _build(engine, root)
+
+    # prices change in SQL while the mirror is left behind
+    upsert_prices(_prices("BBB", [5.0, 4.5]), engine)
+    _build(engine, root)
+    text = (root / "assets" / "data" / "price_BBB.js").read_text()
+    payload = json.loads(text.removeprefix("mmwSeries(").removesuffix(");\n"))
+    np.testing.assert_allclose(_decode(payload["c"]["close"]), [5.0, 4.5, 3.0])
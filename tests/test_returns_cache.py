@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from mmw import analytics, db
+from mmw.prices import upsert_prices
+from mmw.returns_cache import ReturnsCache
+
+
+def _prices(closes):
+    dates = pd.bdate_range("2024-01-01", periods=len(closes["AAA"]))
+    return pd.concat(
+        pd.DataFrame(
+            {"ticker": t, "date": dates, "open": c, "high": c, "low": c, "close": c, "volume": 0}
+        )
+        for t, c in closes.items()
+    )
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'prices.sqlite'}", future=True)
+    db.init_db(engine)
+    upsert_prices(_prices({"AAA": [100.0, 110.0, 99.0], "BBB": [50.0, 55.0, 60.5]}), engine)
+    return engine
+
+
+def test_returns_matrix_is_cached_until_prices_change(file_engine, tmp_path, monkeypatch):
+    cache = ReturnsCache(maxsize=4, directory=tmp_path / "cache")
+    monkeypatch.setattr(analytics, "returns_cache", cache)
+
+    wide = analytics.returns_matrix(file_engine, ["AAA", "BBB"])
+    assert list(wide.columns) == ["AAA", "BBB"]
+    assert wide["AAA"].tolist() == pytest.approx([0.10, -0.10])
+    analytics.returns_matrix(file_engine, ["BBB", "AAA"])
+    subset = analytics.returns_matrix(file_engine, ["BBB"])
+    assert list(subset.columns) == ["BBB"]
+    assert cache.stats == {"misses": 1, "hits": 2}
+
+    # a revised close keeps row ids but bumps the prices version
+    upsert_prices(_prices({"AAA": [100.0, 120.0, 99.0]}), file_engine)
+    wide = analytics.returns_matrix(file_engine, ["AAA", "BBB"])
+    assert wide["AAA"].iloc[0] == pytest.approx(0.20)
+    assert cache.stats["misses"] == 2
+
+    # a new process finds the persisted matrix
+    fresh = ReturnsCache(maxsize=4, directory=tmp_path / "cache")
+    monkeypatch.setattr(analytics, "returns_cache", fresh)
+    pd.testing.assert_frame_equal(analytics.returns_matrix(file_engine, ["AAA", "BBB"]), wide)
+    assert fresh.stats == {"disk_hits": 1}
+    assert len(list((tmp_path / "cache").rglob("*.parquet"))) == 1
+
+
+def test_returns_cache_evicts_least_recently_used():
+    cache = ReturnsCache(maxsize=2, directory=None)
+    frames = {t: pd.DataFrame({t: [0.1]}) for t in "ABC"}
+    for t in "AB":
+        cache.get("db", [t], "1", lambda t=t: frames[t])
+    cache.get("db", ["A"], "1", pytest.fail)
+    cache.get("db", ["C"], "1", lambda: frames["C"])
+    cache.get("db", ["A"], "1", pytest.fail)
+    cache.get("db", ["B"], "1", lambda: frames["B"])
+    assert cache.stats == {"misses": 4, "hits": 2}
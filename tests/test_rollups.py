@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+
+from mmw import analytics, db
+from mmw.prices import upsert_prices
+from mmw.rollups import refresh_rollups, rollups_current
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    db.init_db(engine)
+    return engine
+
+
+def _add_news(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(
+            insert(db.News),
+            [
+                {"url": url, "title": "t", "source": source, "summary_ai": None,
+                 "published_at": published}
+                for url, source, published in rows
+            ],
+        )
+
+
+def _prices(ticker, dates, closes):
+    return pd.DataFrame(
+        {"ticker": ticker, "date": dates, "open": closes, "high": closes, "low": closes,
+         "close": closes, "volume": 0.0}
+    )
+
+
+def _both_paths(engine, fn):
+    """Return ``fn()`` from raw rows (rollups pending) and from the rollups."""
+
+    with engine.connect() as conn:
+        assert not rollups_current(conn, "news") or not rollups_current(conn, "prices")
+    raw = fn()
+    refresh_rollups(engine)
+    with engine.connect() as conn:
+        assert rollups_current(conn, "news") and rollups_current(conn, "prices")
+    return raw, fn()
+
+
+def test_news_rollups_follow_inserts_updates_and_links(engine):
+    _add_news(engine, [
+        ("u1", "a", datetime(2024, 1, 1, 9)),
+        ("u2", None, datetime(2024, 1, 1, 23, 59)),
+        ("u3", "a", datetime(2024, 1, 3, 0, 1)),
+    ])
+    raw, rolled = _both_paths(engine, lambda: analytics.news_intensity(engine))
+    pd.testing.assert_frame_equal(raw, rolled)
+    assert rolled["news_count"].tolist() == [2, 1]
+
+    # enrichment and linking after the first refresh only touch their days
+    with engine.begin() as conn:
+        conn.execute(update(db.News).where(db.News.url == "u3").values(summary_ai="abcd"))
+        conn.execute(
+            insert(db.Link),
+            [
+                {"news_id": 1, "asset_ticker": "ZIM", "score": 1.0},
+                {"news_id": 3, "asset_ticker": "ZIM", "score": 1.0},
+                {"news_id": 3, "asset_ticker": "ZIM", "score": 2.0},
+            ],
+        )
+    assert refresh_rollups(engine)["news_days"] == 2
+
+    df = analytics.news_intensity(engine, sources=["a"])
+    assert df["avg_sentiment"].tolist() == [0.0, 4.0]
+    counts = analytics.ticker_news_counts(engine, start="2024-01-02")
+    assert counts.to_dict(orient="records") == [{"ticker": "ZIM", "news_count": 1}]
+    assert analytics.ticker_news_counts(engine)["news_count"].tolist() == [2]
+
+    with engine.begin() as conn:
+        conn.execute(db.Link.__table__.delete())
+        conn.execute(db.News.__table__.delete().where(db.News.url == "u1"))
+    refresh_rollups(engine)
+    assert analytics.ticker_news_counts(engine).empty
+    assert analytics.news_intensity(engine)["news_count"].tolist() == [1, 1]
+
+
+def test_price_rollups_track_new_bars_and_revisions(engine):
+    dates = pd.bdate_range("2024-01-25", periods=10)  # Thu 25 Jan .. Wed 7 Feb
+    upsert_prices(_prices("ZIM", dates, [float(i) for i in range(10)]), engine)
+
+    raw, rolled = _both_paths(engine, lambda: analytics.price_snapshots(engine, "weekly"))
+    pd.testing.assert_frame_equal(raw, rolled)
+    assert rolled["close"].tolist() == [1.0, 6.0, 9.0]
+
+    monthly = analytics.price_snapshots(engine, "monthly")
+    assert monthly["period"].astype(str).tolist() == ["2024-01-01", "2024-02-01"]
+    assert monthly["close"].tolist() == [4.0, 9.0]
+
+    # a revised January close and a new bar are both picked up incrementally
+    upsert_prices(_prices("ZIM", [dates[4], dates[-1] + pd.offsets.BDay()], [40.0, 10.0]), engine)
+    assert refresh_rollups(engine)["price_assets"] == 1
+    assert analytics.price_snapshots(engine, "monthly")["close"].tolist() == [40.0, 10.0]
+
+    before = analytics.price_snapshots(engine, "weekly")
+    refresh_rollups(engine, full=True)
+    pd.testing.assert_frame_equal(analytics.price_snapshots(engine, "weekly"), before)
+
+
+def test_dirty_queue_keeps_one_row_per_key(engine):
+    dates = pd.bdate_range("2024-01-01", periods=3)
+    upsert_prices(_prices("ZIM", dates, [1.0, 2.0, 3.0]), engine)
+    _add_news(engine, [("u1", "a", datetime(2024, 1, 1, 9)), ("u2", "a", datetime(2024, 1, 1, 10))])
+    for close in (10.0, 20.0, 30.0):  # repeated revisions between refreshes
+        upsert_prices(_prices("ZIM", dates[:2], [close, close]), engine)
+        with engine.begin() as conn:
+            conn.execute(update(db.News).values(summary_ai=str(close)))
+
+    with engine.connect() as conn:
+        queued = conn.execute(
+            select(db.RollupDirty.kind, db.RollupDirty.key, db.RollupDirty.day)
+        ).all()
+    assert len(queued) == len(set(queued)) == 3  # one news day, two price days
+
+    refresh_rollups(engine)
+    assert analytics.price_snapshots(engine, "weekly")["close"].tolist() == [3.0]